@@ -5,7 +5,7 @@ from __future__ import annotations
 __author__ = "Jacob T. Cassady"
 __email__ = "jacobtaylorcassady@outlook.com"
 
-from typing import Dict
+from typing import Dict, List
 
 # 3rd party modules
 from binance.client import Client
@@ -14,6 +14,7 @@ from numpy import array
 
 # Stocker modules
 from accounts.account import Account
+from utilities.quote_cache import QUOTE_CACHE
 
 class BinanceAccount(Account):
     """[summary]"""
@@ -58,7 +59,7 @@ class BinanceAccount(Account):
         transaction_analysis: Dict[str, float] = {}
         transaction_analysis['value'] = transactions['Total'].sum()
         fee_currencies: array = transactions['Fee Currency'].unique()
-        ticker_data = self.interface.get_all_tickers()
+        ticker_data = self.interface.get_cached_tickers()
 
         total_fee = 0.
         for fee_currency in fee_currencies:
@@ -85,6 +86,13 @@ class BinanceAccount(Account):
                 api_secret (str): [description]"""
             Client.__init__(self, api_key=api_key, api_secret=api_secret, tld="us")
 
+        def get_cached_tickers(self) -> List[Dict[str, str]]:
+            """Returns the get_all_tickers snapshot through the shared quote cache.
+
+            Returns:
+                List[Dict[str, str]]: Ticker entries with 'symbol' and 'price' keys."""
+            return QUOTE_CACHE.get(asset_class="snapshot", key="binance.us all tickers", fetch=self.get_all_tickers)
+
         def get_prices(self, symbols: list) -> dict:
             """[summary]
 
@@ -93,7 +101,7 @@ class BinanceAccount(Account):
 
             Returns:
                 dict: [description]"""
-            price_list = self.get_all_tickers()
+            price_list = self.get_cached_tickers()
             prices = {}
 
             for symbol in symbols:
@@ -0,0 +1,61 @@
+#/usr/bin/env python
+"""idle_cpu.py: CPU used while idling with the former polling waits of time_util and the blocking ones.
+
+Run from the repository root with python -m benchmarks.idle_cpu."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Callable, Dict
+from argparse import ArgumentParser
+from threading import Event
+from time import time, sleep, process_time
+
+# Stocker Library Modules
+from utilities.time_util import pseudo_realtime_timestep, Stocker_Event
+
+
+def benchmark_idle_cpu(duration: float = 2.) -> Dict[str, float]:
+    """Measures the CPU seconds spent idling for duration seconds with the former polling waits and the blocking ones.
+
+    Args:
+        duration (float, optional): Seconds each wait lasts. Defaults to 2.
+
+    Returns:
+        Dict[str, float]: CPU seconds used by each kind of wait."""
+    def polling_timestep() -> None:
+        epoch_start_time = time()
+        while epoch_start_time + duration >= time():
+            sleep(duration/1000)
+
+    def polling_event_wait() -> None:
+        event = Event()
+        start_time = time()
+        while not event.is_set() and time() - start_time <= duration:
+            sleep(0.0001)
+
+    waits: Dict[str, Callable[[], None]] = {
+        "polling pseudo_realtime_timestep": polling_timestep,
+        "blocking pseudo_realtime_timestep": lambda: pseudo_realtime_timestep(epoch_start_time=time(), timestep=duration,
+                                                                              stop_event=Event()),
+        "polling Stocker_Event.wait": polling_event_wait,
+        "blocking Stocker_Event.wait": lambda: Stocker_Event().wait(timeout_ms=duration * 1000.)
+    }
+
+    cpu_seconds: Dict[str, float] = {}
+    for wait_name, wait in waits.items():
+        cpu_start = process_time()
+        wait()
+        cpu_seconds[wait_name] = process_time() - cpu_start
+    return cpu_seconds
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compares the CPU used by polling and blocking idle waits.")
+    parser.add_argument("--duration", type=float, default=2., help="seconds each wait lasts")
+    arguments = parser.parse_args()
+
+    for wait_name, wait_cpu_seconds in benchmark_idle_cpu(duration=arguments.duration).items():
+        print(f"{wait_name}: {wait_cpu_seconds * 1000.:.1f} ms CPU over {arguments.duration:g} s idle")
@@ -5,31 +5,59 @@ from __future__ import annotations
 __author__ = "Jacob T. Cassady"
 __email__ = "jacobtaylorcassady@outlook.com"
 
-from enum import Enum
-from datetime import datetime
-from time import sleep
-from typing import Dict, Any, List
-from threading import Thread
+from enum import Enum, IntEnum, unique
+from time import time
+from typing import Dict, List, Set, Tuple, Union, Iterator, NamedTuple
+from threading import Thread, Lock, Event
+from queue import PriorityQueue
+from itertools import count
 from multiprocessing import cpu_count
+from argparse import ArgumentParser
 
 from StatusLogger import Logger, Message
 
 from utilities.Cipher import initialize_lock_and_key_ciphers, load_json_resource, VigenereCipher
 from interfaces.mint import Mint
+from interfaces.crypto import get_crypto_prices
+from interfaces.stock import get_stock_price
+from utilities.market_hours import MarketSession, get_session, next_regular_session_change
+from accounts.binance_us_account import BinanceAccount
+from accounts.coinbase_account import CoinbaseAccount
 from holdings import Holdings
 
 
 class DataCollector(Thread):
-    """Scraper Server object"""
+    """Headless collector refreshing holding and watchlist prices.
+
+    The executive thread puts one refresh job per holding on a shared priority queue every refresh period, held
+    positions ahead of the watchlist, and idle worker threads pull jobs from it. Held coins share one basket job priced
+    with one batched request per provider, the way Holdings.fetch_prices prices them. A symbol is never queued twice
+    while its previous job is pending. Fetched holding prices are buffered and committed as one tick once every
+    held job of the round is done, or flush_interval after the first buffered price if a job is slow."""
     SERVER_NAME: str = "DataCollector"
     HOLDINGS_FILE_NAME: str = "holdings.json"
     PASS_FILE_NAME: str = "pass.json"
     USER_NAME: str = "jakeadelic"
+    CRYPTO_BASKET: str = "held coins"
 
     def __init__(self, verbose: bool = True, log: bool = False, 
-                 overwrite_log: bool = False) -> None:
+                 overwrite_log: bool = False, watchlist: Union[List[str], None] = None,
+                 refresh_period: float = 60., flush_interval: float = 10.,
+                 binance_account: Union[BinanceAccount, None] = None,
+                 coinbase_account: Union[CoinbaseAccount, None] = None) -> None:
+        """Constructor.
+
+        Args:
+            verbose (bool, optional): Log to the console. Defaults to True.
+            log (bool, optional): Log to a file. Defaults to False.
+            overwrite_log (bool, optional): Overwrite the log file instead of appending. Defaults to False.
+            watchlist (Union[List[str], None], optional): Stock symbols refreshed after the held positions. Defaults to None.
+            refresh_period (float, optional): Seconds between job rounds of the executive. Defaults to 60.
+            flush_interval (float, optional): Longest seconds a buffered price waits for the rest of its round. Defaults to 10.
+            binance_account (Union[BinanceAccount, None], optional): Fallback crypto price source. Defaults to None.
+            coinbase_account (Union[CoinbaseAccount, None], optional): Fallback crypto price source. Defaults to None."""
         Thread.__init__(self)
-        self.available_cpus = cpu_count() - 1
+        self.available_cpus = max(cpu_count() - 1, 1)
         self.logger = Logger(name=DataCollector.SERVER_NAME, file_log=log, verbose=verbose, overwrite=overwrite_log)
         self.ciphers: Dict[str, VigenereCipher] = initialize_lock_and_key_ciphers()
         self.passes: dict = load_json_resource(file_name_cipher=self.ciphers["file_name"], 
@@ -38,6 +66,22 @@ class DataCollector(Thread):
         self.mint = Mint(email=self.passes['mint']['email'],
                          password=self.passes['mint']['password'])
         self.mode: DataCollector.SERVER_MODE = DataCollector.SERVER_MODE.INVALID
+        self.holdings: Holdings = self.load_holdings(holding_file_name=DataCollector.HOLDINGS_FILE_NAME)
+        self.watchlist: List[str] = [symbol for symbol in (watchlist or []) if symbol not in self.holdings.stocks]
+        self.watchlist_prices: Dict[str, float] = {}
+        self.refresh_period: float = refresh_period
+        self.flush_interval: float = flush_interval
+        self.binance_account: Union[BinanceAccount, None] = binance_account
+        self.coinbase_account: Union[CoinbaseAccount, None] = coinbase_account
+
+        self.job_queue: PriorityQueue = PriorityQueue()
+        self.job_sequence: Iterator[int] = count()
+        self.pending_jobs: Set[Tuple[str, str]] = set()
+        self.pending_lock: Lock = Lock()
+        self.pending_held_count: int = 0
+        self.buffered_prices: Dict[str, Dict[str, float]] = {"crypto": {}, "stock": {}}
+        self.buffer_start_time: Union[float, None] = None
+        self.stop_event: Event = Event()
 
         self.threads = {}
         # Initialize Threads
@@ -45,15 +89,14 @@ class DataCollector(Thread):
         self.threads[DataCollector.WorkerThread] = []
         for available_cpu_index in range(self.available_cpus):
             self.threads[DataCollector.WorkerThread].append(
-                DataCollector.WorkerThread(thread_id=available_cpu_index, scraper_server=self))
+                DataCollector.WorkerThread(thread_id=available_cpu_index, data_collector=self))
 
         # Build Executive Thread
-        self.threads[DataCollector.ExecutiveThread] = DataCollector.ExecutiveThread(thread_id=0, scraper_server=self,
+        self.threads[DataCollector.ExecutiveThread] = DataCollector.ExecutiveThread(thread_id=0, data_collector=self,
                                                                                     worker_threads=self.threads[DataCollector.WorkerThread])
 
     def run(self) -> None:
-        """
-        """
+        """Runs the executive and worker threads until stopped, then reports their throughput."""
         self.logger.start()
         self.logger.log(message="Starting " + DataCollector.SERVER_NAME, 
                         message_type=Message.MESSAGE_TYPE.STATUS)
@@ -71,81 +114,124 @@ class DataCollector(Thread):
         # Wait for Executive Thread to Complete
         self.threads[DataCollector.ExecutiveThread].join()
 
-        """
-        try:
-            while mode != DataCollector.SERVER_MODE.SHUTTING_DOWN:
-                mode: DataCollector.SERVER_MODE = DataCollector.SERVER_MODE.set_mode()                
+        self.commit_prices()
+        self.report_throughput()
+        self.holdings.close()
+        self.logger.log(message=f"{DataCollector.SERVER_NAME} has shut down.", 
+                        message_type=Message.MESSAGE_TYPE.STATUS)
+        self.logger.stop()
 
-                if mode == DataCollector.SERVER_MODE.STOCK_MARKET_OPEN:
-                    pass
-                elif mode == DataCollector.SERVER_MODE.STOCK_MARKET_CLOSED:
-                    pass
+    def stop(self) -> None:
+        """Stops queueing jobs. Workers finish the job they are running and exit; queued jobs are discarded."""
+        self.logger.log(message=f"{DataCollector.SERVER_NAME} is shutting down.", 
+                        message_type=Message.MESSAGE_TYPE.STATUS)
+        self.stop_event.set()
 
-                self.logger.log(message=f"{DataCollector.SERVER_NAME} is running in mode {mode}.", 
-                                message_type=Message.MESSAGE_TYPE.STATUS)
+    def submit_job(self, priority: DataCollector.JOB_PRIORITY, asset_class: str, symbol: str) -> bool:
+        """Queues a refresh job unless one for the same symbol is still pending.
 
-                sleep(1)
-        except (KeyboardInterrupt, SystemExit) as error:
-            self.logger.log(message=f"{DataCollector.SERVER_NAME} is shutting down due to exception: {error}", 
-                            message_type=Message.MESSAGE_TYPE.STATUS)
-        """
+        Args:
+            priority (DataCollector.JOB_PRIORITY): Queue priority.
+            asset_class (str): "crypto" or "stock".
+            symbol (str): Coin or stock symbol.
 
-        self.logger.stop()
+        Returns:
+            bool: True if the job was queued."""
+        with self.pending_lock:
+            if (asset_class, symbol) in self.pending_jobs:
+                return False
+            self.pending_jobs.add((asset_class, symbol))
+            if priority == DataCollector.JOB_PRIORITY.HELD:
+                self.pending_held_count += 1
+        self.job_queue.put(DataCollector.Job(priority=int(priority), sequence=next(self.job_sequence),
+                                             asset_class=asset_class, symbol=symbol))
+        return True
+
+    def buffer_price(self, asset_class: str, symbol: str, price: float) -> None:
+        """Holds a fetched holding price until its round is committed.
+
+        Args:
+            asset_class (str): "crypto" or "stock".
+            symbol (str): Coin or stock symbol.
+            price (float): Fetched price."""
+        with self.pending_lock:
+            if self.buffer_start_time is None:
+                self.buffer_start_time = time()
+            self.buffered_prices[asset_class][symbol] = price
+
+    def finish_job(self, job: DataCollector.Job) -> None:
+        """Marks a job done and commits the buffered prices once the round's held jobs are all done or the buffer
+        has waited flush_interval.
+
+        Args:
+            job (DataCollector.Job): Finished job."""
+        with self.pending_lock:
+            self.pending_jobs.discard((job.asset_class, job.symbol))
+            if job.priority == DataCollector.JOB_PRIORITY.HELD:
+                self.pending_held_count -= 1
+            ready = self.buffer_start_time is not None and \
+                (self.pending_held_count == 0 or time() - self.buffer_start_time >= self.flush_interval)
+        if ready:
+            self.commit_prices()
+        self.job_queue.task_done()
+
+    def commit_prices(self) -> None:
+        """Applies every buffered price to the holdings as one tick."""
+        with self.pending_lock:
+            prices, self.buffered_prices = self.buffered_prices, {"crypto": {}, "stock": {}}
+            self.buffer_start_time = None
+        if len(prices["crypto"]) == 0 and len(prices["stock"]) == 0:
+            return
+
+        try:
+            self.holdings.apply_prices(crypto_prices=prices["crypto"], stock_prices=prices["stock"])
+        except Exception as error:
+            self.logger.log(message=f"Exception {error} encountered committing {len(prices['crypto']) + len(prices['stock'])} prices.",
+                            message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+
+    def report_throughput(self) -> None:
+        """Logs the jobs per second of every worker."""
+        for worker_thread in self.threads[DataCollector.WorkerThread]:
+            self.logger.log(message=f"{worker_thread} completed {worker_thread.jobs_completed} jobs "
+                                    f"({worker_thread.jobs_failed} failed) at {worker_thread.jobs_per_second():.3f} jobs/s.",
+                            message_type=Message.MESSAGE_TYPE.STATUS)
 
     def load_holdings(self, holding_file_name: str) -> Holdings:
-        """[summary]
+        """Loads holdings from the encrypted resource file and checking accounts from Mint.
 
         Args:
-            holding_file_name (str): [description]
+            holding_file_name (str): Unencrypted name of the holdings resource file.
 
         Returns:
-            Holdings: [description]"""
-        stocks: Dict[str, Holdings.Stock] = {}
-        crypto: Dict[str, Holdings.Cryptocoin] = {}
-        checking_accounts: Dict[str, Holdings.CheckingAccount] = {}
-        floating_usd: Dict[str, float] = {}
-
-        stock_and_crypto_holdings: Dict[str, Dict[str, Dict[str, Any]]] = self.load_json_resource(resource_file_name=holding_file_name)
-
-        # Load stocks
-        for stock_symbol, stock_data in stock_and_crypto_holdings['stock'].items():
-            stocks[stock_symbol] = Holdings.Stock(symbol=stock_symbol,
-                                                  name=stock_data['name'],
-                                                  quantity=stock_data['quantity'],
-                                                  cost_basis_per_share=stock_data['cost basis per share'])
-        # Load crypto
-        for coin, coin_data in stock_and_crypto_holdings['crypto'].items():
-            crypto[coin] = Holdings.Cryptocoin(name=coin_data["name"],
-                                               coin=coin,
-                                               quantity=coin_data['quantity'],
-                                               investment=coin_data['investment'])
-
-        # Load float
-        for float_location, usd_in_float in stock_and_crypto_holdings['float'].items():
-            floating_usd[float_location] = usd_in_float
-
-        # Load checking accounts from mint
-        for account_data in self.mint.get_accounts(False):
-            checking_accounts[account_data['accountName']] = Holdings.CheckingAccount(name=account_data['accountName'],
-                                                                                      equity=account_data['value'])
-        self.mint.close()
-
-        return Holdings(stocker=self, 
-                        stocks=stocks,
-                        cryptocoins=crypto, 
-                        checking_accounts=checking_accounts,
-                        floating_usd=floating_usd)
+            Holdings: Loaded holdings."""
+        return Holdings.load(holding_file_name=holding_file_name,
+                             file_name_cipher=self.ciphers['file_name'],
+                             data_cipher=self.ciphers['data'],
+                             mint=self.mint)
+
+    class Job(NamedTuple):
+        """Refresh of one symbol. Jobs order by priority, then by submission."""
+        priority: int
+        sequence: int
+        asset_class: str
+        symbol: str
+
+    @unique
+    class JOB_PRIORITY(IntEnum):
+        SHUTDOWN = 0
+        HELD = 1
+        WATCHLIST = 2
 
     class ExecutiveThread(Thread):
-        """[summary]"""
+        """Queues a round of refresh jobs every refresh period and shuts the workers down when stopped."""
 
         def __init__(self, thread_id: int, data_collector: DataCollector, worker_threads: list):
-            """[summary]
+            """Constructor.
 
             Args:
-                thread_id (int): [description]
-                scraper_server (object): [description]
-                worker_threads (list): [description]"""
+                thread_id (int): Thread number used in its name.
+                data_collector (DataCollector): Collector owning the job queue and holdings.
+                worker_threads (list): Workers to shut down when stopped."""
             Thread.__init__(self)
             self.thread_id = thread_id
             self.data_collector = data_collector
@@ -156,32 +242,126 @@ class DataCollector(Thread):
             """
             return str(type(self)) + "_" + str(self.thread_id)
 
+        def queue_round(self) -> int:
+            """Queues one basket job for the held coins and, while the stock market is open, a job for every stock.
+
+            Returns:
+                int: Number of jobs queued."""
+            data_collector = self.data_collector
+            data_collector.mode = DataCollector.SERVER_MODE.set_mode(at=time())
+            queued_count: int = 0
+
+            if len(data_collector.holdings.cryptocoins) > 0:
+                queued_count += data_collector.submit_job(priority=DataCollector.JOB_PRIORITY.HELD,
+                                                          asset_class="crypto", symbol=DataCollector.CRYPTO_BASKET)
+
+            if data_collector.mode == DataCollector.SERVER_MODE.STOCK_MARKET_OPEN:
+                for stock_symbol in data_collector.holdings.stocks.keys():
+                    queued_count += data_collector.submit_job(priority=DataCollector.JOB_PRIORITY.HELD,
+                                                              asset_class="stock", symbol=stock_symbol)
+                for stock_symbol in data_collector.watchlist:
+                    queued_count += data_collector.submit_job(priority=DataCollector.JOB_PRIORITY.WATCHLIST,
+                                                              asset_class="stock", symbol=stock_symbol)
+            return queued_count
+
         def run(self) -> None:
-            """TODO"""
-            pass
+            data_collector = self.data_collector
+
+            while not data_collector.stop_event.is_set():
+                round_start_time = time()
+                queued_count = self.queue_round()
+                data_collector.logger.log(message=f"{DataCollector.SERVER_NAME} is running in mode {data_collector.mode.value} "
+                                                  f"and queued {queued_count} jobs ({data_collector.job_queue.qsize()} waiting).",
+                                          message_type=Message.MESSAGE_TYPE.STATUS)
+
+                # Wake for the next round, or as the market opens or closes if that comes first.
+                wake_time = min(round_start_time + data_collector.refresh_period,
+                                next_regular_session_change(at=round_start_time))
+                data_collector.stop_event.wait(timeout=max(wake_time - time(), 0.))
+
+            # Shutdown jobs outrank every refresh, so each worker exits after its current job.
+            for _ in self.worker_threads:
+                data_collector.job_queue.put(DataCollector.Job(priority=int(DataCollector.JOB_PRIORITY.SHUTDOWN),
+                                                               sequence=next(data_collector.job_sequence),
+                                                               asset_class="", symbol=""))
 
     class WorkerThread(Thread):
-        """[summary]"""
+        """Runs refresh jobs from the shared queue until it pulls a shutdown job."""
 
         def __init__(self, thread_id: int, data_collector: DataCollector):
-            """
-            Constructor.
-            :param thread_id:
-            :param scraper_server:
-            """
+            """Constructor.
+
+            Args:
+                thread_id (int): Thread number used in its name.
+                data_collector (DataCollector): Collector owning the job queue and holdings."""
             Thread.__init__(self)
             self.thread_id = thread_id
             self.data_collector: DataCollector = data_collector
-            self.holdings_to_update: List[Holdings.Holding] = []
+            self.jobs_completed: int = 0
+            self.jobs_failed: int = 0
+            self.start_time: Union[float, None] = None
+            self.stop_time: Union[float, None] = None
 
         def __str__(self) -> str:
             """
             """
             return str(type(self)) + "_" + str(self.thread_id)
 
+        def jobs_per_second(self) -> float:
+            """Jobs completed per second since the worker started.
+
+            Returns:
+                float: Throughput, 0 before the worker has started."""
+            if self.start_time is None:
+                return 0.
+            elapsed_time = (time() if self.stop_time is None else self.stop_time) - self.start_time
+            return self.jobs_completed / elapsed_time if elapsed_time > 0 else 0.
+
+        def run_job(self, job: DataCollector.Job) -> None:
+            """Fetches the price of a job's symbol, or of every held coin for the crypto basket, buffering it for the
+            round's tick if it is held.
+
+            Args:
+                job (DataCollector.Job): Job to run."""
+            data_collector = self.data_collector
+            if job.asset_class == "crypto":
+                coin_names: List[str] = list(data_collector.holdings.cryptocoins.keys())
+                crypto_prices: Dict[str, float] = get_crypto_prices(coin_names=coin_names,
+                                                                    binance_account=data_collector.binance_account,
+                                                                    coinbase_account=data_collector.coinbase_account)
+                for coin_name, price in crypto_prices.items():
+                    data_collector.buffer_price(asset_class="crypto", symbol=coin_name, price=price)
+                missing_coin_names: List[str] = [coin_name for coin_name in coin_names if coin_name not in crypto_prices]
+                if len(missing_coin_names) > 0:
+                    data_collector.logger.log(message=f"{self} found no price for {', '.join(missing_coin_names)}. Keeping their last prices.",
+                                              message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+            elif job.symbol in data_collector.holdings.stocks:
+                data_collector.buffer_price(asset_class="stock", symbol=job.symbol,
+                                            price=get_stock_price(symbol=job.symbol))
+            else:
+                data_collector.watchlist_prices[job.symbol] = get_stock_price(symbol=job.symbol)
+
         def run(self) -> None:
-            """TODO"""
-            pass
+            self.start_time = time()
+            data_collector = self.data_collector
+
+            while True:
+                job: DataCollector.Job = data_collector.job_queue.get()
+                if job.priority == DataCollector.JOB_PRIORITY.SHUTDOWN:
+                    data_collector.job_queue.task_done()
+                    break
+
+                try:
+                    self.run_job(job=job)
+                    self.jobs_completed += 1
+                except Exception as error:
+                    self.jobs_failed += 1
+                    data_collector.logger.log(message=f"{self} encountered exception {error} refreshing {job.asset_class} {job.symbol}.",
+                                              message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+                finally:
+                    data_collector.finish_job(job=job)
+
+            self.stop_time = time()
 
     class SERVER_MODE(Enum):
         INVALID = "invalid"
@@ -190,27 +370,33 @@ class DataCollector(Thread):
         SHUTTING_DOWN = "shutting down"
 
         @staticmethod
-        def set_mode() -> DataCollector.SERVER_MODE:
-            """[summary]
+        def set_mode(at: Union[float, None] = None) -> DataCollector.SERVER_MODE:
+            """Mode the collector runs in at a time, following the exchange calendar.
 
-            Returns:
-                DataCollector.SERVER_MODE: [description]"""
-            right_now = datetime.now()
-            right_now_hour = int(right_now.hour)
-            right_now_minute = int(right_now.minute)
-
-            minutes = right_now_hour * 60 + right_now_minute
+            Args:
+                at (Union[float, None], optional): Epoch time. Defaults to now.
 
-            # If we are between 9:30 am and 4 pm the stock market is open
-            if 960 > minutes > 570 and is_datetime_weekday(current_time=datetime.now()):
+            Returns:
+                DataCollector.SERVER_MODE: STOCK_MARKET_OPEN during the regular session, else STOCK_MARKET_CLOSED."""
+            if get_session(at=time() if at is None else at) == MarketSession.REGULAR:
                 return DataCollector.SERVER_MODE.STOCK_MARKET_OPEN
             else:
                 return DataCollector.SERVER_MODE.STOCK_MARKET_CLOSED
 
-def is_datetime_weekday(current_time: datetime):
-    return current_time.isoweekday() in range(1, 6)
-
 
 if __name__ == "__main__":
-    test_data_collection_server = DataCollector()
-    test_data_collection_server.run()
\ No newline at end of file
+    parser = ArgumentParser(description="Collects holding and watchlist prices without the GUI.")
+    parser.add_argument("--watchlist", nargs="*", default=[], help="stock symbols refreshed after the held positions")
+    parser.add_argument("--refresh_period", type=float, default=60., help="seconds between job rounds")
+    parser.add_argument("--flush_interval", type=float, default=10., help="longest wait of a fetched price for its round")
+    arguments = parser.parse_args()
+
+    test_data_collection_server = DataCollector(watchlist=arguments.watchlist, refresh_period=arguments.refresh_period,
+                                                flush_interval=arguments.flush_interval)
+    test_data_collection_server.start()
+    try:
+        while test_data_collection_server.is_alive():
+            test_data_collection_server.join(timeout=1.)
+    except (KeyboardInterrupt, SystemExit):
+        test_data_collection_server.stop()
+        test_data_collection_server.join()
\ No newline at end of file
@@ -6,32 +6,52 @@ __author__ = "Jacob T. Cassady"
 __email__ = "jacobtaylorcassady@outlook.com"
 
 # Built-in Modules
-from typing import Dict, Union, Callable, List, TextIO, Any
+from typing import Dict, Union, Callable, List, TextIO, Any, Tuple
 from abc import ABC, abstractclassmethod, abstractstaticmethod
 from enum import Enum, unique
-from threading import Lock
+from threading import Lock, BoundedSemaphore
+from concurrent.futures import ThreadPoolExecutor, Future
 from time import time
 
 # 3rd party modules
 from pandas import DataFrame, Series
-from numpy import array
+from numpy import array, ndarray, zeros, float64, int64, concatenate, searchsorted, fromiter, nansum, nextafter, inf, \
+    bincount, flatnonzero, diff, add, nan_to_num, column_stack, where, repeat
 from StatusLogger import Logger, Message
 
 # Stocker Library Modules
 from interfaces.stock import get_stock_price
-from interfaces.crypto import get_crypto_price
+from interfaces.crypto import get_crypto_prices
 from interfaces.mint import Mint
 from accounts.binance_us_account import BinanceAccount
 from accounts.coinbase_account import CoinbaseAccount
 from utilities.time_util import Stocker_Event
+from utilities.tick_store import TickStore, EquitySeries
+from utilities.retry import StalePrice
+from utilities.history_file import HistoryFile
+from utilities.rollups import MultiResolutionRollup
+from utilities.position_table import PositionTable, position_field, adopt_positions
+from utilities.event_bus import PriceTick, EquitySnapshot, EVENT_BUS
 from utilities.Cipher import VigenereCipher, load_json_resource
 
 class Holdings(object):
     """[summary]"""
+    PRICE_FETCH_WORKERS: int = 16
+    PROVIDER_CONCURRENCY: Dict[str, int] = {
+        "crypto": 4,
+        "stock": 8
+    }
+    DEFAULT_MAX_POINTS: int = 2000
+    COMPACTION_INTERVAL: float = 3600.
+    HISTORY_SLICE_RECORDS: int = 1 << 20
+    # Streamed prices are committed no more often than crypto is polled, unless they move total equity noticeably.
+    STREAM_COMMIT_INTERVAL: float = 30.
+    STREAM_COMMIT_CHANGE: float = 0.005
+
     def __init__(self, cryptocoins: Dict[str, Holdings.Cryptocoin], 
                  stocks: Dict[str, Holdings.Stock],
                  checking_accounts: Dict[str, Holdings.CheckingAccount],
-                 floating_usd: Dict[str, float]):
+                 floating_usd: Dict[str, float], raw_tick_horizon: Union[float, None] = None):
         """[summary]
 
         Args:
@@ -39,25 +59,77 @@ class Holdings(object):
             cryptocoins (Dict[str, Holdings.Cryptocoin]): [description]
             stocks (Dict[str, Holdings.Stock]): [description]
             checking_accounts (Dict[str, Holdings.CheckingAccount]): [description]
-            floating_usd (Dict[str, float]): [description]"""
+            floating_usd (Dict[str, float]): [description]
+            raw_tick_horizon (Union[float, None], optional): Seconds of raw ticks kept in memory before they are
+                compacted into rollups. Defaults to keeping every tick."""
         self.lock: Lock = Lock()
         self.initial_update = Stocker_Event()
+        self.price_fetch_pool: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=Holdings.PRICE_FETCH_WORKERS,
+                                                                       thread_name_prefix="PriceFetch")
+        self.provider_semaphores: Dict[str, BoundedSemaphore] = \
+            {provider: BoundedSemaphore(limit) for provider, limit in Holdings.PROVIDER_CONCURRENCY.items()}
 
         self.cryptocoins: Dict[str, Holdings.Cryptocoin] = cryptocoins
-        self.crypto_df: DataFrame = DataFrame(columns=Holdings.Cryptocoin.get_columns())
-        self.crypto_df.set_index("datetime")
+        self.crypto_positions: PositionTable = PositionTable()
+        adopt_positions(table=self.crypto_positions, holdings=cryptocoins.items())
+        self.crypto_store: TickStore = TickStore(label_column="name", extra_columns=("investment",),
+                                                 column_order=Holdings.Cryptocoin.get_columns())
 
         self.stocks: Dict[str, Holdings.Stock] = stocks
-        self.stocks_df: DataFrame = DataFrame(columns=Holdings.Stock.get_columns())
-        self.stocks_df.set_index("datetime")
+        self.stock_positions: PositionTable = PositionTable()
+        adopt_positions(table=self.stock_positions, holdings=stocks.items())
+        self.stocks_store: TickStore = TickStore(label_column="stock", extra_columns=("cost_basis_per_share",),
+                                                 column_order=Holdings.Stock.get_columns())
 
         self.checking_accounts: Dict[str, Holdings.CheckingAccount] = checking_accounts
-        self.checking_account_df: DataFrame = DataFrame(columns=Holdings.CheckingAccount.get_columns())
-        self.checking_account_df.set_index("datetime")
+        self.checking_positions: PositionTable = PositionTable()
+        adopt_positions(table=self.checking_positions, holdings=checking_accounts.items())
+        self.checking_account_store: TickStore = TickStore(label_column="account_name",
+                                                           column_order=Holdings.CheckingAccount.get_columns())
 
         self.floating_usd: Dict[str, float] = floating_usd
-        self.floating_usd_df: DataFrame = DataFrame(columns=["datetime", "location", "equity"])
-        self.floating_usd_df.set_index("datetime")
+        self.floating_usd_store: TickStore = TickStore(label_column="location",
+                                                       column_order=["datetime", "location", "equity"])
+
+        self.positions: Dict[Holdings.HOLDING_TYPE, PositionTable] = {
+            Holdings.HOLDING_TYPE.STOCK: self.stock_positions,
+            Holdings.HOLDING_TYPE.CRYPTOCURRENCY: self.crypto_positions,
+            Holdings.HOLDING_TYPE.CHECKING: self.checking_positions
+        }
+        self.tick_stores: Dict[Holdings.HOLDING_TYPE, TickStore] = {
+            Holdings.HOLDING_TYPE.STOCK: self.stocks_store,
+            Holdings.HOLDING_TYPE.CRYPTOCURRENCY: self.crypto_store,
+            Holdings.HOLDING_TYPE.CHECKING: self.checking_account_store,
+            Holdings.HOLDING_TYPE.FLOATING_USD: self.floating_usd_store
+        }
+        self.equity_series_buffers: Dict[Holdings.HOLDING_TYPE, EquitySeries] = \
+            {holding_type: EquitySeries() for holding_type in Holdings.HOLDING_TYPE}
+        self.history: Union[HistoryFile, None] = None
+        self.rollups: Dict[Union[Holdings.HOLDING_TYPE, Tuple[Holdings.HOLDING_TYPE, str]], MultiResolutionRollup] = {}
+        self.raw_tick_horizon: Union[float, None] = raw_tick_horizon
+        self.last_compaction: float = 0.
+        self.snapshot: Holdings.Snapshot = Holdings.Snapshot(version=0, update_time=None, series={}, holding_equities={},
+                                                             rollups={})
+
+    @property
+    def crypto_df(self) -> DataFrame:
+        """Read-only DataFrame view of the cryptocurrency tick history."""
+        return self.crypto_store.to_dataframe()
+
+    @property
+    def stocks_df(self) -> DataFrame:
+        """Read-only DataFrame view of the stock tick history."""
+        return self.stocks_store.to_dataframe()
+
+    @property
+    def checking_account_df(self) -> DataFrame:
+        """Read-only DataFrame view of the checking account tick history."""
+        return self.checking_account_store.to_dataframe()
+
+    @property
+    def floating_usd_df(self) -> DataFrame:
+        """Read-only DataFrame view of the floating USD tick history."""
+        return self.floating_usd_store.to_dataframe()
 
     def __str__(self) -> str:
         return str({
@@ -68,41 +140,39 @@ class Holdings(object):
         })
 
     def update(self, binance_account: Union[BinanceAccount, None] = None, coinbase_account: Union[CoinbaseAccount, None] = None,
-               verbose: bool = False) -> None:
-        """[summary]"""
-        update_time = time()
+               verbose: bool = False, coin_names: Union[List[str], None] = None,
+               stock_symbols: Union[List[str], None] = None) -> None:
+        """Fetches prices concurrently, then commits them and records a tick in one short critical section.
+
+        Holdings left out of coin_names and stock_symbols keep their last price in the recorded tick.
 
-        self.lock.acquire()
-        for coin_name, coin in self.cryptocoins.items():
-            coin.price = get_crypto_price(coin_name=coin_name, binance_account=binance_account,
-                                          coinbase_account=coinbase_account)
+        Args:
+            binance_account (Union[BinanceAccount, None], optional): Fallback crypto price source. Defaults to None.
+            coinbase_account (Union[CoinbaseAccount, None], optional): Fallback crypto price source. Defaults to None.
+            verbose (bool, optional): Log every fetched price. Defaults to False.
+            coin_names (Union[List[str], None], optional): Coins to price. Defaults to every coin.
+            stock_symbols (Union[List[str], None], optional): Stocks to price. Defaults to every stock."""
+        crypto_prices, stock_prices = self.fetch_prices(binance_account=binance_account,
+                                                        coinbase_account=coinbase_account,
+                                                        coin_names=coin_names, stock_symbols=stock_symbols)
+
+        self.apply_prices(crypto_prices=crypto_prices, stock_prices=stock_prices)
+
+        for coin_name, price in crypto_prices.items():
             Logger.verbose_console_log(verbose=verbose,
-                                       message=f"[CRYPTO] {coin_name} is currently valued at ${coin.price} per coin.",
+                                       message=f"[CRYPTO] {coin_name} is currently valued at ${price} per coin{Holdings.describe_staleness(price=price)}.",
                                        message_type=Message.MESSAGE_TYPE.STATUS)
-            self.crypto_df = self.crypto_df.append(coin.to_series(update_time=update_time))
-            self.crypto_df = self.crypto_df.sort_index()
-            
-        for stock_symbol, stock in self.stocks.items():
-            stock.price = get_stock_price(symbol=stock_symbol)
+
+        for stock_symbol, price in stock_prices.items():
             Logger.verbose_console_log(verbose=verbose,
-                                       message=f"[STOCK] {stock.name} is currently valued at ${stock.price} per share.",
+                                       message=f"[STOCK] {self.stocks[stock_symbol].name} is currently valued at ${price} per share{Holdings.describe_staleness(price=price)}.",
                                        message_type=Message.MESSAGE_TYPE.STATUS)
-            self.stocks_df = self.stocks_df.append(stock.to_series(update_time=update_time))
-            self.stocks_df = self.stocks_df.sort_index()
 
         for account_name, checking_account in self.checking_accounts.items():
             #checking_account.update()
             Logger.verbose_console_log(verbose=verbose,
                                        message="[CHECKING] " + account_name + " is currently valued at $" + str(checking_account.equity),
                                        message_type=Message.MESSAGE_TYPE.STATUS)
-            self.checking_account_df = self.checking_account_df.append(checking_account.to_series(update_time=update_time))
-            self.checking_account_df = self.checking_account_df.sort_index()
-
-        for location, usd_in_float in self.floating_usd.items():
-            self.floating_usd_df = self.floating_usd_df.append(Series({"datetime": update_time, "location": location, "equity": usd_in_float}, name=time()))
-            self.floating_usd_df = self.floating_usd_df.sort_index()
-
-        self.lock.release()
 
         Logger.verbose_console_log(verbose=verbose,
                                    message=str(type(self)) + " is finished updating.",
@@ -111,6 +181,528 @@ class Holdings(object):
         if not self.initial_update.is_set():
             self.initial_update.set()
 
+    def apply_prices(self, crypto_prices: Union[Dict[str, float], None] = None,
+                     stock_prices: Union[Dict[str, float], None] = None) -> float:
+        """Records prices from any source, commits a tick in one short critical section and publishes it.
+
+        Ticks are stamped when they are committed, strictly after the previous tick, so polled and streamed prices
+        interleave without ever going back in time. Every applied price is published as a PriceTick and the
+        committed tick as an EquitySnapshot on EVENT_BUS.
+
+        Args:
+            crypto_prices (Union[Dict[str, float], None], optional): Prices by coin. Defaults to None.
+            stock_prices (Union[Dict[str, float], None], optional): Prices by stock symbol. Defaults to None.
+
+        Returns:
+            float: Epoch time of the committed tick."""
+        with self.lock:
+            if crypto_prices:
+                self.crypto_positions.set_prices(prices=crypto_prices)
+            if stock_prices:
+                self.stock_positions.set_prices(prices=stock_prices)
+            update_time: float = time()
+            if self.snapshot.update_time is not None and update_time <= self.snapshot.update_time:
+                update_time = nextafter(self.snapshot.update_time, inf)
+            self.commit_tick(update_time=update_time)
+            snapshot: Holdings.Snapshot = self.snapshot
+
+        Holdings.publish_price_ticks(crypto_prices=crypto_prices, stock_prices=stock_prices, update_time=update_time)
+        EVENT_BUS.publish(event=EquitySnapshot(version=snapshot.version, time=update_time, snapshot=snapshot,
+                                               equities={holding_type.value: snapshot.calculate_equity(holding_type=holding_type)
+                                                         for holding_type in Holdings.HOLDING_TYPE}))
+
+        return update_time
+
+    def record_prices(self, crypto_prices: Union[Dict[str, float], None] = None,
+                      stock_prices: Union[Dict[str, float], None] = None,
+                      commit_interval: float = STREAM_COMMIT_INTERVAL,
+                      commit_change: float = STREAM_COMMIT_CHANGE) -> Union[float, None]:
+        """Records prices arriving faster than ticks should be committed, such as streamed prices.
+
+        The prices are applied to the positions right away, so the next committed tick carries them. A tick is only
+        committed through apply_prices once commit_interval has passed since the last one or total equity moved by
+        more than commit_change since it, which keeps history growth at the polling cadence.
+
+        Args:
+            crypto_prices (Union[Dict[str, float], None], optional): Prices by coin. Defaults to None.
+            stock_prices (Union[Dict[str, float], None], optional): Prices by stock symbol. Defaults to None.
+            commit_interval (float, optional): Seconds between committed ticks. Defaults to STREAM_COMMIT_INTERVAL.
+            commit_change (float, optional): Relative change of total equity that is committed at once. Defaults to STREAM_COMMIT_CHANGE.
+
+        Returns:
+            Union[float, None]: Epoch time of the committed tick, None if no tick was committed."""
+        with self.lock:
+            if crypto_prices:
+                self.crypto_positions.set_prices(prices=crypto_prices)
+            if stock_prices:
+                self.stock_positions.set_prices(prices=stock_prices)
+            now: float = time()
+            snapshot: Holdings.Snapshot = self.snapshot
+            committed_equity: float = snapshot.calculate_equity(holding_type=Holdings.HOLDING_TYPE.ALL)
+            is_due: bool = snapshot.update_time is None or now - snapshot.update_time >= commit_interval or \
+                abs(self.calculate_equity(holding_type=Holdings.HOLDING_TYPE.ALL) - committed_equity) > commit_change * abs(committed_equity)
+
+        if is_due:
+            return self.apply_prices(crypto_prices=crypto_prices, stock_prices=stock_prices)
+
+        Holdings.publish_price_ticks(crypto_prices=crypto_prices, stock_prices=stock_prices, update_time=now)
+        return None
+
+    @staticmethod
+    def publish_price_ticks(crypto_prices: Union[Dict[str, float], None], stock_prices: Union[Dict[str, float], None],
+                            update_time: float) -> None:
+        """Publishes every applied price as a PriceTick on EVENT_BUS.
+
+        Args:
+            crypto_prices (Union[Dict[str, float], None]): Prices by coin.
+            stock_prices (Union[Dict[str, float], None]): Prices by stock symbol.
+            update_time (float): Epoch time the prices were applied."""
+        for asset_class, prices in (("crypto", crypto_prices), ("stock", stock_prices)):
+            for symbol, price in (prices or {}).items():
+                EVENT_BUS.publish(event=PriceTick(asset_class=asset_class, symbol=symbol, price=float(price), time=update_time,
+                                                  stale=isinstance(price, StalePrice)))
+
+    def fetch_prices(self, binance_account: Union[BinanceAccount, None] = None,
+                     coinbase_account: Union[CoinbaseAccount, None] = None, coin_names: Union[List[str], None] = None,
+                     stock_symbols: Union[List[str], None] = None) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Fetches crypto and stock prices in parallel without holding self.lock.
+
+        The crypto basket is priced with one batched request per provider while stock prices are fetched concurrently.
+
+        Args:
+            binance_account (Union[BinanceAccount, None], optional): Fallback crypto price source. Defaults to None.
+            coinbase_account (Union[CoinbaseAccount, None], optional): Fallback crypto price source. Defaults to None.
+            coin_names (Union[List[str], None], optional): Coins to price. Defaults to every coin.
+            stock_symbols (Union[List[str], None], optional): Stocks to price. Defaults to every stock.
+
+        Returns:
+            Tuple[Dict[str, float], Dict[str, float]]: Crypto prices by coin and stock prices by symbol.
+                Holdings whose price could not be fetched are left out."""
+        coin_names = list(self.cryptocoins.keys()) if coin_names is None else coin_names
+        stock_symbols = list(self.stocks.keys()) if stock_symbols is None else stock_symbols
+
+        crypto_future: Union[Future, None] = None
+        if len(coin_names) > 0:
+            crypto_future = self.price_fetch_pool.submit(self.fetch_with_provider_limit, "crypto",
+                                                         get_crypto_prices, coin_names=coin_names,
+                                                         binance_account=binance_account,
+                                                         coinbase_account=coinbase_account)
+
+        stock_futures: Dict[str, Future] = {}
+        for stock_symbol in stock_symbols:
+            stock_futures[stock_symbol] = self.price_fetch_pool.submit(self.fetch_with_provider_limit, "stock",
+                                                                       get_stock_price, symbol=stock_symbol)
+
+        try:
+            crypto_prices: Dict[str, float] = crypto_future.result() if crypto_future is not None else {}
+        except Exception as error:
+            Logger.console_log(message=f"Exception {error} encountered when fetching crypto prices. Keeping their last prices.",
+                               message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+            crypto_prices = {}
+
+        return crypto_prices, Holdings.collect_prices(futures=stock_futures)
+
+    def fetch_with_provider_limit(self, provider: str, fetch: Callable[..., float], **kwargs: Any) -> float:
+        """Calls a price fetch function while holding a slot of its provider's concurrency limit.
+
+        Args:
+            provider (str): Key of Holdings.PROVIDER_CONCURRENCY.
+            fetch (Callable[..., float]): Price fetch function.
+
+        Returns:
+            float: Fetched price."""
+        with self.provider_semaphores[provider]:
+            return fetch(**kwargs)
+
+    @staticmethod
+    def describe_staleness(price: float) -> str:
+        """Suffix for log messages flagging a stale price fallback.
+
+        Args:
+            price (float): Fetched price.
+
+        Returns:
+            str: Empty for fresh prices, the age of the price otherwise."""
+        if isinstance(price, StalePrice):
+            return f" (stale, last fetched {price.age:.0f}s ago)"
+        return ""
+
+    @staticmethod
+    def collect_prices(futures: Dict[str, Future]) -> Dict[str, float]:
+        """Waits on price fetch futures, logging and dropping the ones that failed.
+
+        Args:
+            futures (Dict[str, Future]): Pending fetches by holding name.
+
+        Returns:
+            Dict[str, float]: Fetched prices by holding name."""
+        prices: Dict[str, float] = {}
+
+        for holding_name, future in futures.items():
+            try:
+                prices[holding_name] = future.result()
+            except Exception as error:
+                Logger.console_log(message=f"Exception {error} encountered when fetching the price of {holding_name}. Keeping its last price.",
+                                   message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+
+        return prices
+
+    def update_checking_accounts(self, mint: Mint) -> None:
+        """Refreshes checking account balances from Mint and closes the Mint session.
+
+        Accounts Mint reports that are not tracked yet are added. The balances are recorded with the next tick.
+
+        Args:
+            mint (Mint): Logged in Mint session."""
+        try:
+            accounts_data: List[Dict[str, Any]] = mint.get_accounts(False)
+        finally:
+            mint.close()
+
+        with self.lock:
+            for account_data in accounts_data:
+                account_name: str = account_data['accountName']
+                if account_name in self.checking_accounts:
+                    self.checking_accounts[account_name].equity = account_data['value']
+                else:
+                    checking_account = Holdings.CheckingAccount(name=account_name, equity=account_data['value'])
+                    adopt_positions(table=self.checking_positions, holdings=[(account_name, checking_account)])
+                    self.checking_accounts[account_name] = checking_account
+
+    def close(self) -> None:
+        """Releases the price fetch pool and syncs the history file."""
+        self.price_fetch_pool.shutdown(wait=False)
+        if self.history is not None:
+            self.history.close()
+
+    def attach_history(self, history: HistoryFile) -> None:
+        """Loads the persisted tick history and appends every future tick to it.
+
+        Only the ticks within raw_tick_horizon are copied out of the memory-mapped history into the tick stores.
+        The rollups are rebuilt from the mapped records one slice at a time, so older history is never loaded whole.
+
+        Args:
+            history (HistoryFile): History to restore from and append to."""
+        with self.lock:
+            assert all(len(store) == 0 for store in self.tick_stores.values()), "History must be attached before the first update."
+
+            now: float = time()
+            for holding_type, store in self.tick_stores.items():
+                store.set_labels(labels=history.labels.get(holding_type.value, []))
+            self.rebuild_rollups(history=history, now=now)
+
+            window_start: float = -inf if self.raw_tick_horizon is None else now - self.raw_tick_horizon
+            records: ndarray = history.time_range(start=window_start, end=inf)
+            for holding_type, store in self.tick_stores.items():
+                store_records: ndarray = records[records["store"] == Holdings.history_store_code(holding_type=holding_type)]
+                store.extend(times=store_records["datetime"], holding_ids=store_records["holding_id"],
+                             quantities=store_records["quantity"], prices=store_records["price"],
+                             equities=store_records["equity"],
+                             **{column_name: store_records["extra"] for column_name in store.extra_columns})
+
+                store_times: ndarray = store.unique_times()
+                self.equity_series_buffers[holding_type].extend(times=store_times,
+                                                                equities=store.equity_by_time(times=store_times))
+
+            index_times: ndarray = history.index()["datetime"]
+            tick_times: ndarray = array(index_times[int(searchsorted(index_times, window_start, side="left")):])
+            self.equity_series_buffers[Holdings.HOLDING_TYPE.ALL].extend(
+                times=tick_times, equities=self.calculate_holding_equities(holding_type=Holdings.HOLDING_TYPE.ALL, times=tick_times))
+            self.last_compaction = now
+
+            latest_time: Union[float, None] = float(index_times[-1]) if len(index_times) > 0 else None
+            self.publish_snapshot(update_time=latest_time,
+                                  tick_rows={holding_type: len(store) if latest_time is None else
+                                             int(searchsorted(store.column("datetime"), latest_time, side="left"))
+                                             for holding_type, store in self.tick_stores.items()})
+
+            self.history = history
+
+    @staticmethod
+    def history_store_code(holding_type: Holdings.HOLDING_TYPE) -> int:
+        """Code identifying a holding type's store in history records.
+
+        Args:
+            holding_type (Holdings.HOLDING_TYPE): Holding type of the store.
+
+        Returns:
+            int: Store code."""
+        return list(Holdings.HOLDING_TYPE).index(holding_type)
+
+    def persist_tick(self, update_time: float, first_rows: Dict[Holdings.HOLDING_TYPE, int]) -> None:
+        """Appends the rows committed for a tick to the history file.
+
+        Args:
+            update_time (float): Epoch time of the tick.
+            first_rows (Dict[Holdings.HOLDING_TYPE, int]): Size of every store before the tick was committed."""
+        # Labels are persisted before any record that refers to them.
+        self.history.update_labels(labels={holding_type.value: list(store.labels) for holding_type, store in self.tick_stores.items()})
+
+        tick_records: List[ndarray] = []
+        for holding_type, store in self.tick_stores.items():
+            first_row: int = first_rows[holding_type]
+            if len(store) == first_row:
+                continue
+            tick_records.append(HistoryFile.build_records(update_time=update_time,
+                                                          store_code=Holdings.history_store_code(holding_type=holding_type),
+                                                          holding_ids=store.column("holding_id")[first_row:],
+                                                          quantities=store.column("quantity")[first_row:],
+                                                          prices=store.column("price")[first_row:],
+                                                          equities=store.column("equity")[first_row:],
+                                                          extras=store.column(store.extra_columns[0])[first_row:] if store.extra_columns else None))
+
+        if len(tick_records) > 0:
+            self.history.append_tick(update_time=update_time, records=concatenate(tick_records))
+
+    def commit_tick(self, update_time: float) -> None:
+        """Appends the current state of every holding to the tick stores and running equity series.
+
+        Must be called with self.lock held.
+
+        Args:
+            update_time (float): Epoch time of the tick."""
+        first_rows: Dict[Holdings.HOLDING_TYPE, int] = {holding_type: len(store) for holding_type, store in self.tick_stores.items()}
+        tick_equities: Dict[Holdings.HOLDING_TYPE, Union[float, None]] = {}
+
+        tick_equities[Holdings.HOLDING_TYPE.CRYPTOCURRENCY] = \
+            self.crypto_store.append_many(update_time=update_time,
+                                          labels=[self.cryptocoins[coin].name for coin in self.crypto_positions.symbols],
+                                          quantities=self.crypto_positions.column("quantity"),
+                                          prices=self.crypto_positions.column("price"),
+                                          investment=self.crypto_positions.column("investment"))
+
+        tick_equities[Holdings.HOLDING_TYPE.STOCK] = \
+            self.stocks_store.append_many(update_time=update_time,
+                                          labels=self.stock_positions.symbols,
+                                          quantities=self.stock_positions.column("quantity"),
+                                          prices=self.stock_positions.column("price"),
+                                          cost_basis_per_share=self.stock_positions.column("cost_basis"))
+
+        tick_equities[Holdings.HOLDING_TYPE.CHECKING] = \
+            self.checking_account_store.append_many(update_time=update_time,
+                                                    labels=self.checking_positions.symbols,
+                                                    equities=self.checking_positions.equities())
+
+        tick_equities[Holdings.HOLDING_TYPE.FLOATING_USD] = \
+            self.floating_usd_store.append_many(update_time=update_time,
+                                                labels=list(self.floating_usd.keys()),
+                                                equities=list(self.floating_usd.values()))
+
+        # Only holding types that recorded rows this tick get a point, matching get_times on the raw stores.
+        recorded_equities: List[float] = [equity for equity in tick_equities.values() if equity is not None]
+        for holding_type, equity in tick_equities.items():
+            if equity is not None:
+                self.equity_series_buffers[holding_type].append(update_time=update_time, equity=equity)
+        if len(recorded_equities) > 0:
+            self.equity_series_buffers[Holdings.HOLDING_TYPE.ALL].append(update_time=update_time,
+                                                                         equity=sum(recorded_equities))
+
+        self.update_rollups(update_time=update_time, first_rows=first_rows, tick_equities=tick_equities)
+
+        if self.history is not None:
+            self.persist_tick(update_time=update_time, first_rows=first_rows)
+
+        # Published before compacting, while first_rows still point at the rows of this tick.
+        self.publish_snapshot(update_time=update_time, tick_rows=first_rows)
+
+        if self.raw_tick_horizon is not None and update_time - self.last_compaction >= Holdings.COMPACTION_INTERVAL:
+            self.compact(now=update_time)
+
+    def publish_snapshot(self, update_time: Union[float, None], tick_rows: Dict[Holdings.HOLDING_TYPE, int]) -> None:
+        """Publishes an immutable view of the committed state for lock-free readers.
+
+        Must be called with self.lock held. Readers pick up self.snapshot with a single reference read, which is
+        atomic, and never need self.lock. The series arrays and rollup views are read-only views over buffers that
+        are only appended to or copied on compaction, so later commits never change what a published snapshot shows.
+
+        Args:
+            update_time (Union[float, None]): Epoch time of the latest committed tick.
+            tick_rows (Dict[Holdings.HOLDING_TYPE, int]): First row of the latest tick in every store."""
+        holding_equities: Dict[Holdings.HOLDING_TYPE, Dict[str, float]] = {}
+        for holding_type, store in self.tick_stores.items():
+            latest_rows = slice(tick_rows[holding_type], len(store))
+            holding_equities[holding_type] = {store.labels[holding_id]: float(equity) for holding_id, equity in
+                                              zip(store.column("holding_id")[latest_rows], store.column("equity")[latest_rows])}
+
+        self.snapshot = Holdings.Snapshot(version=self.snapshot.version + 1, update_time=update_time,
+                                          series={holding_type: (equity_series.times(), equity_series.equities())
+                                                  for holding_type, equity_series in self.equity_series_buffers.items()},
+                                          holding_equities=holding_equities,
+                                          rollups={holding_type: self.get_rollup(key=holding_type).view()
+                                                   for holding_type in Holdings.HOLDING_TYPE})
+
+    def get_rollup(self, key: Union[Holdings.HOLDING_TYPE, Tuple[Holdings.HOLDING_TYPE, str]]) -> MultiResolutionRollup:
+        """Returns the rollup of a holding type, or of a (holding type, label) holding, creating it if needed.
+
+        Args:
+            key (Union[Holdings.HOLDING_TYPE, Tuple[Holdings.HOLDING_TYPE, str]]): Holding type or holding.
+
+        Returns:
+            MultiResolutionRollup: Rollup of the key."""
+        rollup = self.rollups.get(key)
+        if rollup is None:
+            rollup = self.rollups[key] = MultiResolutionRollup()
+        return rollup
+
+    def update_rollups(self, update_time: float, first_rows: Dict[Holdings.HOLDING_TYPE, int],
+                       tick_equities: Dict[Holdings.HOLDING_TYPE, Union[float, None]]) -> None:
+        """Folds a committed tick into the per-holding and per-holding-type rollups.
+
+        Args:
+            update_time (float): Epoch time of the tick.
+            first_rows (Dict[Holdings.HOLDING_TYPE, int]): Size of every store before the tick was committed.
+            tick_equities (Dict[Holdings.HOLDING_TYPE, Union[float, None]]): Total equity of every holding type this tick."""
+        for holding_type, store in self.tick_stores.items():
+            holding_ids: ndarray = store.column("holding_id")[first_rows[holding_type]:]
+            equities: ndarray = store.column("equity")[first_rows[holding_type]:]
+            for holding_id, equity in zip(holding_ids, equities):
+                self.get_rollup(key=(holding_type, store.labels[holding_id])).update(update_time=update_time, value=equity)
+
+        recorded_equities: List[float] = []
+        for holding_type, equity in tick_equities.items():
+            if equity is not None:
+                self.get_rollup(key=holding_type).update(update_time=update_time, value=equity)
+                recorded_equities.append(equity)
+        if len(recorded_equities) > 0:
+            self.get_rollup(key=Holdings.HOLDING_TYPE.ALL).update(update_time=update_time, value=sum(recorded_equities))
+
+    def rebuild_rollups(self, history: HistoryFile, now: float) -> None:
+        """Rebuilds every rollup from the memory-mapped history with vectorized reductions.
+
+        Records are read HISTORY_SLICE_RECORDS at a time, cut on tick boundaries. When raw ticks are compacted the
+        rollup retentions are applied after every slice, so the finest resolution never holds more than its retention.
+
+        Args:
+            history (HistoryFile): History to rebuild from. Store labels must already be set.
+            now (float): Current epoch time the retentions are applied against."""
+        self.rollups = {}
+        records: ndarray = history.records()
+        index: ndarray = history.index()
+        tick_firsts: ndarray = array(index["first_record"], dtype=int64)
+        tick_ends: ndarray = tick_firsts + array(index["record_count"], dtype=int64)
+
+        first_tick: int = 0
+        while first_tick < len(index):
+            last_tick: int = max(int(searchsorted(tick_ends, tick_firsts[first_tick] + Holdings.HISTORY_SLICE_RECORDS, side="right")),
+                                 first_tick + 1)
+            slice_records: ndarray = records[tick_firsts[first_tick]:tick_ends[last_tick - 1]]
+            slice_stores: ndarray = array(slice_records["store"])
+            slice_times: ndarray = array(slice_records["datetime"])
+            slice_holding_ids: ndarray = array(slice_records["holding_id"])
+            slice_equities: ndarray = array(slice_records["equity"])
+
+            for holding_type, store in self.tick_stores.items():
+                store_rows: ndarray = slice_stores == Holdings.history_store_code(holding_type=holding_type)
+                if not store_rows.any():
+                    continue
+                store_times: ndarray = slice_times[store_rows]
+                store_holding_ids: ndarray = slice_holding_ids[store_rows]
+                store_equities: ndarray = slice_equities[store_rows]
+
+                for holding_id in flatnonzero(bincount(store_holding_ids)):
+                    holding_rows: ndarray = store_holding_ids == holding_id
+                    self.get_rollup(key=(holding_type, store.labels[holding_id])).extend(times=store_times[holding_rows],
+                                                                                         values=store_equities[holding_rows])
+
+                store_tick_starts: ndarray = flatnonzero(diff(store_times, prepend=-inf))
+                self.get_rollup(key=holding_type).extend(times=store_times[store_tick_starts],
+                                                         values=add.reduceat(nan_to_num(store_equities), store_tick_starts))
+
+            self.get_rollup(key=Holdings.HOLDING_TYPE.ALL).extend(
+                times=index["datetime"][first_tick:last_tick],
+                values=add.reduceat(nan_to_num(slice_equities), tick_firsts[first_tick:last_tick] - tick_firsts[first_tick]))
+
+            if self.raw_tick_horizon is not None:
+                for rollup in self.rollups.values():
+                    rollup.compact(now=now)
+            first_tick = last_tick
+
+    def compact(self, now: Union[float, None] = None) -> None:
+        """Drops raw ticks older than raw_tick_horizon and applies the rollup retentions.
+
+        Must be called with self.lock held. Older history remains available through query_equity's rollups.
+
+        Args:
+            now (Union[float, None], optional): Current epoch time. Defaults to now."""
+        now = time() if now is None else now
+
+        if self.raw_tick_horizon is not None:
+            for store in self.tick_stores.values():
+                store.drop_before(cutoff_time=now - self.raw_tick_horizon)
+            for equity_series in self.equity_series_buffers.values():
+                equity_series.drop_before(cutoff_time=now - self.raw_tick_horizon)
+
+        for rollup in self.rollups.values():
+            rollup.compact(now=now)
+
+        self.last_compaction = now
+
+    def query_equity(self, holding_type: Holdings.HOLDING_TYPE, start: Union[float, None] = None,
+                     end: Union[float, None] = None, max_points: int = DEFAULT_MAX_POINTS,
+                     holding_label: Union[str, None] = None) -> Tuple[ndarray, ndarray]:
+        """Equity over [start, end] at the finest resolution that fits the point budget.
+
+        Raw ticks are returned when they cover the range within max_points; otherwise the 1-minute, 1-hour or
+        1-day rollup whose bucket count fits is used, reporting each bucket's low and high.
+
+        Args:
+            holding_type (Holdings.HOLDING_TYPE): Holding type to query.
+            start (Union[float, None], optional): Earliest epoch time. Defaults to the first recorded time.
+            end (Union[float, None], optional): Latest epoch time. Defaults to now.
+            max_points (int, optional): Point budget. Defaults to DEFAULT_MAX_POINTS.
+            holding_label (Union[str, None], optional): Single holding of holding_type to query. Defaults to None.
+
+        Returns:
+            Tuple[ndarray, ndarray]: Times and equities."""
+        end = time() if end is None else end
+        rollup: MultiResolutionRollup = self.get_rollup(key=holding_type if holding_label is None else (holding_type, holding_label))
+
+        if holding_label is None:
+            raw_times, raw_equities = self.equity_series(holding_type=holding_type)
+        else:
+            store: TickStore = self.tick_stores[holding_type]
+            holding_rows: ndarray = store.column("holding_id") == store.label_ids.get(holding_label, -1)
+            raw_times, raw_equities = store.column("datetime")[holding_rows], store.column("equity")[holding_rows]
+
+        return Holdings.query_series(raw_times=raw_times, raw_equities=raw_equities, rollup=rollup.view(),
+                                     start=start, end=end, max_points=max_points)
+
+    @staticmethod
+    def query_series(raw_times: ndarray, raw_equities: ndarray, rollup: MultiResolutionRollup.View,
+                     start: Union[float, None], end: float, max_points: int) -> Tuple[ndarray, ndarray]:
+        """Raw ticks over [start, end] when they cover it within max_points, the rollup's min/max envelope otherwise.
+
+        The envelope holds two points per bucket, the bucket's low and high ordered so the line ends each bucket on the
+        side of its close, at the finest resolution with at most max_points / 2 buckets.
+
+        Args:
+            raw_times (ndarray): Sorted times of the raw ticks still held.
+            raw_equities (ndarray): Equities matching raw_times.
+            rollup (MultiResolutionRollup.View): Rollup of the same equity.
+            start (Union[float, None]): Earliest epoch time. None for the first recorded time.
+            end (float): Latest epoch time.
+            max_points (int): Point budget.
+
+        Returns:
+            Tuple[ndarray, ndarray]: Times and equities."""
+        # The rollups saw every tick ever recorded, so their first observation is the first recorded time.
+        first_times: List[float] = ([float(raw_times[0])] if len(raw_times) > 0 else []) + \
+            ([rollup.first_time] if rollup.first_time is not None else [])
+        first_time: float = min(first_times, default=end)
+        start = first_time if start is None else start
+
+        first_raw = int(searchsorted(raw_times, start, side="left"))
+        last_raw = int(searchsorted(raw_times, end, side="right"))
+        raw_covers_start = len(raw_times) > 0 and raw_times[0] <= max(start, first_time)
+        if raw_covers_start and last_raw - first_raw <= max_points:
+            return raw_times[first_raw:last_raw], raw_equities[first_raw:last_raw]
+
+        # Every bucket is drawn as its low and high, so spikes inside a bucket survive.
+        bucket_times, ohlc = rollup.query(start=start, end=end, max_points=max(max_points // 2, 1))
+        rising: ndarray = ohlc["close"] >= ohlc["open"]
+        envelope: ndarray = column_stack((where(rising, ohlc["low"], ohlc["high"]), where(rising, ohlc["high"], ohlc["low"]))).ravel()
+        return repeat(bucket_times, 2), envelope
+
     def calculate_equity(self, holding_type: Union[str, Holdings.HOLDING_TYPE] = "all", verbose: bool = False) -> float:
         """[summary]
 
@@ -130,12 +722,9 @@ class Holdings(object):
         if type(holding_type) == str:
             holding_type: Holdings.HOLDING_TYPE = Holdings.HOLDING_TYPE(holding_type)
 
-        if holding_type == Holdings.HOLDING_TYPE.STOCK or holding_type == Holdings.HOLDING_TYPE.ALL:
-            equity += Holdings.calculate_holding_equity(holdings=self.stocks, verbose=verbose)
-        if holding_type == Holdings.HOLDING_TYPE.CRYPTOCURRENCY or holding_type == Holdings.HOLDING_TYPE.ALL:
-            equity += Holdings.calculate_holding_equity(holdings=self.cryptocoins, verbose=verbose)
-        if holding_type == Holdings.HOLDING_TYPE.CHECKING or holding_type == Holdings.HOLDING_TYPE.ALL:
-            equity += Holdings.calculate_holding_equity(holdings=self.checking_accounts, verbose=verbose)
+        for position_type, positions in self.positions.items():
+            if holding_type == position_type or holding_type == Holdings.HOLDING_TYPE.ALL:
+                equity += Holdings.calculate_holding_equity(holdings=positions, verbose=verbose)
         if (holding_type == Holdings.HOLDING_TYPE.FLOATING_USD or holding_type == Holdings.HOLDING_TYPE.ALL) and self.floating_usd is not None:
             equity += Holdings.calculate_holding_equity(holdings=self.floating_usd, verbose=verbose)
 
@@ -145,107 +734,110 @@ class Holdings(object):
 
         return equity
 
-    def sum_equities(self, holding_type: Holdings.HOLDING_TYPE, time: float) -> float:
-        total_equity = 0.
+    def get_stores(self, holding_type: Holdings.HOLDING_TYPE) -> List[TickStore]:
+        """Returns the tick stores that make up a holding type.
 
-        if holding_type == Holdings.HOLDING_TYPE.CRYPTOCURRENCY or holding_type == Holdings.HOLDING_TYPE.ALL:
-            crypto_at_time: DataFrame = self.crypto_df[self.crypto_df.datetime == time]
-            crypto_equity = crypto_at_time.quantity * crypto_at_time.price
-            total_equity += crypto_equity.sum()
+        Args:
+            holding_type (Holdings.HOLDING_TYPE): Holding type to look up.
 
-        if holding_type == Holdings.HOLDING_TYPE.STOCK or holding_type == Holdings.HOLDING_TYPE.ALL:
-            stocks_at_time: DataFrame = self.stocks_df[self.stocks_df.datetime == time]
-            stock_equity = stocks_at_time.quantity * stocks_at_time.price
-            total_equity += stock_equity.sum()
+        Returns:
+            List[TickStore]: Stores contributing to the holding type."""
+        stores: List[TickStore] = []
 
+        if holding_type == Holdings.HOLDING_TYPE.STOCK or holding_type == Holdings.HOLDING_TYPE.ALL:
+            stores.append(self.stocks_store)
+        if holding_type == Holdings.HOLDING_TYPE.CRYPTOCURRENCY or holding_type == Holdings.HOLDING_TYPE.ALL:
+            stores.append(self.crypto_store)
         if holding_type == Holdings.HOLDING_TYPE.CHECKING or holding_type == Holdings.HOLDING_TYPE.ALL:
-            total_equity += self.checking_account_df[self.checking_account_df.datetime == time]['equity'].sum()
-
+            stores.append(self.checking_account_store)
         if holding_type == Holdings.HOLDING_TYPE.FLOATING_USD or holding_type == Holdings.HOLDING_TYPE.ALL:
-            total_equity += self.floating_usd_df[self.floating_usd_df.datetime == time]['equity'].sum()
-        
-        return total_equity
+            stores.append(self.floating_usd_store)
+
+        return stores
+
+    def sum_equities(self, holding_type: Holdings.HOLDING_TYPE, time: float) -> float:
+        """Total equity of a holding type at a single tick time.
+
+        Args:
+            holding_type (Holdings.HOLDING_TYPE): Holding type to sum.
+            time (float): Tick time.
+
+        Returns:
+            float: Total equity at the given time."""
+        return float(self.calculate_holding_equities(holding_type=holding_type, times=array([time]))[0])
 
     def calculate_holding_equities(self, holding_type: Holdings.HOLDING_TYPE, times: array) -> array:
-        """[summary]
+        """Per-timestamp equity of a holding type, aggregated with one grouped pass per store.
 
         Args:
-            holding_type (Holdings.HOLDING_TYPE): [description]
-            times (array): [description]
+            holding_type (Holdings.HOLDING_TYPE): Holding type to aggregate.
+            times (array): Sorted tick times to aggregate onto.
 
         Returns:
-            array: [description]"""
-        return array([self.sum_equities(holding_type=holding_type, time=time) for time in times])
+            array: Total equity at each of the given times."""
+        equity_series: EquitySeries = self.equity_series_buffers[holding_type]
+        if equity_series.owns_times(times=times):
+            return equity_series.equities()
+
+        equities: ndarray = zeros(len(times), dtype=float64)
+
+        for store in self.get_stores(holding_type=holding_type):
+            equities += store.equity_by_time(times=times)
+
+        return equities
 
     def get_times(self, holding_type: Holdings.HOLDING_TYPE) -> array:
-        """[summary]
+        """Sorted distinct tick times recorded for a holding type.
 
         Args:
-            holding_type (Holdings.HOLDING_TYPE): [description]
+            holding_type (Holdings.HOLDING_TYPE): Holding type to look up.
 
         Returns:
-            [type]: [description]"""
-        if holding_type == Holdings.HOLDING_TYPE.ALL:
-            stock_times = self.stocks_df['datetime'].unique().tolist()
-            crypto_times = self.crypto_df['datetime'].unique().tolist()
-            checking_times = self.checking_account_df['datetime'].unique().tolist()
-            floating_times = self.floating_usd_df['datetime'].unique().tolist()
-            return array(sorted(list(set(stock_times + crypto_times + checking_times + floating_times))))
-        elif holding_type == Holdings.HOLDING_TYPE.STOCK:
-            return array(self.stocks_df['datetime'].unique())
-        elif holding_type == Holdings.HOLDING_TYPE.CRYPTOCURRENCY:
-            return array(self.crypto_df['datetime'].unique())
-        elif holding_type == Holdings.HOLDING_TYPE.CHECKING:
-            return array(self.checking_account_df['datetime'].unique())
-        elif holding_type == Holdings.HOLDING_TYPE.FLOATING_USD:
-            return array(self.floating_usd_df['datetime'].unique())
+            array: Sorted tick times."""
+        return self.equity_series_buffers[holding_type].times()
 
-    @staticmethod
-    def calculate_holding_equity(holdings: Union[Dict[str, Holdings.Stock],
-                                                 Dict[str, Holdings.Cryptocoin], 
-                                                 Dict[str, Holdings.CheckingAccount],
-                                                 Dict[str, float]],
-                                 verbose: bool = False) -> float:
-        """[summary]
+    def equity_series(self, holding_type: Holdings.HOLDING_TYPE) -> Tuple[ndarray, ndarray]:
+        """Tick times and matching total equities of a holding type, ready to plot.
 
         Args:
-            holdings (Union[Dict[str, Holdings.Stock], 
-                            Dict[str, Holdings.Cryptocoin], 
-                            Dict[str, Holdings.CheckingAccount], 
-                            Dict[str, Holdings.FloatingUSD]]): [description]
-            verbose (bool, optional): [description]. Defaults to False.
+            holding_type (Holdings.HOLDING_TYPE): Holding type to aggregate.
 
         Returns:
-            float: [description]"""
-        total_equity: float = 0.
-        if len(holdings.keys()) > 0:
-            equity_type: Callable = type(holdings[list(holdings.keys())[0]])
-        else:
-            return 0.
+            Tuple[ndarray, ndarray]: Times and equities."""
+        equity_series: EquitySeries = self.equity_series_buffers[holding_type]
+        return equity_series.times(), equity_series.equities()
 
-        for holding_name, holding in holdings.items():
-            if equity_type == float or equity_type == int:
-                holding_equity = holding
-            else:
-                holding_equity = holding.calculate_equity()
-            total_equity += holding_equity
+    @staticmethod
+    def calculate_holding_equity(holdings: Union[PositionTable, Dict[str, float]], verbose: bool = False) -> float:
+        """Total equity of a position table or of floating USD, computed with one vectorized multiply and sum.
 
-            Logger.verbose_console_log(verbose=verbose,
-                                       message=str(holding_name) + " has a " + str(equity_type) + " value of " + "$%.2f" % holding_equity,
-                                       message_type=Message.MESSAGE_TYPE.STATUS)
+        Positions whose price is not known yet are left out of the total.
+
+        Args:
+            holdings (Union[PositionTable, Dict[str, float]]): Positions of one holding type, or USD by float location.
+            verbose (bool, optional): Log the total. Defaults to False.
+
+        Returns:
+            float: Total equity."""
+        if isinstance(holdings, PositionTable):
+            total_equity: float = holdings.total_equity()
+        else:
+            total_equity = float(nansum(fromiter(holdings.values(), dtype=float64, count=len(holdings))))
 
         Logger.verbose_console_log(verbose=verbose,
-                                   message=str(Holdings) + " has calculated a total " + str(equity_type) + " equity of " + "$%.2f" % total_equity,
+                                   message=str(Holdings) + " has calculated a total equity of " + "$%.2f" % total_equity + " over " + str(len(holdings)) + " holdings",
                                    message_type=Message.MESSAGE_TYPE.SUCCESS)
 
         return total_equity
 
     @staticmethod
-    def load(holding_file_name: str, file_name_cipher: VigenereCipher, data_cipher: VigenereCipher, mint: Union[Mint, None]) -> Holdings:
+    def load(holding_file_name: str, file_name_cipher: VigenereCipher, data_cipher: VigenereCipher, mint: Union[Mint, None],
+             raw_tick_horizon: Union[float, None] = None) -> Holdings:
         """[summary]
 
         Args:
             holding_file_name (str): [description]
+            raw_tick_horizon (Union[float, None], optional): Seconds of raw ticks kept in memory. Defaults to keeping every tick.
 
         Returns:
             Holdings: [description]"""
@@ -285,10 +877,16 @@ class Holdings(object):
         return Holdings(stocks=stocks,
                         cryptocoins=crypto, 
                         checking_accounts=checking_accounts,
-                        floating_usd=floating_usd)
+                        floating_usd=floating_usd,
+                        raw_tick_horizon=raw_tick_horizon)
 
     class Holding(ABC, object):
-        """[summary]"""
+        """[summary]
+
+        Numeric state lives in a row of a PositionTable, a private one-row table until Holdings adopts the holding
+        into the shared table of its type."""
+        __slots__ = ("table", "row")
+
         @abstractclassmethod
         def __str__(self) -> str:
             """[summary]
@@ -323,6 +921,11 @@ class Holdings(object):
 
     class Cryptocoin(Holding):
         """[summary]"""
+        __slots__ = ("name", "coin", "unrealized_rewards")
+        quantity = position_field("quantity")
+        investment = position_field("investment")
+        price = position_field("price", optional=True)
+
         def __init__(self, name: str, coin: str, quantity: float, investment: float,
                      unrealized_rewards: float = 0.0):
             """Constructor.
@@ -333,12 +936,11 @@ class Holdings(object):
                 investment (float): [description]
                 gain (float): [description]
                 unrealized_rewards (float, optional): [description]. Defaults to 0.0."""
+            self.table: PositionTable = PositionTable(capacity=1)
+            self.row: int = self.table.add(symbol=coin, quantity=quantity, investment=investment)
             self.name: str = name
             self.coin: str = coin
-            self.quantity: float = quantity
             self.unrealized_rewards: float = unrealized_rewards
-            self.investment: float = investment
-            self.price = None
 
         def __str__(self) -> str:
             """[summary]
@@ -392,6 +994,11 @@ class Holdings(object):
 
     class Stock(Holding):
         """[summary]"""
+        __slots__ = ("symbol", "name")
+        quantity = position_field("quantity")
+        cost_basis_per_share = position_field("cost_basis")
+        price = position_field("price", optional=True)
+
         def __init__(self, symbol: str, name: str, 
                      quantity: float, cost_basis_per_share: float):
             """Constructor.
@@ -401,11 +1008,10 @@ class Holdings(object):
                 name (str): [description]
                 quantity (float): [description]
                 cost_basis_per_share (float): [description]"""
+            self.table: PositionTable = PositionTable(capacity=1)
+            self.row: int = self.table.add(symbol=symbol, quantity=quantity, cost_basis=cost_basis_per_share)
             self.symbol = symbol
             self.name = name
-            self.quantity = quantity
-            self.cost_basis_per_share = cost_basis_per_share
-            self.price: Union[float, None] = None
 
         def __str__(self) -> str:
             """[summary]
@@ -455,15 +1061,21 @@ class Holdings(object):
             return ["datetime", "stock", "cost_basis_per_share", "quantity", "price"]
 
     class CheckingAccount(Holding):
-        """[summary]"""
+        """[summary]
+
+        The balance is kept as the price of a single unit so its equity follows the same vectorized multiply."""
+        __slots__ = ("name",)
+        equity = position_field("price")
+
         def __init__(self, name: str, equity: float):
             """Constructor.
 
             Args:
                 name (str): [description]
                 balance (float): [description]"""
+            self.table: PositionTable = PositionTable(capacity=1)
+            self.row: int = self.table.add(symbol=name, quantity=1., price=equity)
             self.name = name
-            self.equity = equity
 
         def __str__(self) -> str:
             """[summary]
@@ -509,7 +1121,77 @@ class Holdings(object):
 
             assert len(matching_account_data) == 1, "An unexpected number of matching account data was found: " + str(len(matching_account_data))
 
-            self.equity = matching_account_data[0]['amount']
+            self.equity = matching_account_data[0]['value']
+
+    class Snapshot(object):
+        """Immutable state of Holdings as of one committed tick."""
+        __slots__ = ("version", "update_time", "series", "holding_equities", "rollups")
+
+        def __init__(self, version: int, update_time: Union[float, None],
+                     series: Dict[Holdings.HOLDING_TYPE, Tuple[ndarray, ndarray]],
+                     holding_equities: Dict[Holdings.HOLDING_TYPE, Dict[str, float]],
+                     rollups: Dict[Holdings.HOLDING_TYPE, MultiResolutionRollup.View]):
+            """Constructor.
+
+            Args:
+                version (int): Number of commits published before this one plus one.
+                update_time (Union[float, None]): Epoch time of the tick, None before the first tick.
+                series (Dict[Holdings.HOLDING_TYPE, Tuple[ndarray, ndarray]]): Read-only times and equities per holding type.
+                holding_equities (Dict[Holdings.HOLDING_TYPE, Dict[str, float]]): Equity of every holding at the tick.
+                rollups (Dict[Holdings.HOLDING_TYPE, MultiResolutionRollup.View]): Rollup views per holding type."""
+            object.__setattr__(self, "version", version)
+            object.__setattr__(self, "update_time", update_time)
+            object.__setattr__(self, "series", series)
+            object.__setattr__(self, "holding_equities", holding_equities)
+            object.__setattr__(self, "rollups", rollups)
+
+        def __setattr__(self, name: str, value: Any) -> None:
+            raise AttributeError(f"{type(self).__name__} is immutable.")
+
+        def get_series(self, holding_type: Holdings.HOLDING_TYPE) -> Tuple[ndarray, ndarray]:
+            """Times and equities of a holding type.
+
+            Args:
+                holding_type (Holdings.HOLDING_TYPE): Holding type to look up.
+
+            Returns:
+                Tuple[ndarray, ndarray]: Times and equities, empty before the first tick."""
+            empty_series: ndarray = zeros(0, dtype=float64)
+            return self.series.get(holding_type, (empty_series, empty_series))
+
+        def calculate_equity(self, holding_type: Holdings.HOLDING_TYPE) -> float:
+            """Total equity of a holding type at the tick.
+
+            Args:
+                holding_type (Holdings.HOLDING_TYPE): Holding type to sum.
+
+            Returns:
+                float: Total equity."""
+            times, equities = self.get_series(holding_type=holding_type)
+            return float(equities[-1]) if len(times) > 0 and times[-1] == self.update_time else 0.
+
+        def query_equity(self, holding_type: Holdings.HOLDING_TYPE, start: Union[float, None] = None,
+                         end: Union[float, None] = None, max_points: Union[int, None] = None) -> Tuple[ndarray, ndarray]:
+            """Equity of a holding type over [start, end] at the finest resolution that fits the point budget.
+
+            Same as Holdings.query_equity, but served from this snapshot without the holdings lock.
+
+            Args:
+                holding_type (Holdings.HOLDING_TYPE): Holding type to query.
+                start (Union[float, None], optional): Earliest epoch time. Defaults to the first recorded time.
+                end (Union[float, None], optional): Latest epoch time. Defaults to the time of the snapshot.
+                max_points (Union[int, None], optional): Point budget. Defaults to Holdings.DEFAULT_MAX_POINTS.
+
+            Returns:
+                Tuple[ndarray, ndarray]: Times and equities."""
+            max_points = Holdings.DEFAULT_MAX_POINTS if max_points is None else max_points
+            raw_times, raw_equities = self.get_series(holding_type=holding_type)
+            rollup: Union[MultiResolutionRollup.View, None] = self.rollups.get(holding_type)
+            if rollup is None:
+                rollup = MultiResolutionRollup().view()
+            end = (time() if self.update_time is None else self.update_time) if end is None else end
+            return Holdings.query_series(raw_times=raw_times, raw_equities=raw_equities, rollup=rollup,
+                                         start=start, end=end, max_points=max_points)
 
     @unique
     class HOLDING_TYPE(Enum):
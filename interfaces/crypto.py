@@ -4,14 +4,19 @@
 __author__ = "Jacob T. Cassady"
 __email__ = "jacobtaylorcassady@outlook.com"
 
-from typing import Union
-from time import sleep
+from typing import Union, Dict, List
 
 from cryptocompare import get_price
 from StatusLogger import Logger, Message
 
 from accounts.binance_us_account import BinanceAccount
 from accounts.coinbase_account import CoinbaseAccount
+from utilities.retry import CircuitBreaker, PriceUnavailableError, LAST_KNOWN_PRICES, PRICE_RETRY_SCHEDULER
+from utilities.quote_cache import QuoteCache, QUOTE_CACHE
+
+CRYPTOCOMPARE_BREAKER: CircuitBreaker = CircuitBreaker(name="cryptocompare")
+BINANCE_BREAKER: CircuitBreaker = CircuitBreaker(name="binance")
+COINBASE_BREAKER: CircuitBreaker = CircuitBreaker(name="coinbase")
 
 def get_crypto_price(coin_name: str, binance_account: Union[None, BinanceAccount] = None, 
                      coinbase_account: Union[None, CoinbaseAccount] = None) -> float:
@@ -22,27 +27,132 @@ def get_crypto_price(coin_name: str, binance_account: Union[None, BinanceAccount
         binance_account (Union[None, BinanceAccount], optional): [description]. Defaults to None.
         coinbase_account (Union[None, CoinbaseAccount], optional): [description]. Defaults to None.
 
+    Raises:
+        PriceUnavailableError: Every provider failed and no previous price is known.
+
     Returns:
         float: [description]"""
-    try:
-        return get_price(coin_name, "USD")[coin_name]["USD"]
-    except Exception as error:
-        Logger.console_log(message=f"Exception {error} found when attempting to get price from cryptocompare.",
-                            message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+    prices: Dict[str, float] = get_crypto_prices(coin_names=[coin_name], binance_account=binance_account,
+                                                 coinbase_account=coinbase_account)
+    if coin_name not in prices:
+        raise PriceUnavailableError(f"No crypto price is known for {coin_name}.")
+    return prices[coin_name]
+
+def get_crypto_prices(coin_names: List[str], binance_account: Union[None, BinanceAccount] = None,
+                      coinbase_account: Union[None, CoinbaseAccount] = None) -> Dict[str, float]:
+    """Fetches the USD price of a basket of coins with one request per provider, never blocking on a failure.
+
+    Fresh prices are served from the shared quote cache. Coins no provider could price are retried in the background and are returned as their last known price,
+    marked as a StalePrice, when one exists. A successful retry is cached for QuoteCache.RETRY_TTLS so the next tick reads it.
+
+    Args:
+        coin_names (List[str]): Coin symbols to price.
+        binance_account (Union[None, BinanceAccount], optional): [description]. Defaults to None.
+        coinbase_account (Union[None, CoinbaseAccount], optional): [description]. Defaults to None.
+
+    Returns:
+        Dict[str, float]: Prices by coin symbol. Coins without a fresh or last known price are left out."""
+    prices: Dict[str, float] = QUOTE_CACHE.get_many(asset_class="crypto", keys=list(coin_names),
+                                                    fetch_many=lambda missing_coin_names: fetch_crypto_prices(coin_names=missing_coin_names,
+                                                                                                              binance_account=binance_account,
+                                                                                                              coinbase_account=coinbase_account))
+
+    for coin_name in coin_names:
+        if coin_name in prices:
+            continue
 
-    if binance_account is not None:
+        PRICE_RETRY_SCHEDULER.schedule(key=("crypto", coin_name),
+                                       retry=lambda coin_name=coin_name: QUOTE_CACHE.put(asset_class="crypto", key=coin_name,
+                                                                                         value=fetch_crypto_price(coin_name=coin_name,
+                                                                                                                  binance_account=binance_account,
+                                                                                                                  coinbase_account=coinbase_account),
+                                                                                         ttl=QuoteCache.RETRY_TTLS["crypto"]))
         try:
-            return float(binance_account.interface.get_ticker(symbol=coin_name+"USD")['lastPrice'])
+            prices[coin_name] = LAST_KNOWN_PRICES.get_stale(asset_class="crypto", symbol=coin_name)
+        except PriceUnavailableError as error:
+            Logger.console_log(message=str(error), message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+
+    return prices
+
+def fetch_crypto_price(coin_name: str, binance_account: Union[None, BinanceAccount] = None,
+                       coinbase_account: Union[None, CoinbaseAccount] = None) -> float:
+    """Fetches a single coin once, raising when no provider returns a price.
+
+    Args:
+        coin_name (str): [description]
+        binance_account (Union[None, BinanceAccount], optional): [description]. Defaults to None.
+        coinbase_account (Union[None, CoinbaseAccount], optional): [description]. Defaults to None.
+
+    Raises:
+        PriceUnavailableError: No provider returned a price.
+
+    Returns:
+        float: [description]"""
+    prices: Dict[str, float] = fetch_crypto_prices(coin_names=[coin_name], binance_account=binance_account,
+                                                   coinbase_account=coinbase_account)
+    if coin_name not in prices:
+        raise PriceUnavailableError(f"No provider returned a price for {coin_name}.")
+    return prices[coin_name]
+
+def fetch_crypto_prices(coin_names: List[str], binance_account: Union[None, BinanceAccount] = None,
+                        coinbase_account: Union[None, CoinbaseAccount] = None) -> Dict[str, float]:
+    """Fetches a basket of coins once across all providers whose circuit breaker is closed.
+
+    cryptocompare is asked for the whole basket at once, coins it does not return are looked up in a single
+    binance ticker snapshot, and only the coins still missing after that fall back to one coinbase request each.
+    Every fetched price is recorded as the last known price.
+
+    Args:
+        coin_names (List[str]): Coin symbols to price.
+        binance_account (Union[None, BinanceAccount], optional): [description]. Defaults to None.
+        coinbase_account (Union[None, CoinbaseAccount], optional): [description]. Defaults to None.
+
+    Returns:
+        Dict[str, float]: Fresh prices by coin symbol. Coins no provider could price are left out."""
+    prices: Dict[str, float] = {}
+    if len(coin_names) == 0:
+        return prices
+
+    if CRYPTOCOMPARE_BREAKER.allow_request():
+        try:
+            cryptocompare_prices = get_price(list(coin_names), "USD")
+            for coin_name in coin_names:
+                if coin_name in cryptocompare_prices and "USD" in cryptocompare_prices[coin_name]:
+                    prices[coin_name] = float(cryptocompare_prices[coin_name]["USD"])
+            CRYPTOCOMPARE_BREAKER.record_success()
         except Exception as error:
-            Logger.console_log(message=f"Exception {error} found when attempting to get price from binance.",
-                                message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+            CRYPTOCOMPARE_BREAKER.record_failure()
+            Logger.console_log(message=f"Exception {error} found when attempting to get prices from cryptocompare.",
+                               message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+
+    missing_coin_names: List[str] = [coin_name for coin_name in coin_names if coin_name not in prices]
 
-    if coinbase_account is not None:
+    if len(missing_coin_names) > 0 and binance_account is not None and BINANCE_BREAKER.allow_request():
         try:
-            return float(coinbase_account.interface.get_buy_price(currency_pair=coin_name+"-USD")['amount'])
+            ticker_prices: Dict[str, str] = {ticker['symbol']: ticker['price'] for ticker in binance_account.interface.get_cached_tickers()}
+            for coin_name in missing_coin_names:
+                if coin_name + "USD" in ticker_prices:
+                    prices[coin_name] = float(ticker_prices[coin_name + "USD"])
+            BINANCE_BREAKER.record_success()
         except Exception as error:
-            Logger.console_log(message=f"Exception {error} found when attempting to get price from coinbase.",
-                            message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+            BINANCE_BREAKER.record_failure()
+            Logger.console_log(message=f"Exception {error} found when attempting to get prices from binance.",
+                               message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+        missing_coin_names = [coin_name for coin_name in missing_coin_names if coin_name not in prices]
+
+    if len(missing_coin_names) > 0 and coinbase_account is not None:
+        for coin_name in missing_coin_names:
+            if not COINBASE_BREAKER.allow_request():
+                break
+            try:
+                prices[coin_name] = float(coinbase_account.interface.get_buy_price(currency_pair=coin_name+"-USD")['amount'])
+                COINBASE_BREAKER.record_success()
+            except Exception as error:
+                COINBASE_BREAKER.record_failure()
+                Logger.console_log(message=f"Exception {error} found when attempting to get price of {coin_name} from coinbase.",
+                                   message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+
+    for coin_name, price in prices.items():
+        LAST_KNOWN_PRICES.record(asset_class="crypto", symbol=coin_name, price=price)
 
-    sleep(5 * 60)
-    return get_crypto_price(coin_name=coin_name, binance_account=binance_account, coinbase_account=coinbase_account)
+    return prices
@@ -1,25 +1,61 @@
-from time import sleep
+from typing import Union
 
 from pandas import DataFrame
 from yahoo_fin.stock_info import get_live_price, get_data
 from StatusLogger import Logger, Message
 
+from utilities.retry import CircuitBreaker, LAST_KNOWN_PRICES, PRICE_RETRY_SCHEDULER
+from utilities.quote_cache import QuoteCache, QUOTE_CACHE
+
+# yahoo_fin is shared by every symbol, so only transport errors (requests errors are OSErrors) count against it.
+STOCK_PRICE_BREAKER: CircuitBreaker = CircuitBreaker(name="yahoo_fin", failure_types=(OSError,))
+
+def fetch_stock_price(symbol: str) -> float:
+    """Fetches a live stock price once, recording it as the last known price.
+
+    Args:
+        symbol (str): [description]
+
+    Returns:
+        float: [description]"""
+    price: float = float(get_live_price(symbol))
+    LAST_KNOWN_PRICES.record(asset_class="stock", symbol=symbol, price=price)
+    return price
+
 def get_stock_price(symbol: str) -> float:
-    """[summary]
+    """Returns the live price of a stock without ever blocking on a failure.
+
+    Prices are served from the shared quote cache while fresh. When yahoo_fin fails or its circuit breaker is open
+    the last known price is returned as a StalePrice and the lookup is retried in the background. A successful retry
+    is cached for QuoteCache.RETRY_TTLS so the next tick reads it.
 
     Args:
         symbol (str): [description]
 
+    Raises:
+        PriceUnavailableError: The lookup failed and no previous price is known.
+
     Returns:
-        DataFrame: [description]"""
-    try:
-        price: float = get_live_price(symbol)
-        return price
-    except Exception as error:
-        Logger.console_log(message="Exception {} encountered when attempting to get price for symbol {}. Sleeping and trying again.".format(error, symbol),
-                           message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
-        sleep(120)
-        return get_stock_price(symbol=symbol)
+        float: [description]"""
+    cached_price: Union[float, None] = QUOTE_CACHE.peek(asset_class="stock", key=symbol)
+    if cached_price is not None:
+        return cached_price
+
+    if STOCK_PRICE_BREAKER.allow_request():
+        try:
+            price: float = QUOTE_CACHE.get(asset_class="stock", key=symbol, fetch=lambda: fetch_stock_price(symbol=symbol))
+            STOCK_PRICE_BREAKER.record_success()
+            return price
+        except Exception as error:
+            STOCK_PRICE_BREAKER.record_failure(error=error)
+            Logger.console_log(message="Exception {} encountered when attempting to get price for symbol {}. Retrying in the background.".format(error, symbol),
+                               message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+
+    PRICE_RETRY_SCHEDULER.schedule(key=("stock", symbol),
+                                   retry=lambda: QUOTE_CACHE.put(asset_class="stock", key=symbol, value=fetch_stock_price(symbol=symbol),
+                                                                 ttl=QuoteCache.RETRY_TTLS["stock"]),
+                                   breaker=STOCK_PRICE_BREAKER)
+    return LAST_KNOWN_PRICES.get_stale(asset_class="stock", symbol=symbol)
         
 
 def get_stock_data(symbol: str) -> DataFrame:
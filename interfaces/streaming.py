@@ -0,0 +1,222 @@
+#/usr/bin/env python
+"""streaming.py: streaming crypto price ingestion from exchange ticker WebSocket feeds."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, List, Callable, Union, TextIO, Any
+from threading import Thread, Lock, Event
+from asyncio import new_event_loop, run_coroutine_threadsafe, wait_for, AbstractEventLoop, TimeoutError as AsyncTimeoutError, sleep as async_sleep
+from json import loads, dumps
+from time import time
+
+# 3rd party modules
+from websockets import connect
+from websockets.exceptions import WebSocketException
+from StatusLogger import Logger, Message
+
+# Stocker Library Modules
+from accounts.binance_us_account import BinanceAccount
+from accounts.coinbase_account import CoinbaseAccount
+from interfaces.crypto import get_crypto_prices
+from utilities.retry import Backoff, LAST_KNOWN_PRICES
+from utilities.quote_cache import QUOTE_CACHE
+
+
+class TickerStream(object):
+    """Subscribes to the mini ticker stream of every held coin and pushes prices into the quote cache and a consumer.
+
+    Prices are coalesced and handed to on_prices at most once per flush_interval, so a burst of ticks becomes one
+    hand off, which Holdings.record_prices only commits as a tick at the polling cadence or on a large move. A dropped
+    or silent connection is reopened with jittered exponential backoff, and every (re)connect backfills the prices
+    missed in the gap through get_crypto_prices."""
+    BINANCE_US_URL: str = "wss://stream.binance.us:9443"
+    QUOTE_CURRENCY: str = "USD"
+
+    def __init__(self, coin_names: List[str], on_prices: Callable[[Dict[str, float]], Any],
+                 url: str = BINANCE_US_URL, flush_interval: float = 5., stall_timeout: float = 60.,
+                 backoff: Union[Backoff, None] = None, binance_account: Union[BinanceAccount, None] = None,
+                 coinbase_account: Union[CoinbaseAccount, None] = None, record_file: Union[TextIO, None] = None):
+        """Constructor.
+
+        Args:
+            coin_names (List[str]): Coin symbols to stream.
+            on_prices (Callable[[Dict[str, float]], Any]): Receives coalesced prices by coin, such as Holdings.record_prices.
+            url (str, optional): Base URL of a Binance compatible combined stream endpoint. Defaults to BINANCE_US_URL.
+            flush_interval (float, optional): Seconds between hand offs to on_prices. Defaults to 5.
+            stall_timeout (float, optional): Seconds without a message before the connection is considered dead. Defaults to 60.
+            backoff (Union[Backoff, None], optional): Delay policy between reconnects. Defaults to Backoff(cap=60).
+            binance_account (Union[BinanceAccount, None], optional): Fallback price source for backfill. Defaults to None.
+            coinbase_account (Union[CoinbaseAccount, None], optional): Fallback price source for backfill. Defaults to None.
+            record_file (Union[TextIO, None], optional): Appends every received message as a JSON line replayable by
+                servers.replay. Defaults to None."""
+        self.coin_names: List[str] = list(coin_names)
+        self.on_prices: Callable[[Dict[str, float]], Any] = on_prices
+        self.url: str = url
+        self.flush_interval: float = flush_interval
+        self.stall_timeout: float = stall_timeout
+        self.backoff: Backoff = Backoff(cap=60.) if backoff is None else backoff
+        self.binance_account: Union[BinanceAccount, None] = binance_account
+        self.coinbase_account: Union[CoinbaseAccount, None] = coinbase_account
+        self.record_file: Union[TextIO, None] = record_file
+        self.coins_by_symbol: Dict[str, str] = {TickerStream.get_market_symbol(coin_name=coin_name): coin_name
+                                                for coin_name in self.coin_names}
+
+        self.pending_prices: Dict[str, float] = {}
+        self.pending_lock: Lock = Lock()
+        self.connected: Event = Event()
+        self.stopping: Event = Event()
+        self.last_message_time: float = 0.
+        self.last_streamed_times: Dict[str, float] = {}
+        self.message_count: int = 0
+        self.reconnect_count: int = 0
+        self.loop: Union[AbstractEventLoop, None] = None
+        self.thread: Union[Thread, None] = None
+
+    @staticmethod
+    def get_market_symbol(coin_name: str) -> str:
+        """Exchange symbol of a coin's USD market.
+
+        Args:
+            coin_name (str): Coin symbol.
+
+        Returns:
+            str: Market symbol, e.g. BTCUSD."""
+        return (coin_name + TickerStream.QUOTE_CURRENCY).upper()
+
+    @property
+    def stream_url(self) -> str:
+        """Combined stream URL subscribing to every coin's mini ticker."""
+        return self.url.rstrip("/") + "/stream?streams=" + \
+            "/".join(market_symbol.lower() + "@miniTicker" for market_symbol in self.coins_by_symbol.keys())
+
+    def is_live(self) -> bool:
+        """Whether the stream is connected and has delivered a message within stall_timeout.
+
+        Returns:
+            bool: True if streamed prices can be relied on."""
+        return self.connected.is_set() and time() - self.last_message_time < self.stall_timeout
+
+    def get_live_coin_names(self) -> List[str]:
+        """Coins whose price the stream delivered within stall_timeout.
+
+        Coins without a market on the exchange never show up here and have to be priced some other way.
+
+        Returns:
+            List[str]: Coins that do not need polling."""
+        if not self.is_live():
+            return []
+        now = time()
+        return [coin_name for coin_name, streamed_time in list(self.last_streamed_times.items())
+                if now - streamed_time < self.stall_timeout]
+
+    def start(self) -> None:
+        """Starts streaming on a background thread."""
+        if self.thread is not None or len(self.coin_names) == 0:
+            return
+        self.loop = new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="TickerStream", daemon=True)
+        self.thread.start()
+        run_coroutine_threadsafe(self.stream(), self.loop)
+        run_coroutine_threadsafe(self.flush_periodically(), self.loop)
+
+    def stop(self) -> None:
+        """Closes the connection and stops the background thread."""
+        self.stopping.set()
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=5.)
+        self.flush()
+
+    async def stream(self) -> None:
+        """Keeps a connection open until stopped, reconnecting with backoff."""
+        attempt: int = 0
+
+        while not self.stopping.is_set():
+            try:
+                async with connect(self.stream_url, ping_interval=20., ping_timeout=20.) as websocket:
+                    self.connected.set()
+                    self.last_message_time = time()
+                    attempt = 0
+                    await self.loop.run_in_executor(None, self.backfill)
+
+                    while not self.stopping.is_set():
+                        message: str = await wait_for(websocket.recv(), timeout=self.stall_timeout)
+                        self.handle_message(message=message)
+            except (WebSocketException, OSError, AsyncTimeoutError) as error:
+                # Covers closed connections as well as rejected handshakes such as HTTP 429.
+                Logger.console_log(message=f"Ticker stream disconnected ({type(error).__name__}: {error}). Reconnecting.",
+                                   message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+            except Exception as error:
+                Logger.console_log(message=f"Exception {type(error).__name__}: {error} encountered in the ticker stream. Reconnecting.",
+                                   message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+            finally:
+                self.connected.clear()
+
+            if self.stopping.is_set():
+                return
+            self.reconnect_count += 1
+            await async_sleep(self.backoff.delay(attempt=attempt))
+            attempt += 1
+
+    def handle_message(self, message: str) -> None:
+        """Records the price carried by one combined stream message.
+
+        Args:
+            message (str): Raw message text."""
+        self.last_message_time = time()
+        self.message_count += 1
+        if self.record_file is not None:
+            self.record_file.write(dumps({"received": self.last_message_time, "message": message}) + "\n")
+
+        try:
+            ticker: Dict[str, Any] = loads(message).get("data", {})
+            coin_name: Union[str, None] = self.coins_by_symbol.get(ticker.get("s", ""))
+            if coin_name is None or "c" not in ticker:
+                return
+            price = float(ticker["c"])
+        except (ValueError, TypeError, AttributeError) as error:
+            Logger.console_log(message=f"Dropping malformed ticker stream message ({error}).",
+                               message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+            return
+
+        self.last_streamed_times[coin_name] = self.last_message_time
+        QUOTE_CACHE.put(asset_class="crypto", key=coin_name, value=price)
+        LAST_KNOWN_PRICES.record(asset_class="crypto", symbol=coin_name, price=price)
+        with self.pending_lock:
+            self.pending_prices[coin_name] = price
+
+    def backfill(self) -> None:
+        """Fetches every coin's current price over REST to cover ticks missed while disconnected."""
+        try:
+            prices: Dict[str, float] = get_crypto_prices(coin_names=self.coin_names, binance_account=self.binance_account,
+                                                         coinbase_account=self.coinbase_account)
+        except Exception as error:
+            Logger.console_log(message=f"Exception {error} encountered when backfilling streamed crypto prices.",
+                               message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+            return
+
+        with self.pending_lock:
+            for coin_name, price in prices.items():
+                self.pending_prices.setdefault(coin_name, price)
+
+    async def flush_periodically(self) -> None:
+        while not self.stopping.is_set():
+            await async_sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """Hands the prices received since the last flush to on_prices."""
+        with self.pending_lock:
+            prices, self.pending_prices = self.pending_prices, {}
+        if len(prices) == 0:
+            return
+
+        try:
+            self.on_prices(prices)
+        except Exception as error:
+            Logger.console_log(message=f"Exception {error} encountered when applying streamed crypto prices.",
+                               message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
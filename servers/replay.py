@@ -0,0 +1,140 @@
+#/usr/bin/env python
+"""replay.py: local WebSocket server replaying recorded ticker messages for offline testing and benchmarking."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import List, Tuple, Set, Union
+from argparse import ArgumentParser
+from asyncio import run, sleep as async_sleep, Future
+from urllib.parse import urlparse, parse_qs
+from json import loads, dumps
+from time import time
+
+# 3rd party modules
+from websockets import serve, ConnectionClosed
+
+
+class ReplayServer(object):
+    """Serves a Binance compatible combined stream endpoint that plays back recorded ticks.
+
+    Every client gets its own playback from the start of the recording, filtered to the streams in its URL, with
+    the recorded gaps between messages divided by speed. A speed of 0 sends as fast as the client reads, which
+    makes the server usable as a throughput benchmark for TickerStream."""
+
+    def __init__(self, recording: List[Tuple[float, str]], host: str = "localhost", port: int = 8765,
+                 speed: float = 1., loop_playback: bool = False):
+        """Constructor.
+
+        Args:
+            recording (List[Tuple[float, str]]): Receive time and raw text of every recorded message, in order.
+            host (str, optional): Interface to listen on. Defaults to "localhost".
+            port (int, optional): Port to listen on. Defaults to 8765.
+            speed (float, optional): Playback speed relative to the recording, 0 for no delays. Defaults to 1.
+            loop_playback (bool, optional): Restart the recording when it ends. Defaults to False."""
+        self.recording: List[Tuple[float, str]] = recording
+        self.host: str = host
+        self.port: int = port
+        self.speed: float = speed
+        self.loop_playback: bool = loop_playback
+        self.sent_count: int = 0
+
+    @property
+    def url(self) -> str:
+        """Base URL to point TickerStream at."""
+        return f"ws://{self.host}:{self.port}"
+
+    @staticmethod
+    def load_recording(recording_file_path: str) -> List[Tuple[float, str]]:
+        """Reads a recording written through TickerStream's record_file.
+
+        Args:
+            recording_file_path (str): JSON lines file of {"received": float, "message": str} objects.
+
+        Returns:
+            List[Tuple[float, str]]: Receive time and raw text of every message."""
+        recording: List[Tuple[float, str]] = []
+        with open(recording_file_path, "r") as recording_file:
+            for line in recording_file:
+                if line.strip():
+                    entry = loads(line)
+                    recording.append((float(entry["received"]), entry["message"]))
+        return recording
+
+    @staticmethod
+    def synthesize_recording(prices: List[Tuple[float, str, float]]) -> List[Tuple[float, str]]:
+        """Builds mini ticker messages for (time, market symbol, close price) triples.
+
+        Args:
+            prices (List[Tuple[float, str, float]]): Epoch time, market symbol such as BTCUSD and price.
+
+        Returns:
+            List[Tuple[float, str]]: Recording to replay."""
+        return [(tick_time, dumps({"stream": market_symbol.lower() + "@miniTicker",
+                                   "data": {"e": "24hrMiniTicker", "E": int(tick_time * 1000), "s": market_symbol,
+                                            "c": str(price)}}))
+                for tick_time, market_symbol, price in prices]
+
+    @staticmethod
+    def get_requested_streams(path: str) -> Union[Set[str], None]:
+        """Streams a client subscribed to through its URL.
+
+        Args:
+            path (str): Request path, e.g. /stream?streams=btcusd@miniTicker/ethusd@miniTicker.
+
+        Returns:
+            Union[Set[str], None]: Requested stream names, None to send everything."""
+        streams = parse_qs(urlparse(path).query).get("streams")
+        return None if streams is None else set(streams[0].split("/"))
+
+    async def play(self, websocket: object, path: Union[str, None] = None) -> None:
+        """Plays the recording to one client.
+
+        Args:
+            websocket (object): Client connection.
+            path (Union[str, None], optional): Request path on websockets versions that pass it. Defaults to None."""
+        if path is None:
+            path = websocket.request.path if hasattr(websocket, "request") else websocket.path
+        requested_streams = ReplayServer.get_requested_streams(path=path)
+        messages = [(received, message) for received, message in self.recording
+                    if requested_streams is None or loads(message).get("stream") in requested_streams]
+        if len(messages) == 0:
+            return
+
+        try:
+            while True:
+                playback_start, recording_start = time(), messages[0][0]
+                for received, message in messages:
+                    if self.speed > 0:
+                        delay = playback_start + (received - recording_start) / self.speed - time()
+                        if delay > 0:
+                            await async_sleep(delay)
+                    await websocket.send(message)
+                    self.sent_count += 1
+                if not self.loop_playback:
+                    return
+        except ConnectionClosed:
+            return
+
+    async def serve_forever(self) -> None:
+        """Serves until cancelled."""
+        async with serve(self.play, self.host, self.port):
+            await Future()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Replays recorded ticker messages over a local WebSocket.")
+    parser.add_argument("recording", help="JSON lines recording written by TickerStream")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=1., help="playback speed, 0 for no delays")
+    parser.add_argument("--loop", action="store_true", help="restart the recording when it ends")
+    arguments = parser.parse_args()
+
+    replay_server = ReplayServer(recording=ReplayServer.load_recording(recording_file_path=arguments.recording),
+                                 host=arguments.host, port=arguments.port, speed=arguments.speed,
+                                 loop_playback=arguments.loop)
+    print(f"Replaying {len(replay_server.recording)} messages on {replay_server.url}")
+    run(replay_server.serve_forever())
@@ -1,20 +1,24 @@
+from __future__ import annotations
 import json
 import os
+import sqlite3
 from bs4 import BeautifulSoup
 from urllib.request import urlopen
-from datetime import datetime
+from datetime import datetime, date
 from pandas import DataFrame, read_pickle
-from numpy import array
-from typing import Union
+from numpy import array, uint16, int32, flatnonzero
+from numpy.lib.format import open_memmap
+from typing import Dict, List, Union
 from string import ascii_uppercase
 from enum import IntEnum
-from time import sleep
+from time import sleep, time
 from threading import Thread, Lock
 from multiprocessing import cpu_count
-from itertools import product
 import numpy as np
 
 from utilities.Logger import Logger
+from utilities.quote_cache import QUOTE_CACHE
+from utilities.market_hours import MarketSession, get_session, next_regular_session_change
 
 
 class Scraper(object):
@@ -22,6 +26,8 @@ class Scraper(object):
     Scraper Server object
     """
 
+    WORKER_CHECK_PERIOD: float = 5.
+
     def __init__(self, data_refresh_rate: int = 1800, relative_path_correction: str = "") -> None:
         """
         Constructor.
@@ -79,18 +85,13 @@ class Scraper(object):
         SHUT_DOWN = 3
 
         @staticmethod
-        def set_mode() -> IntEnum:
+        def set_mode(at: Union[float, None] = None) -> IntEnum:
             """
-            :return:
+            Mode the scraper runs in at a time, following the exchange calendar.
+            :param at: Epoch time. Defaults to now.
+            :return: RETRIEVE_DATA during the regular session, else SURVEY_MARKET.
             """
-            right_now = datetime.now()
-            right_now_hour = int(right_now.hour)
-            right_now_minute = int(right_now.minute)
-
-            minutes = right_now_hour * 60 + right_now_minute
-
-            # If we are between 9:30 am and 4 pm the stock market is open
-            if 960 > minutes > 570 and is_datetime_weekday(current_time=datetime.now()):
+            if get_session(at=time() if at is None else at) == MarketSession.REGULAR:
                 return Scraper.ServerModes.RETRIEVE_DATA
             else:
                 return Scraper.ServerModes.SURVEY_MARKET
@@ -121,12 +122,16 @@ class Scraper(object):
             """
             try:
                 last_polled_server_mode = Scraper.ServerModes.INVALID
+                next_mode_change_time = 0.
 
                 while last_polled_server_mode != Scraper.ServerModes.SHUT_DOWN:
 
-                    # Set the mode of the scraper server
+                    # Set the mode of the scraper server once the market has opened or closed
+                    now = time()
                     self.scraper_server.mode_lock.acquire()
-                    self.scraper_server.mode = Scraper.ServerModes.set_mode()
+                    if now >= next_mode_change_time:
+                        self.scraper_server.mode = Scraper.ServerModes.set_mode(at=now)
+                        next_mode_change_time = next_regular_session_change(at=now)
 
                     # The mode has changed.  It is time to update data for the workers.
                     if last_polled_server_mode != self.scraper_server.mode:
@@ -148,19 +153,13 @@ class Scraper(object):
                                                    " to survey letter " + worker_starter_letter,
                                                    Logger.LogStatus.COMMUNICATION)
 
-                                # Get last surveyed ticker
-                                previous_ticker_list = Scraper.FileHandler.load_tickers(
-                                    ticker_starting_letter=worker_starter_letter,
-                                    relative_path_correction=self.scraper_server.relative_path_correction)
-                                if len(previous_ticker_list) > 0:
-                                    last_surveyed_ticker = previous_ticker_list[-1]
-                                else:
-                                    last_surveyed_ticker = None
-
-                                # Get new survey list.
+                                # Get new survey list, resuming after the last surveyed ticker.
                                 ticker_survey_list = Scraper.get_ticker_survey_list(
                                     starting_letter=worker_starter_letter,
-                                    last_ticker_surveyed=last_surveyed_ticker)
+                                    last_ticker_surveyed=Scraper.FileHandler.get_last_ticker_surveyed(
+                                        ticker_starting_letter=worker_starter_letter,
+                                        relative_path_correction=self.scraper_server.relative_path_correction),
+                                    relative_path_correction=self.scraper_server.relative_path_correction)
 
                                 # Give the list to the worker
                                 self.scraper_server.executive_lock.acquire()
@@ -196,6 +195,11 @@ class Scraper(object):
                                     # wait 2 seconds to make sure the worker is finished
                                     sleep(2)
 
+                                    # Queue the finished letter for its next pass, which only re-verifies stale invalid candidates
+                                    if isinstance(worker.ticker_survey_list, Scraper.TickerCandidates):
+                                        self.scraper_server.stock_ticker_letters_to_survey.append(
+                                            worker.ticker_survey_list.starting_letter)
+
                                     # Get a new letter
                                     new_letter = self.scraper_server.stock_ticker_letters_to_survey.pop(0)
 
@@ -208,9 +212,16 @@ class Scraper(object):
                                         starting_letter=new_letter,
                                         last_ticker_surveyed=Scraper.FileHandler.get_last_ticker_surveyed(
                                             ticker_starting_letter=new_letter,
-                                            relative_path_correction=self.scraper_server.relative_path_correction))
+                                            relative_path_correction=self.scraper_server.relative_path_correction),
+                                        relative_path_correction=self.scraper_server.relative_path_correction)
                                     self.scraper_server.executive_lock.release()
 
+                    # Sleep until the market opens or closes, checking on surveying workers in the meantime
+                    wake_time = next_mode_change_time
+                    if last_polled_server_mode == Scraper.ServerModes.SURVEY_MARKET:
+                        wake_time = min(wake_time, time() + Scraper.WORKER_CHECK_PERIOD)
+                    sleep(max(wake_time - time(), 0.))
+
             except (KeyboardInterrupt, SystemExit):
                 Logger.console_log(message="Executive" + str(self.thread_id) + "shutting down server",
                                    status=Logger.LogStatus.FAIL)
@@ -234,6 +245,18 @@ class Scraper(object):
             self.ticker_monitor_letter = None  # Set by Executive Thread
             self.ticker_survey_list = []
             self.ticker_monitor_list = []
+            self.negative_results: Dict[str, Scraper.NegativeResultIndex] = {}
+
+        def get_negative_results(self, ticker_starting_letter: str) -> Scraper.NegativeResultIndex:
+            """
+            :param ticker_starting_letter:
+            :return: Negative result index of the letter, opened on first use.
+            """
+            if ticker_starting_letter not in self.negative_results:
+                self.negative_results[ticker_starting_letter] = Scraper.NegativeResultIndex(
+                    ticker_starting_letter=ticker_starting_letter,
+                    relative_path_correction=self.scraper_server.relative_path_correction)
+            return self.negative_results[ticker_starting_letter]
 
         def __str__(self) -> str:
             """
@@ -258,18 +281,28 @@ class Scraper(object):
                                 ticker_survey_list = self.ticker_survey_list
                                 self.scraper_server.executive_lock.release()
                         else:
-                            # Get ticker to survey.
-                            ticker = self.ticker_survey_list[0]
+                            # Skip candidates found invalid recently.
+                            negative_results = self.get_negative_results(ticker_starting_letter=ticker_survey_list.starting_letter)
+                            ticker_survey_list.position = negative_results.next_due(position=ticker_survey_list.position)
 
-                            # Log Result.
-                            if Scraper.survey_ticker(thread=self, ticker=ticker):
-                                self.scraper_server.executive_lock.acquire()
-                                Scraper.FileHandler.add_ticker_to_tickers(ticker=ticker,
-                                                                          relative_path_correction=self.scraper_server.relative_path_correction)
-                                self.scraper_server.executive_lock.release()
+                            if len(ticker_survey_list) > 0:
+                                # Get ticker to survey.
+                                ticker = ticker_survey_list.peek()
 
-                            # remove from survey list.
-                            self.ticker_survey_list.remove(ticker)
+                                # Log Result.
+                                if Scraper.survey_ticker(thread=self, ticker=ticker):
+                                    Scraper.FileHandler.add_ticker_to_tickers(ticker=ticker,
+                                                                              relative_path_correction=self.scraper_server.relative_path_correction)
+                                    negative_results.record_valid(ordinal=ticker_survey_list.position)
+                                else:
+                                    negative_results.record_invalid(ordinal=ticker_survey_list.position)
+
+                                # Move past the ticker and remember where to resume.
+                                ticker_survey_list.advance()
+                            negative_results.flush()
+                            Scraper.FileHandler.store_survey_cursor(ticker_starting_letter=ticker_survey_list.starting_letter,
+                                                                    position=ticker_survey_list.position,
+                                                                    relative_path_correction=self.scraper_server.relative_path_correction)
                     elif last_polled_server_mode == Scraper.ServerModes.RETRIEVE_DATA:
                         # Stock market is open schedule
                         if len(ticker_monitor_list) == 0:
@@ -346,20 +379,21 @@ class Scraper(object):
         @staticmethod
         def store_tickers(tickers: dict, relative_path_correction: str = "") -> None:
             """
+            Replaces the registered tickers of every letter in tickers.
             :param relative_path_correction:
-            :param tickers:
+            :param tickers: Ticker lists by starting letter.
             :return:
             """
-            ticker_directory = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep + "tickers" + os.sep
+            ticker_registry = Scraper.TickerRegistry.open(relative_path_correction=relative_path_correction)
 
             for ticker_starting_letter in tickers.keys():
-                Scraper.FileHandler.store_valid_ticker(ticker_data=tickers[ticker_starting_letter],
-                                                       ticker_file_path=ticker_directory + ticker_starting_letter +
-                                                                        '.json')
+                ticker_registry.replace(ticker_starting_letter=ticker_starting_letter,
+                                        tickers=list(tickers[ticker_starting_letter]))
 
         @staticmethod
         def store_valid_ticker(ticker_data: list, ticker_file_path: str):
             """
+            Exports a list of tickers as a JSON file.
             :param ticker_data:
             :param ticker_file_path:
             :return:
@@ -369,68 +403,35 @@ class Scraper(object):
 
         @staticmethod
         def remove_invalid_ticker(ticker: str, relative_path_correction: str = "") -> None:
-            ticker_directory = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep + "tickers" + os.sep
-            ticker_starting_letter = ticker[0]
-
-            # Load old tickers and remove from list
-            ticker_data = Scraper.FileHandler.load_tickers(ticker_starting_letter=ticker_starting_letter,
-                                                           relative_path_correction=relative_path_correction)
-            ticker_data.remove(ticker)
-
-            # Store new list of tickers
-            Scraper.FileHandler.store_valid_ticker(ticker_data=ticker_data, ticker_file_path=ticker_directory +
-                                                                                             ticker_starting_letter +
-                                                                                             '.json')
+            Scraper.TickerRegistry.open(relative_path_correction=relative_path_correction).remove(ticker=ticker)
 
         @staticmethod
         def load_tickers(ticker_starting_letter: str, relative_path_correction: str = "") -> list:
             """
             :param ticker_starting_letter:
             :param relative_path_correction:
-            :return:
+            :return: Registered tickers of the letter in the order they were found.
             """
-            ticker_directory = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep + "tickers" + os.sep
-
-            with open(ticker_directory + ticker_starting_letter + '.json', 'r') as ticker_file:
-                return list(json.load(fp=ticker_file))
+            return Scraper.TickerRegistry.open(relative_path_correction=relative_path_correction).get_tickers(
+                ticker_starting_letter=ticker_starting_letter)
 
         @staticmethod
         def load_all_tickers(relative_path_correction: str = "") -> list:
             """
             :param relative_path_correction:
-            :return:
+            :return: Registered tickers of every letter.
             """
-            ticker_list = []
-
-            ticker_directory = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep + "tickers" + os.sep
-            ticker_file_names = [file for file in os.listdir(ticker_directory) if
-                                 os.path.isfile(os.path.join(ticker_directory, file))]
-
-            for file_name in ticker_file_names:
-                with open(os.path.join(ticker_directory, file_name)) as ticker_file:
-                    ticker_list.extend(json.load(fp=ticker_file))
-
-            return ticker_list
+            return Scraper.TickerRegistry.open(relative_path_correction=relative_path_correction).get_all_tickers()
 
         @staticmethod
         def add_ticker_to_tickers(ticker: str, relative_path_correction: str) -> None:
             """
+            Registers a ticker. Later survey passes find known tickers again, which is a no-op.
             :param ticker:
             :param relative_path_correction:
             :return:
             """
-            ticker_file_path = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep + "tickers" + os.sep + \
-                               ticker[0] + '.json'
-
-            # Retrieve Ticker Data
-            current_ticker_data = Scraper.FileHandler.load_tickers(ticker_starting_letter=ticker[:1],
-                                                                   relative_path_correction=relative_path_correction)
-
-            # update current ticker data
-            current_ticker_data.append(ticker)
-
-            # log new ticker data
-            Scraper.FileHandler.store_valid_ticker(ticker_data=current_ticker_data, ticker_file_path=ticker_file_path)
+            Scraper.TickerRegistry.open(relative_path_correction=relative_path_correction).add(ticker=ticker)
 
         @staticmethod
         def get_last_ticker_surveyed(ticker_starting_letter: str, relative_path_correction: str = "") -> Union[
@@ -438,16 +439,43 @@ class Scraper(object):
             """
             :param ticker_starting_letter:
             :param relative_path_correction:
+            :return: Last ticker registered for the letter, None if there is none.
+            """
+            return Scraper.TickerRegistry.open(relative_path_correction=relative_path_correction).get_last_ticker(
+                ticker_starting_letter=ticker_starting_letter)
+
+        @staticmethod
+        def store_survey_cursor(ticker_starting_letter: str, position: int, relative_path_correction: str = "") -> None:
+            """
+            Records how far the survey of a letter has progressed.
+            :param ticker_starting_letter:
+            :param position: Ordinal of the next candidate to survey, see Scraper.TickerCandidates.
+            :param relative_path_correction:
             :return:
             """
-            # Get last surveyed ticker
-            previous_ticker_list = Scraper.FileHandler.load_tickers(ticker_starting_letter=ticker_starting_letter,
-                                                                    relative_path_correction=relative_path_correction)
+            cursor_directory = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep + "survey_cursors" + os.sep
+            os.makedirs(cursor_directory, exist_ok=True)
 
-            if len(previous_ticker_list) > 0:
-                return previous_ticker_list[-1]
-            else:
+            # Replace the cursor atomically so a crash never leaves it half written.
+            cursor_file_path = cursor_directory + ticker_starting_letter + '.json'
+            with open(cursor_file_path + '.tmp', "w") as cursor_file:
+                json.dump(obj=position, fp=cursor_file)
+            os.replace(cursor_file_path + '.tmp', cursor_file_path)
+
+        @staticmethod
+        def load_survey_cursor(ticker_starting_letter: str, relative_path_correction: str = "") -> Union[int, None]:
+            """
+            :param ticker_starting_letter:
+            :param relative_path_correction:
+            :return: Ordinal of the next candidate to survey, None if the letter has not been surveyed.
+            """
+            cursor_file_path = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep + "survey_cursors" + \
+                               os.sep + ticker_starting_letter + '.json'
+
+            if not os.path.isfile(cursor_file_path):
                 return None
+            with open(cursor_file_path, 'r') as cursor_file:
+                return int(json.load(fp=cursor_file))
 
         @staticmethod
         def store_ticker_data(ticker: str, data: DataFrame, relative_path_correction: str = "") -> None:
@@ -487,7 +515,16 @@ class Scraper(object):
         def get_price(ticker: str) -> float:
             """
             :param ticker: Stock ticker.
-            :return: Price in dollars as floating point.
+            :return: Price in dollars as floating point, served from the shared quote cache while fresh.
+            """
+            return QUOTE_CACHE.get(asset_class="stock", key=ticker,
+                                   fetch=lambda: Scraper.WebInterface.fetch_price(ticker=ticker))
+
+        @staticmethod
+        def fetch_price(ticker: str) -> float:
+            """
+            :param ticker: Stock ticker.
+            :return: Price in dollars as floating point scraped from yahoo finance.
             """
             # Build URL
             source_url = "https://finance.yahoo.com/quote/"
@@ -568,25 +605,305 @@ class Scraper(object):
             return False
 
     @staticmethod
-    def get_ticker_survey_list(starting_letter: str, last_ticker_surveyed: Union[str, None]) -> list:
+    def get_ticker_survey_list(starting_letter: str, last_ticker_surveyed: Union[str, None],
+                               relative_path_correction: Union[str, None] = None) -> Scraper.TickerCandidates:
         """
         :param starting_letter:
         :param last_ticker_surveyed:
-        :return:
+        :param relative_path_correction: Resume from the letter's stored survey cursor instead of last_ticker_surveyed
+            when there is one. A finished survey starts a new pass from the first candidate. Ignored if None.
+        :return: Candidates of the letter after last_ticker_surveyed, generated lazily.
+        """
+        ticker_survey_list = Scraper.TickerCandidates(starting_letter=starting_letter)
+        ticker_survey_list.seek(ticker=last_ticker_surveyed)
+
+        if relative_path_correction is not None:
+            position = Scraper.FileHandler.load_survey_cursor(ticker_starting_letter=starting_letter,
+                                                              relative_path_correction=relative_path_correction)
+            if position is not None:
+                ticker_survey_list.position = position if position < Scraper.TickerCandidates.size() else 0
+
+        return ticker_survey_list
+
+    class TickerCandidates:
+        """
+        Every 3, 4 and 5 letter ticker starting with one letter, in survey order, generated on demand.
+
+        Candidates are numbered by an ordinal: the 3 letter tickers come first, then the 4 and 5 letter ones, each
+        group in alphabetical order, so a candidate's ordinal is its length offset plus its remaining letters read as
+        a base 26 number. This lets the survey resume from a single integer without building the list.
+        """
+        LENGTHS = (3, 4, 5)
+
+        def __init__(self, starting_letter: str, position: int = 0) -> None:
+            """
+            Constructor.
+            :param starting_letter:
+            :param position: Ordinal of the next candidate.
+            """
+            self.starting_letter = starting_letter.upper()
+            self.position = position
+
+        @staticmethod
+        def size() -> int:
+            """
+            :return: Number of candidates per starting letter.
+            """
+            return sum(26 ** (length - 1) for length in Scraper.TickerCandidates.LENGTHS)
+
+        @staticmethod
+        def ordinal_of(ticker: str) -> int:
+            """
+            :param ticker: Candidate ticker.
+            :return: Ordinal of the ticker among the candidates of its starting letter.
+            """
+            ticker = ticker.upper()
+            if len(ticker) not in Scraper.TickerCandidates.LENGTHS or not all(letter in ascii_uppercase for letter in ticker):
+                raise ValueError("Ticker " + ticker + " is not a survey candidate.")
+
+            ordinal = sum(26 ** (length - 1) for length in Scraper.TickerCandidates.LENGTHS if length < len(ticker))
+            suffix_value = 0
+            for letter in ticker[1:]:
+                suffix_value = suffix_value * 26 + ord(letter) - ord('A')
+            return ordinal + suffix_value
+
+        def ticker_at(self, ordinal: int) -> str:
+            """
+            :param ordinal:
+            :return: Candidate with the given ordinal.
+            """
+            if not 0 <= ordinal < Scraper.TickerCandidates.size():
+                raise IndexError("Ordinal " + str(ordinal) + " is out of range.")
+
+            for length in Scraper.TickerCandidates.LENGTHS:
+                group_size = 26 ** (length - 1)
+                if ordinal < group_size:
+                    break
+                ordinal -= group_size
+
+            suffix = []
+            for _ in range(length - 1):
+                ordinal, letter_index = divmod(ordinal, 26)
+                suffix.append(ascii_uppercase[letter_index])
+            return self.starting_letter + "".join(reversed(suffix))
+
+        def seek(self, ticker: Union[str, None]) -> None:
+            """
+            Moves to the candidate after ticker, or to the first candidate if ticker is None.
+            :param ticker:
+            :return:
+            """
+            self.position = 0 if ticker is None else Scraper.TickerCandidates.ordinal_of(ticker=ticker) + 1
+
+        def peek(self) -> str:
+            """
+            :return: Next candidate, without moving past it.
+            """
+            return self.ticker_at(ordinal=self.position)
+
+        def advance(self) -> None:
+            self.position += 1
+
+        def __len__(self) -> int:
+            """
+            :return: Number of candidates left.
+            """
+            return max(Scraper.TickerCandidates.size() - self.position, 0)
+
+        def __iter__(self) -> Scraper.TickerCandidates:
+            return self
+
+        def __next__(self) -> str:
+            if len(self) == 0:
+                raise StopIteration
+            ticker = self.peek()
+            self.advance()
+            return ticker
+
+    class TickerRegistry:
         """
-        three_letter_tickers = ["".join(lst) for lst in product(ascii_uppercase, repeat=3) if lst[0] == starting_letter]
-        four_letter_tickers = ["".join(lst) for lst in product(ascii_uppercase, repeat=4) if lst[0] == starting_letter]
-        five_letter_tickers = ["".join(lst) for lst in product(ascii_uppercase, repeat=5) if lst[0] == starting_letter]
-        possible_tickers = three_letter_tickers + four_letter_tickers + five_letter_tickers
+        Valid tickers found by the survey, stored in SQLite and mirrored in memory.
 
-        if last_ticker_surveyed is None:
-            return possible_tickers
-        else:
-            return possible_tickers[possible_tickers.index(last_ticker_surveyed) + 1:]
+        The database runs in WAL mode so every add or remove is a small crash safe append rather than a rewrite of
+        a letter's file. Membership, append, removal and the last ticker of a letter are answered from an insertion
+        ordered dict per letter. A new registry imports the legacy Data/tickers/<letter>.json files once.
+        """
+        DATABASE_FILE_NAME = "tickers.sqlite3"
+        registries: Dict[str, Scraper.TickerRegistry] = {}
+        registries_lock = Lock()
+
+        def __init__(self, database_file_path: str, legacy_ticker_directory: Union[str, None] = None) -> None:
+            """
+            Constructor. Use Scraper.TickerRegistry.open to share one registry between threads.
+            :param database_file_path:
+            :param legacy_ticker_directory: Directory of JSON ticker lists imported when the database is created.
+            """
+            is_new = not os.path.isfile(database_file_path)
+            self.lock = Lock()
+            self.connection = sqlite3.connect(database_file_path, check_same_thread=False, isolation_level=None)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS tickers (id INTEGER PRIMARY KEY, "
+                                    "ticker TEXT NOT NULL UNIQUE, starting_letter TEXT NOT NULL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS tickers_by_letter ON tickers (starting_letter, id)")
+
+            if is_new and legacy_ticker_directory is not None and os.path.isdir(legacy_ticker_directory):
+                self.import_json_files(ticker_directory=legacy_ticker_directory)
+
+            self.tickers: Dict[str, Dict[str, None]] = {}
+            for ticker, ticker_starting_letter in self.connection.execute(
+                    "SELECT ticker, starting_letter FROM tickers ORDER BY id"):
+                self.tickers.setdefault(ticker_starting_letter, {})[ticker] = None
+
+        @staticmethod
+        def open(relative_path_correction: str = "") -> Scraper.TickerRegistry:
+            """
+            :param relative_path_correction:
+            :return: Registry of the data directory, shared by every caller.
+            """
+            data_directory = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep
+            database_file_path = os.path.abspath(data_directory + Scraper.TickerRegistry.DATABASE_FILE_NAME)
+
+            with Scraper.TickerRegistry.registries_lock:
+                if database_file_path not in Scraper.TickerRegistry.registries:
+                    os.makedirs(data_directory, exist_ok=True)
+                    Scraper.TickerRegistry.registries[database_file_path] = Scraper.TickerRegistry(
+                        database_file_path=database_file_path, legacy_ticker_directory=data_directory + "tickers")
+                return Scraper.TickerRegistry.registries[database_file_path]
+
+        def import_json_files(self, ticker_directory: str) -> None:
+            """
+            Registers the tickers of every JSON ticker list in a directory in one transaction.
+            :param ticker_directory:
+            :return:
+            """
+            ticker_file_names = sorted(file for file in os.listdir(ticker_directory)
+                                       if file.endswith('.json') and os.path.isfile(os.path.join(ticker_directory, file)))
+
+            self.connection.execute("BEGIN")
+            for file_name in ticker_file_names:
+                with open(os.path.join(ticker_directory, file_name)) as ticker_file:
+                    self.connection.executemany("INSERT OR IGNORE INTO tickers (ticker, starting_letter) VALUES (?, ?)",
+                                                [(ticker, ticker[:1]) for ticker in json.load(fp=ticker_file)])
+            self.connection.execute("COMMIT")
 
+        def __contains__(self, ticker: str) -> bool:
+            return ticker in self.tickers.get(ticker[:1], {})
+
+        def add(self, ticker: str) -> bool:
+            """
+            :param ticker:
+            :return: False if the ticker was already registered.
+            """
+            with self.lock:
+                if ticker in self:
+                    return False
+                self.connection.execute("INSERT OR IGNORE INTO tickers (ticker, starting_letter) VALUES (?, ?)",
+                                        (ticker, ticker[:1]))
+                self.tickers.setdefault(ticker[:1], {})[ticker] = None
+                return True
+
+        def remove(self, ticker: str) -> None:
+            with self.lock:
+                self.connection.execute("DELETE FROM tickers WHERE ticker = ?", (ticker,))
+                self.tickers.get(ticker[:1], {}).pop(ticker, None)
+
+        def replace(self, ticker_starting_letter: str, tickers: List[str]) -> None:
+            """
+            Replaces every registered ticker of a letter in one transaction.
+            :param ticker_starting_letter:
+            :param tickers:
+            :return:
+            """
+            with self.lock:
+                self.connection.execute("BEGIN")
+                self.connection.execute("DELETE FROM tickers WHERE starting_letter = ?", (ticker_starting_letter,))
+                self.connection.executemany("INSERT OR IGNORE INTO tickers (ticker, starting_letter) VALUES (?, ?)",
+                                            [(ticker, ticker_starting_letter) for ticker in tickers])
+                self.connection.execute("COMMIT")
+                self.tickers[ticker_starting_letter] = dict.fromkeys(tickers)
+
+        def get_tickers(self, ticker_starting_letter: str) -> List[str]:
+            with self.lock:
+                return list(self.tickers.get(ticker_starting_letter, {}))
+
+        def get_all_tickers(self) -> List[str]:
+            with self.lock:
+                return [ticker for ticker_starting_letter in sorted(self.tickers.keys())
+                        for ticker in self.tickers[ticker_starting_letter]]
+
+        def get_last_ticker(self, ticker_starting_letter: str) -> Union[str, None]:
+            with self.lock:
+                return next(reversed(self.tickers.get(ticker_starting_letter, {})), None)
+
+    class NegativeResultIndex:
+        """
+        Day each survey candidate of a letter was last found invalid, indexed by Scraper.TickerCandidates ordinal.
+
+        Stamps are uint16 days since STAMP_EPOCH in a memory mapped .npy file, 0 for candidates never found invalid,
+        so a letter takes under 1 MB on disk and in memory. Candidates found invalid within recheck_days are skipped;
+        older stamps are due for re-verification.
+        """
+        STAMP_EPOCH = date(2000, 1, 1)
+        RECHECK_DAYS = 30
+        SCAN_CHUNK = 65536
+
+        def __init__(self, ticker_starting_letter: str, relative_path_correction: str = "",
+                     recheck_days: int = RECHECK_DAYS) -> None:
+            """
+            Constructor. Creates the index file of the letter if it does not exist.
+            :param ticker_starting_letter:
+            :param relative_path_correction:
+            :param recheck_days: Days before an invalid candidate is surveyed again.
+            """
+            index_directory = os.getcwd() + os.sep + relative_path_correction + "Data" + os.sep + "survey_index" + os.sep
+            os.makedirs(index_directory, exist_ok=True)
+            index_file_path = index_directory + ticker_starting_letter + '.npy'
+
+            self.recheck_days = recheck_days
+            if os.path.isfile(index_file_path):
+                self.stamps = open_memmap(index_file_path, mode='r+')
+            else:
+                self.stamps = open_memmap(index_file_path, mode='w+', dtype=uint16,
+                                          shape=(Scraper.TickerCandidates.size(),))
+
+        @staticmethod
+        def today() -> int:
+            """
+            :return: Today's stamp.
+            """
+            return (date.today() - Scraper.NegativeResultIndex.STAMP_EPOCH).days
+
+        def record_invalid(self, ordinal: int) -> None:
+            self.stamps[ordinal] = Scraper.NegativeResultIndex.today()
+
+        def record_valid(self, ordinal: int) -> None:
+            self.stamps[ordinal] = 0
+
+        def is_due(self, ordinal: int) -> bool:
+            """
+            :param ordinal:
+            :return: Whether the candidate was never found invalid or was last found invalid more than recheck_days ago.
+            """
+            stamp = int(self.stamps[ordinal])
+            return stamp == 0 or Scraper.NegativeResultIndex.today() - stamp >= self.recheck_days
+
+        def next_due(self, position: int) -> int:
+            """
+            :param position: Ordinal to start from.
+            :return: Ordinal of the first candidate from position that is due, or the number of candidates if none is.
+            """
+            today = Scraper.NegativeResultIndex.today()
+            while position < len(self.stamps):
+                stamps = self.stamps[position:position + Scraper.NegativeResultIndex.SCAN_CHUNK].astype(int32)
+                due = flatnonzero((stamps == 0) | (today - stamps >= self.recheck_days))
+                if len(due) > 0:
+                    return position + int(due[0])
+                position += len(stamps)
+            return max(position, len(self.stamps))
 
-def is_datetime_weekday(current_time: datetime):
-    return current_time.isoweekday() in range(1, 6)
+        def flush(self) -> None:
+            self.stamps.flush()
 
 
 if __name__ == "__main__":
@@ -29,6 +29,8 @@ from database_management.generate_my_sql_script import generate_stocker_database
 from windows.control import ControlWindow
 from windows.EquityTracker import EquityTracker
 from holdings import Holdings
+from utilities.history_file import HistoryFile
+from interfaces.streaming import TickerStream
 
 RESOURCE_DIRECTORY = join(dirname(__file__), "resources")
 
@@ -40,7 +42,10 @@ class Stocker(object):
     COINBASE_TRANSACTION_HISTORY_FILE_NAME = "coinbase transaction history.csv"
     BINANCE_TRANSACTION_HISTORY_FILE_NAME = "binance transaction history.csv"
     DEPOSIT_HISTORY_FILE_NAME = "deposits.csv"
+    HISTORY_DIRECTORY_NAME = "history"
     USER_NAME: str = "jakeadelic"
+    # Older ticks are only kept in the holdings rollups, so memory and plotting cost stop growing with uptime.
+    RAW_TICK_HORIZON: float = 24 * 3600.
 
     def __init__(self, verbose: bool = False):
         """Constructor.
@@ -73,17 +78,27 @@ class Stocker(object):
         self.holdings: Holdings = Holdings.load(holding_file_name=Stocker.HOLDINGS_FILE_NAME, 
                                                 file_name_cipher=self.ciphers['file_name'], 
                                                 data_cipher=self.ciphers['data'], 
-                                                mint=self.mint)
+                                                mint=self.mint,
+                                                raw_tick_horizon=Stocker.RAW_TICK_HORIZON)
+        self.holdings.attach_history(history=HistoryFile(directory=join(RESOURCE_DIRECTORY, Stocker.HISTORY_DIRECTORY_NAME)))
 
         # Start price update thread
         self.price_checker_thread: PriceChecker = PriceChecker(stocker=self, verbose=self.verbose)
+        self.crypto_stream: TickerStream = TickerStream(coin_names=list(self.holdings.cryptocoins.keys()),
+                                                        on_prices=lambda crypto_prices: self.holdings.record_prices(crypto_prices=crypto_prices),
+                                                        binance_account=self.binance_account,
+                                                        coinbase_account=self.coinbase_account)
+        self.price_checker_thread.crypto_stream = self.crypto_stream
         self.price_checker_thread.start()
+        self.crypto_stream.start()
         self.holdings.initial_update.wait(timeout_ms=60000)
 
         self.generated_windows = {}
 
     def stop(self) -> None:
+        self.crypto_stream.stop()
         self.price_checker_thread.stop()
+        self.holdings.close()
 
     def open_window(self, window_class: Callable[[], QMainWindow]) -> None:
         """Opens a window class and displays it.
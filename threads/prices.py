@@ -4,19 +4,109 @@
 __author__ = "Jacob T. Cassady"
 __email__ = "jacobtaylorcassady@outlook.com"
 
-from threading import Thread
+from threading import Thread, Event
 from time import time
+from heapq import heappush, heappop
+from typing import Dict, List, Tuple, Union, Optional
 
 from StatusLogger import Logger, Message
 
+from interfaces.mint import Mint
+from interfaces.streaming import TickerStream
 from utilities.time_util import pseudo_realtime_timestep
+from utilities.market_hours import MarketSession, get_session, next_session_change
 
 class PriceChecker(Thread):
-    def __init__(self, stocker: object, verbose: bool = False, rate: float = 1./90.) -> None:
+    """Refreshes holdings on an independent cadence per asset class and per symbol.
+
+    Crypto trades around the clock and is polled continuously. Stocks follow the exchange sessions: polled at
+    rate during the regular session, slowly in pre-market and after-hours, and not at all while the market is
+    closed. Checking account balances are refreshed from Mint on a slow timer."""
+    CRYPTO_PERIOD: float = 30.
+    STOCK_PERIODS: Dict[MarketSession, Union[float, None]] = {
+        MarketSession.PRE_MARKET: 300.,
+        MarketSession.REGULAR: None,
+        MarketSession.AFTER_HOURS: 300.,
+        MarketSession.CLOSED: None
+    }
+    MINT_PERIOD: float = 6 * 3600.
+
+    def __init__(self, stocker: object, verbose: bool = False, rate: float = 1./90.,
+                 symbol_periods: Union[Dict[str, float], None] = None,
+                 crypto_stream: Optional[TickerStream] = None) -> None:
+        """Constructor.
+
+        Args:
+            stocker (object): [description]
+            verbose (bool, optional): [description]. Defaults to False.
+            rate (float, optional): Stock updates per second during the regular session. Defaults to 1/90.
+            symbol_periods (Union[Dict[str, float], None], optional): Seconds between updates of specific coins or
+                stocks, overriding their asset class cadence while their market is open. Defaults to None.
+            crypto_stream (Optional[TickerStream], optional): Streaming crypto prices. Coins the stream delivered
+                within its stall timeout are not polled. Defaults to None."""
         Thread.__init__(self=self)
         self.verbose = verbose
         self.stocker = stocker
         self.rate = rate
+        self.symbol_periods: Dict[str, float] = {} if symbol_periods is None else dict(symbol_periods)
+        self.schedule: List[Tuple[float, int, str, str]] = []
+        self.sequence: int = 0
+        self.stop_event: Event = Event()
+        self.crypto_stream: Optional[TickerStream] = crypto_stream
+
+    def get_next_due_time(self, asset_class: str, symbol: str, now: float) -> float:
+        """Time a job should next run.
+
+        Args:
+            asset_class (str): "crypto", "stock" or "mint".
+            symbol (str): Coin or stock symbol, empty for mint.
+            now (float): Current epoch time.
+
+        Returns:
+            float: Epoch time of the next run."""
+        if asset_class == "crypto":
+            return now + self.symbol_periods.get(symbol, PriceChecker.CRYPTO_PERIOD)
+        if asset_class == "mint":
+            return now + PriceChecker.MINT_PERIOD
+
+        session: MarketSession = get_session(at=now)
+        if session == MarketSession.CLOSED:
+            # Prices cannot move until the next session opens.
+            return next_session_change(at=now)[0]
+
+        period: Union[float, None] = PriceChecker.STOCK_PERIODS[session]
+        if session == MarketSession.REGULAR:
+            period = self.symbol_periods.get(symbol, 1./self.rate)
+        # A slow cadence never skips past the start of the next session.
+        return min(now + period, next_session_change(at=now)[0])
+
+    def schedule_job(self, asset_class: str, symbol: str, due_time: float) -> None:
+        self.sequence += 1
+        heappush(self.schedule, (due_time, self.sequence, asset_class, symbol))
+
+    def pop_due_jobs(self, now: float) -> Dict[str, List[str]]:
+        """Removes every job due by now from the schedule.
+
+        Args:
+            now (float): Current epoch time.
+
+        Returns:
+            Dict[str, List[str]]: Due symbols by asset class."""
+        due_jobs: Dict[str, List[str]] = {"crypto": [], "stock": [], "mint": []}
+        while len(self.schedule) > 0 and self.schedule[0][0] <= now:
+            _, _, asset_class, symbol = heappop(self.schedule)
+            due_jobs[asset_class].append(symbol)
+        return due_jobs
+
+    def refresh_checking_accounts(self) -> None:
+        """Logs into Mint and refreshes checking account balances. Failures are logged and retried next period."""
+        try:
+            mint = Mint(email=self.stocker.passes['mint']['email'],
+                        password=self.stocker.passes['mint']['password'])
+            self.stocker.holdings.update_checking_accounts(mint=mint)
+        except Exception as error:
+            Logger.console_log(message=f"Exception {error} encountered when refreshing checking accounts from Mint.",
+                               message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
 
     def run(self) -> None:
         self.running = True
@@ -24,16 +114,48 @@ class PriceChecker(Thread):
                                    message=str(type(self)) + " is running...",
                                    message_type=Message.MESSAGE_TYPE.STATUS)
 
-        while self.running:
+        # Everything is priced right away; checking accounts were just loaded from Mint.
+        start_time = time()
+        for coin_name in self.stocker.holdings.cryptocoins.keys():
+            self.schedule_job(asset_class="crypto", symbol=coin_name, due_time=start_time)
+        for stock_symbol in self.stocker.holdings.stocks.keys():
+            self.schedule_job(asset_class="stock", symbol=stock_symbol, due_time=start_time)
+        self.schedule_job(asset_class="mint", symbol="", due_time=self.get_next_due_time(asset_class="mint", symbol="", now=start_time))
+
+        while self.running and not self.stop_event.is_set():
             epoch_start_time = time()
-            self.stocker.holdings.update(binance_account = self.stocker.binance_account, 
-                                         coinbase_account = self.stocker.coinbase_account, 
-                                         verbose = self.stocker.verbose)
-            pseudo_realtime_timestep(epoch_start_time=epoch_start_time,
-                                     timestep=1/self.rate)
+            due_jobs = self.pop_due_jobs(now=epoch_start_time)
+            polled_coin_names: List[str] = due_jobs["crypto"]
+            if self.crypto_stream is not None:
+                # Only coins the stream is actually delivering skip polling; the rest stay on REST.
+                streamed_coin_names = set(self.crypto_stream.get_live_coin_names())
+                polled_coin_names = [coin_name for coin_name in polled_coin_names if coin_name not in streamed_coin_names]
+
+            if len(due_jobs["mint"]) > 0:
+                self.refresh_checking_accounts()
+
+            if len(polled_coin_names) > 0 or len(due_jobs["stock"]) > 0 or len(due_jobs["mint"]) > 0:
+                self.stocker.holdings.update(binance_account = self.stocker.binance_account,
+                                             coinbase_account = self.stocker.coinbase_account,
+                                             verbose = self.stocker.verbose,
+                                             coin_names = polled_coin_names,
+                                             stock_symbols = due_jobs["stock"])
+
+            now = time()
+            for asset_class, symbols in due_jobs.items():
+                for symbol in symbols:
+                    self.schedule_job(asset_class=asset_class, symbol=symbol,
+                                      due_time=self.get_next_due_time(asset_class=asset_class, symbol=symbol, now=now))
+
+            if len(self.schedule) == 0:
+                self.stop_event.wait()
+            else:
+                pseudo_realtime_timestep(epoch_start_time=now, timestep=self.schedule[0][0] - now,
+                                         stop_event=self.stop_event)
 
     def stop(self) -> None:
         self.running = False
+        self.stop_event.set()
         Logger.verbose_console_log(verbose=self.verbose,
                                    message=str(type(self)) + " is stopping...",
                                    message_type=Message.MESSAGE_TYPE.STATUS)
@@ -0,0 +1,217 @@
+#/usr/bin/env python
+"""event_bus.py: in-process publish/subscribe bus for price and equity events."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, List, Callable, Union, NamedTuple, Any, Type
+from enum import Enum, unique
+from collections import deque
+from threading import Lock, Condition, Thread
+
+# 3rd party modules
+from StatusLogger import Logger, Message
+
+
+class PriceTick(NamedTuple):
+    """A price applied to a holding."""
+    asset_class: str
+    symbol: str
+    price: float
+    time: float
+    stale: bool = False
+
+
+class EquitySnapshot(NamedTuple):
+    """A committed holdings tick."""
+    version: int
+    time: float
+    equities: Dict[str, float]
+    snapshot: Any
+
+
+class Subscription(object):
+    """Bounded queue of events for one consumer, drained by a dispatcher thread or by polling get."""
+
+    def __init__(self, bus: EventBus, event_type: Type, name: str, max_queue: int,
+                 policy: Subscription.POLICY, callback: Union[Callable[[Any], None], None]):
+        """Constructor. Use EventBus.subscribe.
+
+        Args:
+            bus (EventBus): Bus the subscription belongs to.
+            event_type (Type): Type of the events received.
+            name (str): Consumer name used in log messages and stats.
+            max_queue (int): Most events waiting to be consumed.
+            policy (Subscription.POLICY): What publish does when the queue is full.
+            callback (Union[Callable[[Any], None], None]): Called with every event on a dispatcher thread. None to poll get."""
+        self.bus: EventBus = bus
+        self.event_type: Type = event_type
+        self.name: str = name
+        self.max_queue: int = max(int(max_queue), 1)
+        self.policy: Subscription.POLICY = policy
+        self.callback: Union[Callable[[Any], None], None] = callback
+        self.queue: deque = deque()
+        self.condition: Condition = Condition()
+        self.active: bool = True
+        self.delivered_count: int = 0
+        self.dropped_count: int = 0
+        self.thread: Union[Thread, None] = None
+
+        if callback is not None:
+            self.thread = Thread(target=self.dispatch, name=f"EventBus-{name}", daemon=True)
+            self.thread.start()
+
+    def offer(self, event: Any, block_timeout: Union[float, None]) -> bool:
+        """Queues an event according to the subscription's policy.
+
+        Args:
+            event (Any): Published event.
+            block_timeout (Union[float, None]): Longest back-pressure wait for the BLOCK policy, None to wait indefinitely.
+
+        Returns:
+            bool: False if the event, or an older one, was dropped."""
+        with self.condition:
+            if not self.active:
+                return True
+            if len(self.queue) >= self.max_queue:
+                if self.policy == Subscription.POLICY.DROP_NEWEST:
+                    self.dropped_count += 1
+                    return False
+                if self.policy == Subscription.POLICY.DROP_OLDEST:
+                    self.queue.popleft()
+                    self.dropped_count += 1
+                    self.queue.append(event)
+                    self.condition.notify_all()
+                    return False
+                if not self.condition.wait_for(lambda: len(self.queue) < self.max_queue or not self.active,
+                                               timeout=block_timeout):
+                    self.dropped_count += 1
+                    return False
+            self.queue.append(event)
+            self.condition.notify_all()
+            return True
+
+    def get(self, timeout: Union[float, None] = None) -> Union[Any, None]:
+        """Takes the oldest queued event.
+
+        Args:
+            timeout (Union[float, None], optional): Longest wait for an event, None to wait indefinitely. Defaults to None.
+
+        Returns:
+            Union[Any, None]: Event, None on timeout or once unsubscribed."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.queue) > 0 or not self.active, timeout=timeout):
+                return None
+            if len(self.queue) == 0:
+                return None
+            event = self.queue.popleft()
+            self.delivered_count += 1
+            # Wakes publishers waiting on back-pressure.
+            self.condition.notify_all()
+            return event
+
+    def dispatch(self) -> None:
+        while self.active:
+            event = self.get()
+            if event is None:
+                continue
+            try:
+                self.callback(event)
+            except Exception as error:
+                Logger.console_log(message=f"Exception {error} encountered in event bus subscriber {self.name}.",
+                                   message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+
+    def close(self) -> None:
+        """Stops receiving events and releases any waiting publisher or consumer."""
+        self.bus.unsubscribe(subscription=self)
+        with self.condition:
+            self.active = False
+            self.queue.clear()
+            self.condition.notify_all()
+
+    def stats(self) -> Dict[str, Union[str, int]]:
+        """Delivery counters.
+
+        Returns:
+            Dict[str, Union[str, int]]: Queue depth, delivered and dropped events."""
+        with self.condition:
+            return {"name": self.name, "queued": len(self.queue), "delivered": self.delivered_count,
+                    "dropped": self.dropped_count}
+
+    @unique
+    class POLICY(Enum):
+        DROP_NEWEST = "drop newest"
+        DROP_OLDEST = "drop oldest"
+        BLOCK = "block"
+
+
+class EventBus(object):
+    """Fans events out to every subscription of their type without running consumer code on the publishing thread.
+
+    Publishing costs one bounded queue append per subscriber. Slow consumers either lose events, oldest or newest
+    first, or apply back-pressure to the publisher for at most block_timeout, as chosen per subscription."""
+
+    def __init__(self, block_timeout: Union[float, None] = 5.):
+        """Constructor.
+
+        Args:
+            block_timeout (Union[float, None], optional): Longest a publisher waits on a full BLOCK subscription
+                before dropping the event for it. Defaults to 5."""
+        self.block_timeout: Union[float, None] = block_timeout
+        self.subscriptions: Dict[Type, List[Subscription]] = {}
+        self.lock: Lock = Lock()
+        self.published_count: int = 0
+
+    def subscribe(self, event_type: Type, name: str, callback: Union[Callable[[Any], None], None] = None,
+                  max_queue: int = 1024, policy: Subscription.POLICY = Subscription.POLICY.DROP_OLDEST) -> Subscription:
+        """Registers a consumer of one event type.
+
+        Args:
+            event_type (Type): Type of the events to receive, e.g. PriceTick or EquitySnapshot.
+            name (str): Consumer name used in log messages and stats.
+            callback (Union[Callable[[Any], None], None], optional): Called with every event on a dedicated thread.
+                Defaults to None, in which case the consumer polls Subscription.get.
+            max_queue (int, optional): Most events waiting to be consumed. Defaults to 1024.
+            policy (Subscription.POLICY, optional): What publish does when the queue is full. Defaults to DROP_OLDEST.
+
+        Returns:
+            Subscription: Handle to poll, inspect or close."""
+        subscription = Subscription(bus=self, event_type=event_type, name=name, max_queue=max_queue, policy=policy,
+                                    callback=callback)
+        with self.lock:
+            self.subscriptions[event_type] = self.subscriptions.get(event_type, []) + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Removes a subscription. Prefer Subscription.close, which also stops its dispatcher.
+
+        Args:
+            subscription (Subscription): Subscription to remove."""
+        with self.lock:
+            self.subscriptions[subscription.event_type] = [registered for registered in self.subscriptions.get(subscription.event_type, [])
+                                                           if registered is not subscription]
+
+    def publish(self, event: Any) -> None:
+        """Queues an event for every subscriber of its type.
+
+        Args:
+            event (Any): Event to publish."""
+        # Subscription lists are replaced rather than mutated, so they can be iterated without the lock.
+        subscriptions = self.subscriptions.get(type(event), [])
+        self.published_count += 1
+        for subscription in subscriptions:
+            subscription.offer(event=event, block_timeout=self.block_timeout)
+
+    def stats(self) -> List[Dict[str, Union[str, int]]]:
+        """Delivery counters of every subscription.
+
+        Returns:
+            List[Dict[str, Union[str, int]]]: Stats per subscription."""
+        with self.lock:
+            subscriptions = [subscription for subscriptions in self.subscriptions.values() for subscription in subscriptions]
+        return [subscription.stats() for subscription in subscriptions]
+
+
+EVENT_BUS: EventBus = EventBus()
@@ -0,0 +1,240 @@
+#/usr/bin/env python
+"""history_file.py: durable, memory-mapped, append-only tick history."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, List, Tuple, Union
+from os import makedirs, fsync, replace
+from os.path import join, isfile, getsize
+from json import load, dump
+from threading import Lock
+from time import time
+
+# 3rd party modules
+from numpy import dtype, ndarray, memmap, zeros, empty, searchsorted, float64
+
+
+class HistoryFile(object):
+    """Fixed-width tick records in an append-only file, plus a small per-tick time index.
+
+    Both files are memory-mapped read-only on startup, so months of history are available without parsing.
+    Appends are written and flushed immediately, while fsync is batched to at most once per fsync_interval."""
+    MAGIC: bytes = b"STOCKERH"
+    VERSION: int = 1
+    HEADER_SIZE: int = 64
+    DATA_FILE_NAME: str = "ticks.bin"
+    INDEX_FILE_NAME: str = "ticks.idx"
+    LABELS_FILE_NAME: str = "labels.json"
+    RECORD_DTYPE: dtype = dtype([("datetime", "<f8"), ("store", "u1"), ("holding_id", "<u4"),
+                                 ("quantity", "<f8"), ("price", "<f8"), ("equity", "<f8"), ("extra", "<f8")], align=True)
+    INDEX_DTYPE: dtype = dtype([("datetime", "<f8"), ("first_record", "<u8"), ("record_count", "<u8")])
+
+    def __init__(self, directory: str, fsync_interval: float = 5.):
+        """Constructor.
+
+        Args:
+            directory (str): Directory holding the history files. Created if missing.
+            fsync_interval (float, optional): Longest time in seconds appended ticks may stay unsynced. Defaults to 5."""
+        self.directory: str = directory
+        self.fsync_interval: float = fsync_interval
+        self.data_file_path: str = join(directory, HistoryFile.DATA_FILE_NAME)
+        self.index_file_path: str = join(directory, HistoryFile.INDEX_FILE_NAME)
+        self.labels_file_path: str = join(directory, HistoryFile.LABELS_FILE_NAME)
+        self.lock: Lock = Lock()
+        self.last_fsync: float = time()
+        self.unsynced: bool = False
+
+        makedirs(directory, exist_ok=True)
+        self.record_count, self.tick_count = self._recover()
+        self.labels: Dict[str, List[str]] = self._load_labels()
+        self.data_file = open(self.data_file_path, "ab")
+        self.index_file = open(self.index_file_path, "ab")
+
+    def _recover(self) -> Tuple[int, int]:
+        """Writes a header into a new data file and trims a torn trailing record or index entry after a crash.
+
+        Returns:
+            Tuple[int, int]: Number of complete records and index entries."""
+        if not isfile(self.data_file_path) or getsize(self.data_file_path) < HistoryFile.HEADER_SIZE:
+            header = bytearray(HistoryFile.HEADER_SIZE)
+            header[:8] = HistoryFile.MAGIC
+            header[8:12] = HistoryFile.VERSION.to_bytes(4, "little")
+            header[12:16] = HistoryFile.RECORD_DTYPE.itemsize.to_bytes(4, "little")
+            with open(self.data_file_path, "wb") as data_file:
+                data_file.write(header)
+            with open(self.index_file_path, "wb"):
+                pass
+            return 0, 0
+
+        with open(self.data_file_path, "rb") as data_file:
+            header = data_file.read(HistoryFile.HEADER_SIZE)
+        assert header[:8] == HistoryFile.MAGIC, f"{self.data_file_path} is not a Stocker history file."
+        assert int.from_bytes(header[12:16], "little") == HistoryFile.RECORD_DTYPE.itemsize, \
+            f"{self.data_file_path} was written with an incompatible record layout."
+
+        record_count = (getsize(self.data_file_path) - HistoryFile.HEADER_SIZE) // HistoryFile.RECORD_DTYPE.itemsize
+        tick_count = getsize(self.index_file_path) // HistoryFile.INDEX_DTYPE.itemsize if isfile(self.index_file_path) else 0
+
+        # Keep only ticks whose records all made it to disk and drop any records past the last whole tick.
+        index: ndarray = self._map(file_path=self.index_file_path, record_dtype=HistoryFile.INDEX_DTYPE,
+                                   offset=0, count=tick_count)
+        tick_ends: ndarray = index["first_record"] + index["record_count"]
+        while tick_count > 0 and tick_ends[tick_count - 1] > record_count:
+            tick_count -= 1
+        record_count = int(tick_ends[tick_count - 1]) if tick_count > 0 else 0
+        del index, tick_ends
+
+        with open(self.data_file_path, "r+b") as data_file:
+            data_file.truncate(HistoryFile.HEADER_SIZE + record_count * HistoryFile.RECORD_DTYPE.itemsize)
+        with open(self.index_file_path, "a+b") as index_file:
+            index_file.truncate(tick_count * HistoryFile.INDEX_DTYPE.itemsize)
+
+        return record_count, tick_count
+
+    @staticmethod
+    def _map(file_path: str, record_dtype: dtype, offset: int, count: int) -> ndarray:
+        if count == 0:
+            return zeros(0, dtype=record_dtype)
+        return memmap(file_path, dtype=record_dtype, mode="r", offset=offset, shape=(count,))
+
+    def _load_labels(self) -> Dict[str, List[str]]:
+        if not isfile(self.labels_file_path):
+            return {}
+        with open(self.labels_file_path, "r") as labels_file:
+            return load(labels_file)
+
+    def records(self) -> ndarray:
+        """Read-only memory map of every complete record.
+
+        Returns:
+            ndarray: Structured array with RECORD_DTYPE fields."""
+        with self.lock:
+            self._flush()
+            return HistoryFile._map(file_path=self.data_file_path, record_dtype=HistoryFile.RECORD_DTYPE,
+                                    offset=HistoryFile.HEADER_SIZE, count=self.record_count)
+
+    def index(self) -> ndarray:
+        """Read-only memory map of the per-tick time index.
+
+        Returns:
+            ndarray: Structured array of tick times and the position of each tick's first record."""
+        with self.lock:
+            self._flush()
+            return HistoryFile._map(file_path=self.index_file_path, record_dtype=HistoryFile.INDEX_DTYPE,
+                                    offset=0, count=self.tick_count)
+
+    def time_range(self, start: float, end: float) -> ndarray:
+        """Records of the ticks between start and end, located through the time index.
+
+        Args:
+            start (float): Earliest tick time, inclusive.
+            end (float): Latest tick time, inclusive.
+
+        Returns:
+            ndarray: Read-only slice of the record map."""
+        index = self.index()
+        first_tick = int(searchsorted(index["datetime"], start, side="left"))
+        last_tick = int(searchsorted(index["datetime"], end, side="right"))
+        if first_tick >= last_tick:
+            return zeros(0, dtype=HistoryFile.RECORD_DTYPE)
+
+        first_record = int(index["first_record"][first_tick])
+        last_record = int(index["first_record"][last_tick - 1] + index["record_count"][last_tick - 1])
+        return self.records()[first_record:last_record]
+
+    def update_labels(self, labels: Dict[str, List[str]]) -> None:
+        """Persists the holding id to label mapping of every store when it has grown.
+
+        Args:
+            labels (Dict[str, List[str]]): Labels in holding id order by store name."""
+        with self.lock:
+            if labels == self.labels:
+                return
+            temporary_file_path = self.labels_file_path + ".tmp"
+            with open(temporary_file_path, "w") as labels_file:
+                dump(labels, labels_file)
+                labels_file.flush()
+                fsync(labels_file.fileno())
+            replace(temporary_file_path, self.labels_file_path)
+            self.labels = {store_name: list(store_labels) for store_name, store_labels in labels.items()}
+
+    def append_tick(self, update_time: float, records: ndarray) -> None:
+        """Appends every record of one tick and its index entry.
+
+        Args:
+            update_time (float): Epoch time of the tick.
+            records (ndarray): Structured array with RECORD_DTYPE fields."""
+        if len(records) == 0:
+            return
+
+        index_entry = empty(1, dtype=HistoryFile.INDEX_DTYPE)
+        index_entry["datetime"] = update_time
+
+        with self.lock:
+            index_entry["first_record"] = self.record_count
+            index_entry["record_count"] = len(records)
+            # Records go first so a crash can only leave records without an index entry, which _recover trims.
+            self.data_file.write(records.astype(HistoryFile.RECORD_DTYPE, copy=False).tobytes())
+            self.index_file.write(index_entry.tobytes())
+            self._flush()
+            self.record_count += len(records)
+            self.tick_count += 1
+            self.unsynced = True
+
+            if time() - self.last_fsync >= self.fsync_interval:
+                self._sync()
+
+    def _flush(self) -> None:
+        self.data_file.flush()
+        self.index_file.flush()
+
+    def _sync(self) -> None:
+        self._flush()
+        fsync(self.data_file.fileno())
+        fsync(self.index_file.fileno())
+        self.last_fsync = time()
+        self.unsynced = False
+
+    def sync(self) -> None:
+        """Forces appended ticks to disk."""
+        with self.lock:
+            if self.unsynced:
+                self._sync()
+
+    def close(self) -> None:
+        """Syncs and closes the history files."""
+        with self.lock:
+            if self.data_file.closed:
+                return
+            self._sync()
+            self.data_file.close()
+            self.index_file.close()
+
+    @staticmethod
+    def build_records(update_time: float, store_code: int, holding_ids: ndarray, quantities: ndarray,
+                      prices: ndarray, equities: ndarray, extras: Union[ndarray, None] = None) -> ndarray:
+        """Packs one store's rows of a tick into fixed-width records.
+
+        Args:
+            update_time (float): Epoch time of the tick.
+            store_code (int): Code of the store the rows belong to.
+            holding_ids (ndarray): Holding ids.
+            quantities (ndarray): Held quantities.
+            prices (ndarray): Prices per unit.
+            equities (ndarray): Row equities.
+            extras (Union[ndarray, None], optional): Values of the store's extra column. Defaults to None.
+
+        Returns:
+            ndarray: Structured array with RECORD_DTYPE fields."""
+        records = zeros(len(holding_ids), dtype=HistoryFile.RECORD_DTYPE)
+        records["datetime"] = update_time
+        records["store"] = store_code
+        records["holding_id"] = holding_ids
+        records["quantity"] = quantities
+        records["price"] = prices
+        records["equity"] = equities
+        records["extra"] = float64("nan") if extras is None else extras
+        return records
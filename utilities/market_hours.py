@@ -0,0 +1,361 @@
+#/usr/bin/env python
+"""market_hours.py: US equity trading sessions in exchange local time, following the NYSE holiday calendar."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, List, Tuple, Union
+from enum import Enum, unique
+from datetime import datetime, date, time as time_of_day, timedelta
+from zoneinfo import ZoneInfo
+from threading import Lock
+
+# 3rd party modules
+from numpy import array, ndarray, arange, searchsorted, int8, int32, float64
+
+EXCHANGE_TIMEZONE: ZoneInfo = ZoneInfo("America/New_York")
+
+
+@unique
+class MarketSession(Enum):
+    PRE_MARKET = "pre-market"
+    REGULAR = "regular"
+    AFTER_HOURS = "after-hours"
+    CLOSED = "closed"
+
+
+# Session starting at each boundary of a trading day, in exchange local time.
+SESSION_BOUNDARIES: Tuple[Tuple[time_of_day, MarketSession], ...] = (
+    (time_of_day(4, 0), MarketSession.PRE_MARKET),
+    (time_of_day(9, 30), MarketSession.REGULAR),
+    (time_of_day(16, 0), MarketSession.AFTER_HOURS),
+    (time_of_day(20, 0), MarketSession.CLOSED)
+)
+
+# Session boundaries of half days, when the regular session closes at 1 pm and extended hours at 5 pm.
+EARLY_CLOSE_SESSION_BOUNDARIES: Tuple[Tuple[time_of_day, MarketSession], ...] = (
+    (time_of_day(4, 0), MarketSession.PRE_MARKET),
+    (time_of_day(9, 30), MarketSession.REGULAR),
+    (time_of_day(13, 0), MarketSession.AFTER_HOURS),
+    (time_of_day(17, 0), MarketSession.CLOSED)
+)
+
+# Closures outside the holiday rules: national days of mourning and weather.
+SPECIAL_CLOSURES: Dict[date, str] = {
+    date(2012, 10, 29): "Hurricane Sandy",
+    date(2012, 10, 30): "Hurricane Sandy",
+    date(2018, 12, 5): "National Day of Mourning for George H.W. Bush",
+    date(2025, 1, 9): "National Day of Mourning for Jimmy Carter"
+}
+
+
+def get_easter(year: int) -> date:
+    """Western Easter Sunday, by the anonymous Gregorian algorithm.
+
+    Args:
+        year (int): Year.
+
+    Returns:
+        date: Easter Sunday."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def get_nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """Date of the nth weekday of a month, counting from the end when n is negative.
+
+    Args:
+        year (int): Year.
+        month (int): Month.
+        weekday (int): Weekday, 0 for Monday.
+        n (int): 1 for the first, -1 for the last.
+
+    Returns:
+        date: Requested day."""
+    if n > 0:
+        first_day = date(year, month, 1)
+        return first_day + timedelta(days=(weekday - first_day.weekday()) % 7 + 7 * (n - 1))
+    last_day = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last_day - timedelta(days=(last_day.weekday() - weekday) % 7 + 7 * (-n - 1))
+
+
+def get_observed(day: date) -> date:
+    """Weekday a fixed date holiday is observed on: Friday for Saturday, Monday for Sunday.
+
+    Args:
+        day (date): Holiday.
+
+    Returns:
+        date: Observed day."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def get_holidays(year: int) -> Dict[date, str]:
+    """NYSE full day closures of a year.
+
+    Args:
+        year (int): Year.
+
+    Returns:
+        Dict[date, str]: Holiday names by exchange local date."""
+    holidays: Dict[date, str] = {}
+
+    # New Year's Day on a Saturday is not observed on the last trading day of the previous year.
+    new_years_day = date(year, 1, 1)
+    if new_years_day.weekday() != 5:
+        holidays[get_observed(day=new_years_day)] = "New Year's Day"
+    if year >= 1998:
+        holidays[get_nth_weekday(year=year, month=1, weekday=0, n=3)] = "Martin Luther King Jr. Day"
+    holidays[get_nth_weekday(year=year, month=2, weekday=0, n=3)] = "Washington's Birthday"
+    holidays[get_easter(year=year) - timedelta(days=2)] = "Good Friday"
+    holidays[get_nth_weekday(year=year, month=5, weekday=0, n=-1)] = "Memorial Day"
+    if year >= 2022:
+        holidays[get_observed(day=date(year, 6, 19))] = "Juneteenth"
+    holidays[get_observed(day=date(year, 7, 4))] = "Independence Day"
+    holidays[get_nth_weekday(year=year, month=9, weekday=0, n=1)] = "Labor Day"
+    holidays[get_nth_weekday(year=year, month=11, weekday=3, n=4)] = "Thanksgiving Day"
+    holidays[get_observed(day=date(year, 12, 25))] = "Christmas Day"
+
+    for closure_day, closure_name in SPECIAL_CLOSURES.items():
+        if closure_day.year == year:
+            holidays[closure_day] = closure_name
+    return holidays
+
+
+def get_early_closes(year: int) -> Dict[date, str]:
+    """NYSE half days of a year.
+
+    Args:
+        year (int): Year.
+
+    Returns:
+        Dict[date, str]: Reason for the early close by exchange local date."""
+    holidays = get_holidays(year=year)
+    candidates: Dict[date, str] = {
+        date(year, 7, 3): "Day before Independence Day",
+        get_nth_weekday(year=year, month=11, weekday=3, n=4) + timedelta(days=1): "Day after Thanksgiving",
+        date(year, 12, 24): "Christmas Eve"
+    }
+    return {day: reason for day, reason in candidates.items() if day.weekday() < 5 and day not in holidays}
+
+
+class ExchangeCalendar(object):
+    """Precomputed session table answering session and next transition queries in constant time.
+
+    Every session boundary falls on a half hour in exchange local time, and the exchange time zone is offset from
+    UTC by whole hours, so boundaries are also whole half hours of epoch time. The table stores, for every epoch
+    half hour in the covered years, the index of the session transition in effect, which makes a lookup one
+    division and two array reads. Lookups outside the covered years extend the table."""
+    RESOLUTION: int = 1800
+
+    def __init__(self, first_year: Union[int, None] = None, last_year: Union[int, None] = None):
+        """Constructor.
+
+        Args:
+            first_year (Union[int, None], optional): First year covered. Defaults to five years ago.
+            last_year (Union[int, None], optional): Last year covered. Defaults to five years from now."""
+        current_year = datetime.now(EXCHANGE_TIMEZONE).year
+        self.lock: Lock = Lock()
+        self.build(first_year=current_year - 5 if first_year is None else first_year,
+                   last_year=current_year + 5 if last_year is None else last_year)
+
+    def build(self, first_year: int, last_year: int) -> None:
+        """Computes the session table of a range of years.
+
+        Args:
+            first_year (int): First year covered.
+            last_year (int): Last year covered.
+
+        Raises:
+            ValueError: A session boundary does not fall on a half hour of epoch time."""
+        holidays: Dict[date, str] = {}
+        early_closes: Dict[date, str] = {}
+        for year in range(first_year, last_year + 1):
+            holidays.update(get_holidays(year=year))
+            early_closes.update(get_early_closes(year=year))
+
+        first_day, last_day = date(first_year, 1, 1), date(last_year, 12, 31)
+        transitions: List[Tuple[float, MarketSession]] = [
+            (datetime.combine(first_day, time_of_day(0, 0), tzinfo=EXCHANGE_TIMEZONE).timestamp(), MarketSession.CLOSED)]
+        day = first_day
+        while day <= last_day:
+            boundaries = EARLY_CLOSE_SESSION_BOUNDARIES if day in early_closes else SESSION_BOUNDARIES
+            if day.weekday() < 5 and day not in holidays:
+                for boundary, session in boundaries:
+                    if session != transitions[-1][1]:
+                        transitions.append((datetime.combine(day, boundary, tzinfo=EXCHANGE_TIMEZONE).timestamp(), session))
+            day += timedelta(days=1)
+        end_time = datetime.combine(last_day + timedelta(days=1), time_of_day(0, 0), tzinfo=EXCHANGE_TIMEZONE).timestamp()
+
+        transition_times: ndarray = array([transition_time for transition_time, _ in transitions], dtype=float64)
+        if (transition_times % ExchangeCalendar.RESOLUTION != 0).any():
+            raise ValueError("Session boundaries must fall on half hours of epoch time.")
+        sessions: List[MarketSession] = list(MarketSession)
+        transition_sessions: ndarray = array([sessions.index(session) for _, session in transitions], dtype=int8)
+
+        origin: float = transition_times[0]
+        bucket_starts: ndarray = origin + arange(int((end_time - origin) // ExchangeCalendar.RESOLUTION), dtype=float64) * ExchangeCalendar.RESOLUTION
+        bucket_transitions: ndarray = (searchsorted(transition_times, bucket_starts, side="right") - 1).astype(int32)
+
+        with self.lock:
+            # Swapped in as one tuple so lookups on other threads never see a half built table.
+            self.table = (origin, end_time, transition_times, transition_sessions, bucket_transitions, sessions)
+            self.first_year, self.last_year = first_year, last_year
+            self.holidays, self.early_closes = holidays, early_closes
+
+    def cover(self, at: float) -> Tuple[float, float, ndarray, ndarray, ndarray, List[MarketSession]]:
+        """Session table covering a time, extending it first if needed.
+
+        Args:
+            at (float): Epoch time.
+
+        Returns:
+            Tuple[float, float, ndarray, ndarray, ndarray, List[MarketSession]]: Origin, end time, transition times,
+                transition sessions, transition index of every half hour and session by code."""
+        table = self.table
+        # The last transition is always followed by one more so next_session_change can read past it.
+        if table[0] <= at and at < table[1] - 7 * 86400:
+            return table
+        year = datetime.fromtimestamp(at, EXCHANGE_TIMEZONE).year
+        self.build(first_year=min(self.first_year, year), last_year=max(self.last_year, year + 1))
+        return self.table
+
+    def get_transition_index(self, at: float) -> Tuple[int, Tuple[float, float, ndarray, ndarray, ndarray, List[MarketSession]]]:
+        table = self.cover(at=at)
+        return int(table[4][int((at - table[0]) // ExchangeCalendar.RESOLUTION)]), table
+
+    def get_session(self, at: float) -> MarketSession:
+        """Trading session in effect at a time.
+
+        Args:
+            at (float): Epoch time.
+
+        Returns:
+            MarketSession: Session in effect."""
+        transition_index, table = self.get_transition_index(at=at)
+        return table[5][table[3][transition_index]]
+
+    def next_session_change(self, at: float) -> Tuple[float, MarketSession]:
+        """First time after at where the trading session changes.
+
+        Args:
+            at (float): Epoch time.
+
+        Returns:
+            Tuple[float, MarketSession]: Time of the change and the session it starts."""
+        transition_index, table = self.get_transition_index(at=at)
+        return float(table[2][transition_index + 1]), table[5][table[3][transition_index + 1]]
+
+    def is_holiday(self, day: date) -> bool:
+        """Whether the exchange is closed for a holiday or special closure on a day.
+
+        Args:
+            day (date): Exchange local date.
+
+        Returns:
+            bool: True on full day closures."""
+        if not self.first_year <= day.year <= self.last_year:
+            return day in get_holidays(year=day.year)
+        return day in self.holidays
+
+    def is_early_close(self, day: date) -> bool:
+        """Whether the regular session closes at 1 pm on a day.
+
+        Args:
+            day (date): Exchange local date.
+
+        Returns:
+            bool: True on half days."""
+        if not self.first_year <= day.year <= self.last_year:
+            return day in get_early_closes(year=day.year)
+        return day in self.early_closes
+
+    def is_trading_day(self, day: date) -> bool:
+        """Whether the exchange trades on a day.
+
+        Args:
+            day (date): Exchange local date.
+
+        Returns:
+            bool: True on weekdays that are not holidays."""
+        return day.weekday() < 5 and not self.is_holiday(day=day)
+
+
+EXCHANGE_CALENDAR: ExchangeCalendar = ExchangeCalendar()
+
+
+def is_trading_day(day: date) -> bool:
+    """Whether the exchange trades on a day.
+
+    Args:
+        day (date): Exchange local date.
+
+    Returns:
+        bool: True on weekdays that are not NYSE holidays."""
+    return EXCHANGE_CALENDAR.is_trading_day(day=day)
+
+
+def get_session_boundaries(day: date) -> List[Tuple[float, MarketSession]]:
+    """Epoch times at which each session of a day starts.
+
+    Args:
+        day (date): Exchange local date.
+
+    Returns:
+        List[Tuple[float, MarketSession]]: Start time and session, empty on days the exchange does not trade."""
+    if not is_trading_day(day=day):
+        return []
+    boundaries = EARLY_CLOSE_SESSION_BOUNDARIES if EXCHANGE_CALENDAR.is_early_close(day=day) else SESSION_BOUNDARIES
+    return [(datetime.combine(day, boundary, tzinfo=EXCHANGE_TIMEZONE).timestamp(), session)
+            for boundary, session in boundaries]
+
+
+def get_session(at: float) -> MarketSession:
+    """Trading session in effect at a time.
+
+    Args:
+        at (float): Epoch time.
+
+    Returns:
+        MarketSession: Session in effect."""
+    return EXCHANGE_CALENDAR.get_session(at=at)
+
+
+def next_session_change(at: float) -> Tuple[float, MarketSession]:
+    """First time after at where the trading session changes.
+
+    Args:
+        at (float): Epoch time.
+
+    Returns:
+        Tuple[float, MarketSession]: Time of the change and the session it starts."""
+    return EXCHANGE_CALENDAR.next_session_change(at=at)
+
+
+def next_regular_session_change(at: float) -> float:
+    """First time after at where the regular session opens or closes.
+
+    Args:
+        at (float): Epoch time.
+
+    Returns:
+        float: Epoch time of the next open if the regular session is not in effect at at, else of its close."""
+    in_regular_session = get_session(at=at) == MarketSession.REGULAR
+    change_time, session = next_session_change(at=at)
+    while (session == MarketSession.REGULAR) == in_regular_session:
+        change_time, session = next_session_change(at=change_time)
+    return change_time
@@ -0,0 +1,169 @@
+#/usr/bin/env python
+"""position_table.py: structured NumPy table of current positions, one row per holding."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, List, Iterable, Tuple, Union
+
+# 3rd party modules
+from numpy import dtype, ndarray, zeros, asarray, isnan, nan, nansum, float64
+
+
+class PositionTable(object):
+    """Current quantity, cost basis, investment and last price of every holding of one type.
+
+    Holding objects are thin views over a row of the table, so the whole table can be priced and valued with
+    vectorized column operations while the objects keep working as before."""
+    ROW_DTYPE: dtype = dtype([("symbol_id", "<i4"), ("quantity", "<f8"), ("cost_basis", "<f8"),
+                              ("investment", "<f8"), ("price", "<f8")])
+    INITIAL_CAPACITY: int = 16
+    GROWTH_FACTOR: int = 2
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        """Constructor.
+
+        Args:
+            capacity (int, optional): Initial number of preallocated rows. Defaults to INITIAL_CAPACITY."""
+        self.symbols: List[str] = []
+        self.symbol_ids: Dict[str, int] = {}
+        self.size: int = 0
+        self.capacity: int = max(int(capacity), 1)
+        self.rows: ndarray = PositionTable.empty_rows(row_count=self.capacity)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def empty_rows(row_count: int) -> ndarray:
+        """Rows with every value unknown.
+
+        Args:
+            row_count (int): Number of rows.
+
+        Returns:
+            ndarray: Structured array with ROW_DTYPE fields."""
+        rows = zeros(row_count, dtype=PositionTable.ROW_DTYPE)
+        for field in ("quantity", "cost_basis", "investment", "price"):
+            rows[field] = nan
+        return rows
+
+    def add(self, symbol: str, quantity: float = nan, cost_basis: float = nan, investment: float = nan,
+            price: float = nan) -> int:
+        """Appends the row of a holding.
+
+        Args:
+            symbol (str): Key of the holding.
+            quantity (float, optional): Held quantity. Defaults to nan.
+            cost_basis (float, optional): Cost basis per unit. Defaults to nan.
+            investment (float, optional): Total amount invested. Defaults to nan.
+            price (float, optional): Last price per unit. Defaults to nan.
+
+        Returns:
+            int: Row of the holding."""
+        assert symbol not in self.symbol_ids, f"{symbol} already has a position."
+
+        if self.size == self.capacity:
+            self.capacity *= PositionTable.GROWTH_FACTOR
+            grown_rows = PositionTable.empty_rows(row_count=self.capacity)
+            grown_rows[:self.size] = self.rows[:self.size]
+            self.rows = grown_rows
+
+        row = self.size
+        self.symbol_ids[symbol] = row
+        self.symbols.append(symbol)
+        self.rows[row] = (row, quantity, cost_basis, investment, price)
+        self.size += 1
+        return row
+
+    def row_of(self, symbol: str) -> int:
+        """Row of a holding.
+
+        Args:
+            symbol (str): Key of the holding.
+
+        Returns:
+            int: Row of the holding."""
+        return self.symbol_ids[symbol]
+
+    def column(self, field: str) -> ndarray:
+        """Read-only view of a field over every position.
+
+        Args:
+            field (str): One of ROW_DTYPE's fields.
+
+        Returns:
+            ndarray: Field values in row order."""
+        column_view = self.rows[field][:self.size]
+        column_view.flags.writeable = False
+        return column_view
+
+    def set_prices(self, prices: Dict[str, float]) -> None:
+        """Records the last price of many holdings in one scatter.
+
+        Args:
+            prices (Dict[str, float]): Prices by holding key. Unknown keys are ignored."""
+        updates: List[Tuple[int, float]] = [(self.symbol_ids[symbol], price) for symbol, price in prices.items()
+                                            if symbol in self.symbol_ids]
+        if len(updates) == 0:
+            return
+        rows, row_prices = zip(*updates)
+        self.rows["price"][list(rows)] = asarray(row_prices, dtype=float64)
+
+    def equities(self) -> ndarray:
+        """Equity of every position, nan where the price is not known yet.
+
+        Returns:
+            ndarray: Quantity times last price in row order."""
+        return self.rows["quantity"][:self.size] * self.rows["price"][:self.size]
+
+    def total_equity(self) -> float:
+        """Total equity of the positions with a known price.
+
+        Returns:
+            float: Sum of equities."""
+        return float(nansum(self.equities()))
+
+    def is_priced(self) -> bool:
+        """Whether every position has a known price.
+
+        Returns:
+            bool: True if no price is missing."""
+        return not isnan(self.rows["price"][:self.size]).any()
+
+
+def position_field(field: str, optional: bool = False) -> property:
+    """Property exposing a field of a holding's row in its PositionTable.
+
+    Args:
+        field (str): One of PositionTable.ROW_DTYPE's fields.
+        optional (bool, optional): Expose unknown (nan) values as None. Defaults to False.
+
+    Returns:
+        property: Read-write property for classes with table and row slots."""
+    def get_field(holding: object) -> Union[float, None]:
+        value = float(holding.table.rows[field][holding.row])
+        return None if optional and isnan(value) else value
+
+    def set_field(holding: object, value: Union[float, None]) -> None:
+        holding.table.rows[field][holding.row] = nan if value is None else value
+
+    return property(get_field, set_field, doc=f"{field} of the holding's position.")
+
+
+def adopt_positions(table: PositionTable, holdings: Iterable[Tuple[str, object]]) -> None:
+    """Moves the rows of holdings created with a private table into a shared one.
+
+    Args:
+        table (PositionTable): Shared table.
+        holdings (Iterable[Tuple[str, object]]): Holdings by key. Each must have table and row slots."""
+    for symbol, holding in holdings:
+        if holding.table is table:
+            continue
+        quantity, cost_basis, investment, price = (holding.table.rows[field][holding.row]
+                                                   for field in ("quantity", "cost_basis", "investment", "price"))
+        holding.row = table.add(symbol=symbol, quantity=quantity, cost_basis=cost_basis, investment=investment,
+                                price=price)
+        holding.table = table
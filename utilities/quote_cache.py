@@ -0,0 +1,258 @@
+#/usr/bin/env python
+"""quote_cache.py: process-wide TTL cache for price quotes shared by every price consumer."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, Tuple, Callable, Union, List, Any, Hashable
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from sys import getsizeof
+from time import time
+
+
+class QuoteCache(object):
+    """Thread-safe LRU cache of quotes with a TTL per asset class.
+
+    Concurrent requests for the same quote are coalesced onto a single fetch and the least recently used
+    entries are evicted once the estimated memory use exceeds max_bytes."""
+    DEFAULT_TTLS: Dict[str, float] = {
+        "stock": 30.,
+        "crypto": 15.,
+        "snapshot": 15.
+    }
+    DEFAULT_TTL: float = 30.
+    # Quotes fetched by a background retry must outlive the slowest PriceChecker period of their asset class,
+    # otherwise they expire before the next tick reads them.
+    RETRY_TTLS: Dict[str, float] = {
+        "stock": 300.,
+        "crypto": 60.
+    }
+    DEFAULT_MAX_BYTES: int = 32 * 1024 * 1024
+
+    def __init__(self, ttls: Union[Dict[str, float], None] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Constructor.
+
+        Args:
+            ttls (Union[Dict[str, float], None], optional): Seconds a quote stays fresh per asset class. Defaults to DEFAULT_TTLS.
+            max_bytes (int, optional): Estimated memory limit of the cached values. Defaults to DEFAULT_MAX_BYTES."""
+        self.ttls: Dict[str, float] = dict(QuoteCache.DEFAULT_TTLS if ttls is None else ttls)
+        self.max_bytes: int = max_bytes
+        self.entries: OrderedDict[Tuple[str, Hashable], Tuple[Any, float, int, Union[float, None]]] = OrderedDict()
+        self.in_flight: Dict[Tuple[str, Hashable], Future] = {}
+        self.total_bytes: int = 0
+        self.lock: Lock = Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def configure(self, ttls: Union[Dict[str, float], None] = None, max_bytes: Union[int, None] = None) -> None:
+        """Updates TTLs and the memory limit.
+
+        Args:
+            ttls (Union[Dict[str, float], None], optional): TTL overrides per asset class. Defaults to None.
+            max_bytes (Union[int, None], optional): New memory limit. Defaults to None."""
+        with self.lock:
+            if ttls is not None:
+                self.ttls.update(ttls)
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+                self._evict()
+
+    def ttl(self, asset_class: str) -> float:
+        """Seconds a quote of the asset class stays fresh.
+
+        Args:
+            asset_class (str): Asset class of the quote.
+
+        Returns:
+            float: TTL in seconds."""
+        return self.ttls.get(asset_class, QuoteCache.DEFAULT_TTL)
+
+    def peek(self, asset_class: str, key: Hashable) -> Union[Any, None]:
+        """Returns a fresh cached quote without fetching.
+
+        Args:
+            asset_class (str): Asset class of the quote.
+            key (Hashable): Symbol or other identity of the quote.
+
+        Returns:
+            Union[Any, None]: Cached value, None when missing or expired."""
+        with self.lock:
+            return self._lookup(cache_key=(asset_class, key))
+
+    def put(self, asset_class: str, key: Hashable, value: Any, ttl: Union[float, None] = None) -> None:
+        """Stores a quote fetched elsewhere.
+
+        Args:
+            asset_class (str): Asset class of the quote.
+            key (Hashable): Symbol or other identity of the quote.
+            value (Any): Quote to cache.
+            ttl (Union[float, None], optional): Seconds this quote stays fresh. Defaults to the asset class TTL."""
+        with self.lock:
+            self._store(cache_key=(asset_class, key), value=value, ttl=ttl)
+
+    def get(self, asset_class: str, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """Returns a fresh quote, calling fetch at most once across all concurrent callers.
+
+        Args:
+            asset_class (str): Asset class of the quote.
+            key (Hashable): Symbol or other identity of the quote.
+            fetch (Callable[[], Any]): Fetches the quote on a miss. Exceptions propagate to every waiting caller.
+
+        Returns:
+            Any: Cached or freshly fetched quote."""
+        cache_key = (asset_class, key)
+
+        with self.lock:
+            value = self._lookup(cache_key=cache_key)
+            if value is not None:
+                return value
+            future = self.in_flight.get(cache_key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.in_flight[cache_key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as error:
+            with self.lock:
+                del self.in_flight[cache_key]
+            future.set_exception(error)
+            raise
+
+        with self.lock:
+            if value is not None:
+                self._store(cache_key=cache_key, value=value)
+            del self.in_flight[cache_key]
+        future.set_result(value)
+        return value
+
+    def get_many(self, asset_class: str, keys: List[Hashable],
+                 fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """Returns fresh quotes for many keys, fetching only the ones nobody has cached or is already fetching.
+
+        Args:
+            asset_class (str): Asset class of the quotes.
+            keys (List[Hashable]): Symbols or other identities of the quotes.
+            fetch_many (Callable[[List[Hashable]], Dict[Hashable, Any]]): Fetches a batch of missing quotes in one
+                request. Keys it leaves out are reported as missing to every waiting caller.
+
+        Returns:
+            Dict[Hashable, Any]: Quotes by key. Keys that could not be fetched are left out."""
+        values: Dict[Hashable, Any] = {}
+        owned_futures: Dict[Hashable, Future] = {}
+        waiting_futures: Dict[Hashable, Future] = {}
+
+        with self.lock:
+            for key in keys:
+                cache_key = (asset_class, key)
+                value = self._lookup(cache_key=cache_key)
+                if value is not None:
+                    values[key] = value
+                elif cache_key in self.in_flight:
+                    waiting_futures[key] = self.in_flight[cache_key]
+                else:
+                    owned_futures[key] = self.in_flight[cache_key] = Future()
+
+        if len(owned_futures) > 0:
+            try:
+                fetched_values: Dict[Hashable, Any] = fetch_many(list(owned_futures.keys()))
+            except BaseException as error:
+                fetched_values = {}
+                fetch_error: Union[BaseException, None] = error
+            else:
+                fetch_error = None
+
+            with self.lock:
+                for key in owned_futures.keys():
+                    value = fetched_values.get(key)
+                    if value is not None:
+                        self._store(cache_key=(asset_class, key), value=value)
+                    del self.in_flight[(asset_class, key)]
+
+            for key, future in owned_futures.items():
+                future.set_result(fetched_values.get(key))
+                if fetched_values.get(key) is not None:
+                    values[key] = fetched_values[key]
+
+            if fetch_error is not None and len(values) == 0 and len(waiting_futures) == 0:
+                raise fetch_error
+
+        for key, future in waiting_futures.items():
+            try:
+                value = future.result()
+            except Exception:
+                value = None
+            if value is not None:
+                values[key] = value
+
+        return values
+
+    def stats(self) -> Dict[str, float]:
+        """Hit, miss and memory counters.
+
+        Returns:
+            Dict[str, float]: Cache statistics."""
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.total_bytes, "hits": self.hits, "misses": self.misses}
+
+    def _lookup(self, cache_key: Tuple[str, Hashable]) -> Union[Any, None]:
+        entry = self.entries.get(cache_key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, fetched_at, size, ttl = entry
+        if time() - fetched_at > (self.ttl(asset_class=cache_key[0]) if ttl is None else ttl):
+            del self.entries[cache_key]
+            self.total_bytes -= size
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(cache_key)
+        self.hits += 1
+        return value
+
+    def _store(self, cache_key: Tuple[str, Hashable], value: Any, ttl: Union[float, None] = None) -> None:
+        previous_entry = self.entries.pop(cache_key, None)
+        if previous_entry is not None:
+            self.total_bytes -= previous_entry[2]
+
+        size = QuoteCache.estimate_size(value=value)
+        self.entries[cache_key] = (value, time(), size, ttl)
+        self.total_bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and len(self.entries) > 0:
+            _, (_, _, size, _) = self.entries.popitem(last=False)
+            self.total_bytes -= size
+
+    @staticmethod
+    def estimate_size(value: Any) -> int:
+        """Rough memory footprint of a cached value, one container level deep.
+
+        Args:
+            value (Any): Cached value.
+
+        Returns:
+            int: Estimated size in bytes."""
+        size = getsizeof(value)
+        if isinstance(value, dict):
+            size += sum(getsizeof(item_key) + getsizeof(item_value) for item_key, item_value in value.items())
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                size += getsizeof(item)
+                if isinstance(item, dict):
+                    size += sum(getsizeof(item_key) + getsizeof(item_value) for item_key, item_value in item.items())
+        return size
+
+
+QUOTE_CACHE: QuoteCache = QuoteCache()
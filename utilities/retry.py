@@ -0,0 +1,277 @@
+#/usr/bin/env python
+"""retry.py: non-blocking retries, circuit breakers and stale price fallback for price lookups."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, Tuple, Callable, Union, List, Hashable, Type
+from enum import Enum, unique
+from threading import Lock, Condition, Thread
+from heapq import heappush, heappop
+from random import uniform
+from time import time
+
+# 3rd party modules
+from StatusLogger import Logger, Message
+
+
+class PriceUnavailableError(Exception):
+    """Raised when no provider returned a price and no previous price is known."""
+    pass
+
+
+class StalePrice(float):
+    """A last known price returned in place of a fresh one, marked with its age."""
+
+    def __new__(cls, price: float, as_of: float) -> StalePrice:
+        stale_price = float.__new__(cls, price)
+        stale_price.as_of = as_of
+        return stale_price
+
+    @property
+    def age(self) -> float:
+        """Seconds since the price was fetched."""
+        return time() - self.as_of
+
+    def __repr__(self) -> str:
+        return f"StalePrice({float(self)}, age={self.age:.0f}s)"
+
+
+class Backoff(object):
+    """Exponential backoff with full jitter."""
+
+    def __init__(self, base: float = 1., multiplier: float = 2., cap: float = 300.):
+        """Constructor.
+
+        Args:
+            base (float, optional): Delay ceiling of the first retry in seconds. Defaults to 1.
+            multiplier (float, optional): Growth of the delay ceiling per attempt. Defaults to 2.
+            cap (float, optional): Largest delay ceiling in seconds. Defaults to 300."""
+        self.base: float = base
+        self.multiplier: float = multiplier
+        self.cap: float = cap
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before the given retry attempt.
+
+        Args:
+            attempt (int): Zero based retry attempt.
+
+        Returns:
+            float: Jittered delay."""
+        return uniform(0., min(self.cap, self.base * self.multiplier ** attempt))
+
+
+class CircuitBreaker(object):
+    """Stops calling a provider after repeated failures and probes it again after a cool down.
+
+    Only errors of failure_types count against the provider. Any other error means the provider answered, for example
+    that one symbol is unknown, so it is recorded as a success instead of opening the breaker for every symbol."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 120.,
+                 failure_types: Tuple[Type[BaseException], ...] = (Exception,)):
+        """Constructor.
+
+        Args:
+            name (str): Provider name used in log messages.
+            failure_threshold (int, optional): Consecutive failures that open the breaker. Defaults to 5.
+            reset_timeout (float, optional): Seconds the breaker stays open before a probe. Defaults to 120.
+            failure_types (Tuple[Type[BaseException], ...], optional): Errors that count as provider failures.
+                Defaults to every Exception."""
+        self.name: str = name
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout: float = reset_timeout
+        self.failure_types: Tuple[Type[BaseException], ...] = failure_types
+        self.state: CircuitBreaker.STATE = CircuitBreaker.STATE.CLOSED
+        self.consecutive_failures: int = 0
+        self.opened_at: float = 0.
+        self.lock: Lock = Lock()
+
+    def allow_request(self) -> bool:
+        """Whether the provider may be called now. An open breaker lets one probe through after reset_timeout.
+
+        Returns:
+            bool: True if the call may proceed."""
+        with self.lock:
+            if self.state == CircuitBreaker.STATE.CLOSED:
+                return True
+            if self.state == CircuitBreaker.STATE.OPEN and time() - self.opened_at >= self.reset_timeout:
+                self.state = CircuitBreaker.STATE.HALF_OPEN
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker will allow a probe.
+
+        Returns:
+            float: Remaining cool down, 0 when closed."""
+        with self.lock:
+            if self.state == CircuitBreaker.STATE.CLOSED:
+                return 0.
+            return max(0., self.opened_at + self.reset_timeout - time())
+
+    def record_success(self) -> None:
+        """Closes the breaker."""
+        with self.lock:
+            if self.state != CircuitBreaker.STATE.CLOSED:
+                Logger.console_log(message=f"Circuit breaker for {self.name} closed.",
+                                   message_type=Message.MESSAGE_TYPE.SUCCESS)
+            self.state = CircuitBreaker.STATE.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self, error: Union[BaseException, None] = None) -> None:
+        """Counts a failure, opening the breaker at the threshold or when a probe fails.
+
+        Args:
+            error (Union[BaseException, None], optional): Error of the failed call. Errors outside failure_types are
+                recorded as a success. Defaults to None, which always counts."""
+        if error is not None and not isinstance(error, self.failure_types):
+            self.record_success()
+            return
+
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == CircuitBreaker.STATE.HALF_OPEN or \
+               (self.state == CircuitBreaker.STATE.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = CircuitBreaker.STATE.OPEN
+                self.opened_at = time()
+                Logger.console_log(message=f"Circuit breaker for {self.name} opened after {self.consecutive_failures} failures.",
+                                   message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+
+    @unique
+    class STATE(Enum):
+        CLOSED = "closed"
+        OPEN = "open"
+        HALF_OPEN = "half open"
+
+
+class LastKnownPrices(object):
+    """Thread-safe record of the most recent successful price per (asset class, symbol)."""
+
+    def __init__(self):
+        """Constructor."""
+        self.prices: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self.lock: Lock = Lock()
+
+    def record(self, asset_class: str, symbol: str, price: float, as_of: Union[float, None] = None) -> None:
+        """Stores a freshly fetched price.
+
+        Args:
+            asset_class (str): Asset class such as "stock" or "crypto".
+            symbol (str): Symbol of the priced asset.
+            price (float): Fetched price.
+            as_of (Union[float, None], optional): Fetch time. Defaults to now."""
+        with self.lock:
+            self.prices[(asset_class, symbol)] = (float(price), time() if as_of is None else as_of)
+
+    def get_stale(self, asset_class: str, symbol: str) -> StalePrice:
+        """Returns the last known price marked with its age.
+
+        Args:
+            asset_class (str): Asset class such as "stock" or "crypto".
+            symbol (str): Symbol of the priced asset.
+
+        Raises:
+            PriceUnavailableError: No price was ever fetched for the symbol.
+
+        Returns:
+            StalePrice: Last known price."""
+        with self.lock:
+            last_known = self.prices.get((asset_class, symbol))
+        if last_known is None:
+            raise PriceUnavailableError(f"No {asset_class} price is known for {symbol}.")
+        return StalePrice(price=last_known[0], as_of=last_known[1])
+
+
+class RetryScheduler(object):
+    """Retries failed fetches on a background thread so callers never sleep on a failure."""
+
+    def __init__(self, name: str, backoff: Union[Backoff, None] = None, max_attempts: int = 6):
+        """Constructor.
+
+        Args:
+            name (str): Name of the scheduler thread.
+            backoff (Union[Backoff, None], optional): Delay policy between attempts. Defaults to Backoff().
+            max_attempts (int, optional): Attempts before a retry is given up until the next failure. Defaults to 6."""
+        self.name: str = name
+        self.backoff: Backoff = Backoff() if backoff is None else backoff
+        self.max_attempts: int = max_attempts
+        self.pending: List[Tuple[float, int, Hashable]] = []
+        self.jobs: Dict[Hashable, Tuple[Callable[[], None], Union[CircuitBreaker, None], int]] = {}
+        self.sequence: int = 0
+        self.condition: Condition = Condition()
+        self.thread: Union[Thread, None] = None
+
+    def schedule(self, key: Hashable, retry: Callable[[], None], breaker: Union[CircuitBreaker, None] = None) -> None:
+        """Schedules retry to run in the background unless a retry for key is already pending.
+
+        Args:
+            key (Hashable): Identity of the failed lookup, used to avoid duplicate retries.
+            retry (Callable[[], None]): Function that raises on failure.
+            breaker (Union[CircuitBreaker, None], optional): Breaker of the provider retry calls. Defaults to None."""
+        with self.condition:
+            if key in self.jobs:
+                return
+            self.jobs[key] = (retry, breaker, 0)
+            self._push(key=key, due_time=time() + self.backoff.delay(attempt=0))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self.run, name=self.name, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def is_pending(self, key: Hashable) -> bool:
+        """Whether a retry for key is scheduled.
+
+        Args:
+            key (Hashable): Identity of the failed lookup.
+
+        Returns:
+            bool: True if a retry is pending."""
+        with self.condition:
+            return key in self.jobs
+
+    def _push(self, key: Hashable, due_time: float) -> None:
+        self.sequence += 1
+        heappush(self.pending, (due_time, self.sequence, key))
+
+    def run(self) -> None:
+        """Runs due retries until none are pending."""
+        while True:
+            with self.condition:
+                while len(self.pending) > 0 and self.pending[0][0] > time():
+                    self.condition.wait(timeout=self.pending[0][0] - time())
+                if len(self.pending) == 0:
+                    self.thread = None
+                    return
+                _, _, key = heappop(self.pending)
+                retry, breaker, attempt = self.jobs[key]
+
+            if breaker is not None and not breaker.allow_request():
+                with self.condition:
+                    self._push(key=key, due_time=time() + max(breaker.retry_after(), self.backoff.delay(attempt=attempt)))
+                continue
+
+            try:
+                retry()
+                if breaker is not None:
+                    breaker.record_success()
+                with self.condition:
+                    del self.jobs[key]
+            except Exception as error:
+                if breaker is not None:
+                    breaker.record_failure(error=error)
+                with self.condition:
+                    attempt += 1
+                    if attempt >= self.max_attempts:
+                        del self.jobs[key]
+                        Logger.console_log(message=f"Giving up on retrying {key} after {attempt} attempts. Last error: {error}",
+                                           message_type=Message.MESSAGE_TYPE.MINOR_FAIL)
+                    else:
+                        self.jobs[key] = (retry, breaker, attempt)
+                        self._push(key=key, due_time=time() + self.backoff.delay(attempt=attempt))
+
+
+LAST_KNOWN_PRICES: LastKnownPrices = LastKnownPrices()
+PRICE_RETRY_SCHEDULER: RetryScheduler = RetryScheduler(name="PriceRetryScheduler")
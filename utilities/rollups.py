@@ -0,0 +1,360 @@
+#/usr/bin/env python
+"""rollups.py: incrementally maintained multi-resolution OHLC rollups of equity series."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, Tuple, Union
+
+# 3rd party modules
+from numpy import ndarray, empty, asarray, floor, flatnonzero, diff, maximum, minimum, searchsorted, concatenate, float64
+
+
+class OHLCSeries(object):
+    """Open, high, low and close of a value per fixed-width time bucket, stored in growable NumPy buffers."""
+    FIELDS: Tuple[str, ...] = ("bucket", "open", "high", "low", "close")
+    INITIAL_CAPACITY: int = 256
+    GROWTH_FACTOR: int = 2
+
+    def __init__(self, resolution: float, retention: Union[float, None] = None):
+        """Constructor.
+
+        Args:
+            resolution (float): Bucket width in seconds.
+            retention (Union[float, None], optional): Seconds of buckets kept by compact. Defaults to keeping all."""
+        self.resolution: float = resolution
+        self.retention: Union[float, None] = retention
+        self.size: int = 0
+        self.capacity: int = OHLCSeries.INITIAL_CAPACITY
+        self.columns: Dict[str, ndarray] = {field: empty(self.capacity, dtype=float64) for field in OHLCSeries.FIELDS}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def reserve(self, bucket_count: int) -> None:
+        """Ensures there is room for bucket_count more buckets, growing geometrically.
+
+        Args:
+            bucket_count (int): Number of buckets about to be appended."""
+        required_capacity = self.size + bucket_count
+        if required_capacity <= self.capacity:
+            return
+
+        while self.capacity < required_capacity:
+            self.capacity *= OHLCSeries.GROWTH_FACTOR
+        for field, column in self.columns.items():
+            grown_column = empty(self.capacity, dtype=float64)
+            grown_column[:self.size] = column[:self.size]
+            self.columns[field] = grown_column
+
+    def bucket_of(self, update_time: float) -> float:
+        """Start time of the bucket update_time falls in.
+
+        Args:
+            update_time (float): Epoch time.
+
+        Returns:
+            float: Bucket start time."""
+        return (update_time // self.resolution) * self.resolution
+
+    def update(self, update_time: float, value: float) -> None:
+        """Folds one observation into the latest bucket or opens a new one.
+
+        Args:
+            update_time (float): Epoch time of the observation. Must not precede the latest bucket.
+            value (float): Observed value."""
+        bucket = self.bucket_of(update_time=update_time)
+
+        if self.size > 0 and self.columns["bucket"][self.size - 1] == bucket:
+            last = self.size - 1
+            self.columns["high"][last] = max(self.columns["high"][last], value)
+            self.columns["low"][last] = min(self.columns["low"][last], value)
+            self.columns["close"][last] = value
+            return
+
+        self.reserve(bucket_count=1)
+        for field, field_value in (("bucket", bucket), ("open", value), ("high", value), ("low", value), ("close", value)):
+            self.columns[field][self.size] = field_value
+        self.size += 1
+
+    def extend(self, times: ndarray, values: ndarray) -> None:
+        """Folds a sorted batch of observations in with one reduction per field.
+
+        Args:
+            times (ndarray): Sorted epoch times.
+            values (ndarray): Observed values."""
+        times = asarray(times, dtype=float64)
+        values = asarray(values, dtype=float64)
+        if len(times) == 0:
+            return
+
+        buckets = floor(times / self.resolution) * self.resolution
+
+        # Observations landing in the current latest bucket are folded in one by one, the rest in bulk.
+        if self.size > 0:
+            overlapping = int(searchsorted(buckets, self.columns["bucket"][self.size - 1], side="right"))
+            for update_time, value in zip(times[:overlapping], values[:overlapping]):
+                self.update(update_time=update_time, value=value)
+            times, values, buckets = times[overlapping:], values[overlapping:], buckets[overlapping:]
+            if len(times) == 0:
+                return
+
+        starts = flatnonzero(diff(buckets, prepend=buckets[0] - self.resolution))
+        ends = list(starts[1:]) + [len(values)]
+        bucket_count = len(starts)
+
+        self.reserve(bucket_count=bucket_count)
+        new_rows = slice(self.size, self.size + bucket_count)
+        self.columns["bucket"][new_rows] = buckets[starts]
+        self.columns["open"][new_rows] = values[starts]
+        self.columns["high"][new_rows] = maximum.reduceat(values, starts)
+        self.columns["low"][new_rows] = minimum.reduceat(values, starts)
+        self.columns["close"][new_rows] = values[asarray(ends) - 1]
+        self.size += bucket_count
+
+    def field(self, field: str) -> ndarray:
+        """Read-only view of a field over every bucket.
+
+        Args:
+            field (str): One of FIELDS.
+
+        Returns:
+            ndarray: Field values."""
+        field_view = self.columns[field][:self.size].view()
+        field_view.flags.writeable = False
+        return field_view
+
+    def bucket_range(self, start: float, end: float) -> slice:
+        """Buckets overlapping the closed interval [start, end].
+
+        Args:
+            start (float): Earliest epoch time.
+            end (float): Latest epoch time.
+
+        Returns:
+            slice: Bucket positions."""
+        buckets = self.field(field="bucket")
+        return slice(int(searchsorted(buckets, self.bucket_of(update_time=start), side="left")),
+                     int(searchsorted(buckets, end, side="right")))
+
+    def view(self) -> OHLCSeries.View:
+        """Immutable view of the buckets as of now.
+
+        Returns:
+            OHLCSeries.View: View that later updates never change."""
+        return OHLCSeries.View(series=self)
+
+    def compact(self, now: float) -> None:
+        """Drops buckets older than the retention into fresh buffers so views held by readers stay valid.
+
+        Args:
+            now (float): Current epoch time."""
+        if self.retention is None or self.size == 0:
+            return
+
+        first_kept = int(searchsorted(self.field(field="bucket"), now - self.retention, side="left"))
+        if first_kept == 0:
+            return
+
+        self.size -= first_kept
+        for field, column in self.columns.items():
+            compacted_column = empty(self.capacity, dtype=float64)
+            compacted_column[:self.size] = column[first_kept:first_kept + self.size]
+            self.columns[field] = compacted_column
+
+    class View(object):
+        """Immutable view of an OHLCSeries that readers can use without the writer's lock.
+
+        Finished buckets are shared as read-only views, since only the latest bucket is ever updated in place and
+        growth and compaction copy into fresh buffers. The latest bucket is copied."""
+        __slots__ = ("resolution", "retention", "finished", "latest")
+
+        def __init__(self, series: OHLCSeries):
+            """Constructor.
+
+            Args:
+                series (OHLCSeries): Series to view."""
+            finished_count: int = max(series.size - 1, 0)
+            object.__setattr__(self, "resolution", series.resolution)
+            object.__setattr__(self, "retention", series.retention)
+            object.__setattr__(self, "finished", {field: series.field(field=field)[:finished_count] for field in OHLCSeries.FIELDS})
+            object.__setattr__(self, "latest", {field: float(series.columns[field][series.size - 1]) for field in OHLCSeries.FIELDS}
+                               if series.size > 0 else None)
+
+        def __setattr__(self, name: str, value: object) -> None:
+            raise AttributeError(f"{type(self).__name__} is immutable.")
+
+        def __len__(self) -> int:
+            return len(self.finished["bucket"]) + (0 if self.latest is None else 1)
+
+        def first_bucket(self) -> Union[float, None]:
+            """Start time of the earliest bucket, None when there are no buckets."""
+            if len(self.finished["bucket"]) > 0:
+                return float(self.finished["bucket"][0])
+            return None if self.latest is None else self.latest["bucket"]
+
+        def bucket_of(self, update_time: float) -> float:
+            """Start time of the bucket update_time falls in.
+
+            Args:
+                update_time (float): Epoch time.
+
+            Returns:
+                float: Bucket start time."""
+            return (update_time // self.resolution) * self.resolution
+
+        def bucket_range(self, start: float, end: float) -> slice:
+            """Buckets overlapping the closed interval [start, end].
+
+            Args:
+                start (float): Earliest epoch time.
+                end (float): Latest epoch time.
+
+            Returns:
+                slice: Bucket positions."""
+            first_bucket: float = self.bucket_of(update_time=start)
+            first = int(searchsorted(self.finished["bucket"], first_bucket, side="left"))
+            last = int(searchsorted(self.finished["bucket"], end, side="right"))
+            if self.latest is not None:
+                first += int(self.latest["bucket"] < first_bucket)
+                last += int(self.latest["bucket"] <= end)
+            return slice(first, last)
+
+        def fields(self, bucket_range: slice) -> Dict[str, ndarray]:
+            """Every field over a range of buckets.
+
+            Args:
+                bucket_range (slice): Bucket positions from bucket_range.
+
+            Returns:
+                Dict[str, ndarray]: Values by field."""
+            finished_count: int = len(self.finished["bucket"])
+            finished_range = slice(bucket_range.start, min(bucket_range.stop, finished_count))
+            if self.latest is None or bucket_range.stop <= finished_count:
+                return {field: column[finished_range] for field, column in self.finished.items()}
+            return {field: concatenate((column[finished_range], [self.latest[field]])) for field, column in self.finished.items()}
+
+
+class MultiResolutionRollup(object):
+    """One OHLCSeries per resolution, all fed from the same observations."""
+    DAY: float = 86400.
+    RESOLUTIONS: Dict[float, Union[float, None]] = {
+        60.: 30 * DAY,
+        3600.: None,
+        86400.: None
+    }
+
+    def __init__(self, resolutions: Union[Dict[float, Union[float, None]], None] = None):
+        """Constructor.
+
+        Args:
+            resolutions (Union[Dict[float, Union[float, None]], None], optional): Retention in seconds by bucket
+                width in seconds, None keeping every bucket. Defaults to RESOLUTIONS."""
+        resolutions = MultiResolutionRollup.RESOLUTIONS if resolutions is None else resolutions
+        # Bucket starts are floored to their resolution, so the exact time of the first observation is kept apart.
+        self.first_time: Union[float, None] = None
+        self.levels: Dict[float, OHLCSeries] = {resolution: OHLCSeries(resolution=resolution, retention=retention)
+                                                for resolution, retention in sorted(resolutions.items())}
+
+    def update(self, update_time: float, value: float) -> None:
+        """Folds one observation into every resolution.
+
+        Args:
+            update_time (float): Epoch time of the observation.
+            value (float): Observed value."""
+        if self.first_time is None:
+            self.first_time = float(update_time)
+        for level in self.levels.values():
+            level.update(update_time=update_time, value=value)
+
+    def extend(self, times: ndarray, values: ndarray) -> None:
+        """Folds a sorted batch of observations into every resolution.
+
+        Args:
+            times (ndarray): Sorted epoch times.
+            values (ndarray): Observed values."""
+        if self.first_time is None and len(times) > 0:
+            self.first_time = float(times[0])
+        for level in self.levels.values():
+            level.extend(times=times, values=values)
+
+    def compact(self, now: float) -> None:
+        """Applies every resolution's retention.
+
+        Args:
+            now (float): Current epoch time."""
+        for level in self.levels.values():
+            level.compact(now=now)
+
+    def view(self) -> MultiResolutionRollup.View:
+        """Immutable view of every resolution as of now.
+
+        Returns:
+            MultiResolutionRollup.View: View that later updates never change."""
+        return MultiResolutionRollup.View(rollup=self)
+
+    def query(self, start: float, end: float, max_points: int) -> Tuple[ndarray, Dict[str, ndarray]]:
+        """OHLC buckets covering [start, end] at the resolution chosen by View.select_level.
+
+        Args:
+            start (float): Earliest epoch time.
+            end (float): Latest epoch time.
+            max_points (int): Point budget.
+
+        Returns:
+            Tuple[ndarray, Dict[str, ndarray]]: Bucket start times and the open, high, low and close fields."""
+        return self.view().query(start=start, end=end, max_points=max_points)
+
+    class View(object):
+        """Immutable view of every resolution of a MultiResolutionRollup, queried without the writer's lock."""
+        __slots__ = ("first_time", "levels")
+
+        def __init__(self, rollup: MultiResolutionRollup):
+            """Constructor.
+
+            Args:
+                rollup (MultiResolutionRollup): Rollup to view."""
+            object.__setattr__(self, "first_time", rollup.first_time)
+            object.__setattr__(self, "levels", {resolution: level.view() for resolution, level in rollup.levels.items()})
+
+        def __setattr__(self, name: str, value: object) -> None:
+            raise AttributeError(f"{type(self).__name__} is immutable.")
+
+        def select_level(self, start: float, end: float, max_points: int) -> OHLCSeries.View:
+            """Picks the finest resolution that covers [start, end] within max_points buckets.
+
+            Falls back to the coarsest resolution when none fits the point budget.
+
+            Args:
+                start (float): Earliest epoch time.
+                end (float): Latest epoch time.
+                max_points (int): Point budget.
+
+            Returns:
+                OHLCSeries.View: Selected resolution."""
+            levels = list(self.levels.values())
+
+            for level in levels:
+                first_bucket = level.first_bucket()
+                covers_start = first_bucket is not None and first_bucket <= level.bucket_of(update_time=start)
+                bucket_range = level.bucket_range(start=start, end=end)
+                if (covers_start or level.retention is None) and bucket_range.stop - bucket_range.start <= max_points:
+                    return level
+
+            return levels[-1]
+
+        def query(self, start: float, end: float, max_points: int) -> Tuple[ndarray, Dict[str, ndarray]]:
+            """OHLC buckets covering [start, end] at the resolution chosen by select_level.
+
+            Args:
+                start (float): Earliest epoch time.
+                end (float): Latest epoch time.
+                max_points (int): Point budget.
+
+            Returns:
+                Tuple[ndarray, Dict[str, ndarray]]: Bucket start times and the open, high, low and close fields."""
+            level = self.select_level(start=start, end=end, max_points=max_points)
+            fields = level.fields(bucket_range=level.bucket_range(start=start, end=end))
+            return fields["bucket"], {field: fields[field] for field in OHLCSeries.FIELDS[1:]}
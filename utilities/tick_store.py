@@ -0,0 +1,366 @@
+#/usr/bin/env python
+"""tick_store.py: append-only columnar storage for per-tick holding history."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from typing import Dict, List, Iterable, Tuple, Union
+
+# 3rd party modules
+from numpy import ndarray, empty, asarray, full, nan, float64, int32, searchsorted, bincount, nan_to_num, nansum, unique, zeros, may_share_memory
+from pandas import DataFrame
+
+
+class TickStore(object):
+    """Preallocated, growable NumPy column store holding one row per holding per tick.
+
+    Rows are only ever appended, so appends are amortized O(1) and previously returned
+    column views never change underneath their readers."""
+    CORE_COLUMNS: Tuple[str, ...] = ("datetime", "holding_id", "quantity", "price", "equity")
+    INITIAL_CAPACITY: int = 1024
+    GROWTH_FACTOR: int = 2
+
+    def __init__(self, label_column: str, extra_columns: Tuple[str, ...] = (),
+                 column_order: Union[List[str], None] = None, capacity: int = INITIAL_CAPACITY):
+        """Constructor.
+
+        Args:
+            label_column (str): Name of the DataFrame column the holding label is exposed as.
+            extra_columns (Tuple[str, ...], optional): Additional float columns stored per row. Defaults to ().
+            column_order (Union[List[str], None], optional): Column order of the DataFrame view. Defaults to None.
+            capacity (int, optional): Initial number of preallocated rows. Defaults to INITIAL_CAPACITY."""
+        self.label_column: str = label_column
+        self.extra_columns: Tuple[str, ...] = tuple(extra_columns)
+        self.column_order: List[str] = column_order if column_order is not None else \
+            ["datetime", label_column, "quantity", "price", "equity"] + list(self.extra_columns)
+        self.labels: List[str] = []
+        self.label_ids: Dict[str, int] = {}
+        self.size: int = 0
+        self.capacity: int = max(int(capacity), 1)
+        self.columns: Dict[str, ndarray] = {}
+        for column_name in self.CORE_COLUMNS + self.extra_columns:
+            dtype = int32 if column_name == "holding_id" else float64
+            self.columns[column_name] = empty(self.capacity, dtype=dtype)
+        self._dataframe_cache: Union[DataFrame, None] = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def get_holding_id(self, label: str) -> int:
+        """Returns the integer id of a holding label, registering it if it is new.
+
+        Args:
+            label (str): Holding label (symbol, coin name, account name or float location).
+
+        Returns:
+            int: Holding id."""
+        holding_id = self.label_ids.get(label)
+        if holding_id is None:
+            holding_id = len(self.labels)
+            self.labels.append(label)
+            self.label_ids[label] = holding_id
+        return holding_id
+
+    def reserve(self, row_count: int) -> None:
+        """Ensures there is room for row_count more rows, growing geometrically.
+
+        Args:
+            row_count (int): Number of rows about to be appended."""
+        required_capacity = self.size + row_count
+        if required_capacity <= self.capacity:
+            return
+
+        new_capacity = self.capacity
+        while new_capacity < required_capacity:
+            new_capacity *= self.GROWTH_FACTOR
+
+        for column_name, column in self.columns.items():
+            grown_column = empty(new_capacity, dtype=column.dtype)
+            grown_column[:self.size] = column[:self.size]
+            self.columns[column_name] = grown_column
+        self.capacity = new_capacity
+
+    def append(self, update_time: float, label: str, quantity: float = nan, price: float = nan,
+               equity: Union[float, None] = None, **extras: float) -> None:
+        """Appends a single row.
+
+        Args:
+            update_time (float): Epoch time of the tick.
+            label (str): Holding label.
+            quantity (float, optional): Held quantity. Defaults to nan.
+            price (float, optional): Price per unit. Defaults to nan.
+            equity (Union[float, None], optional): Equity of the row. Defaults to quantity * price.
+            extras (float): Values for the extra columns."""
+        self.append_many(update_time=update_time, labels=[label], quantities=[quantity], prices=[price],
+                         equities=None if equity is None else [equity],
+                         **{column_name: [value] for column_name, value in extras.items()})
+
+    def append_many(self, update_time: float, labels: List[str], quantities: Iterable[float] = None,
+                    prices: Iterable[float] = None, equities: Union[Iterable[float], None] = None,
+                    **extras: Iterable[float]) -> Union[float, None]:
+        """Appends one row per label sharing the same tick time.
+
+        Args:
+            update_time (float): Epoch time of the tick.
+            labels (List[str]): Holding labels.
+            quantities (Iterable[float], optional): Held quantities. Defaults to nan.
+            prices (Iterable[float], optional): Prices per unit. Defaults to nan.
+            equities (Union[Iterable[float], None], optional): Row equities. Defaults to quantities * prices.
+            extras (Iterable[float]): Values for the extra columns.
+
+        Returns:
+            Union[float, None]: Total equity of the appended rows, None when nothing was appended."""
+        row_count = len(labels)
+        if row_count == 0:
+            return None
+
+        self.reserve(row_count=row_count)
+        start, stop = self.size, self.size + row_count
+
+        quantities = full(row_count, nan) if quantities is None else asarray(quantities, dtype=float64)
+        prices = full(row_count, nan) if prices is None else asarray(prices, dtype=float64)
+
+        self.columns["datetime"][start:stop] = update_time
+        self.columns["holding_id"][start:stop] = [self.get_holding_id(label) for label in labels]
+        self.columns["quantity"][start:stop] = quantities
+        self.columns["price"][start:stop] = prices
+        self.columns["equity"][start:stop] = quantities * prices if equities is None else asarray(equities, dtype=float64)
+        for column_name in self.extra_columns:
+            column_values = extras.get(column_name)
+            self.columns[column_name][start:stop] = nan if column_values is None else asarray(column_values, dtype=float64)
+
+        self.size = stop
+        self._dataframe_cache = None
+
+        return float(nansum(self.columns["equity"][start:stop]))
+
+    def set_labels(self, labels: List[str]) -> None:
+        """Restores the holding id to label mapping of a previously persisted store.
+
+        Args:
+            labels (List[str]): Labels in holding id order."""
+        assert self.size == 0, "Labels can only be restored into an empty store."
+        self.labels = list(labels)
+        self.label_ids = {label: holding_id for holding_id, label in enumerate(self.labels)}
+
+    def extend(self, times: ndarray, holding_ids: ndarray, quantities: ndarray, prices: ndarray,
+               equities: ndarray, **extras: ndarray) -> None:
+        """Bulk appends rows that already carry holding ids, such as rows mapped from a history file.
+
+        Args:
+            times (ndarray): Tick time of every row.
+            holding_ids (ndarray): Holding id of every row.
+            quantities (ndarray): Held quantities.
+            prices (ndarray): Prices per unit.
+            equities (ndarray): Row equities.
+            extras (ndarray): Values for the extra columns."""
+        row_count = len(times)
+        if row_count == 0:
+            return
+
+        self.reserve(row_count=row_count)
+        start, stop = self.size, self.size + row_count
+
+        self.columns["datetime"][start:stop] = times
+        self.columns["holding_id"][start:stop] = holding_ids
+        self.columns["quantity"][start:stop] = quantities
+        self.columns["price"][start:stop] = prices
+        self.columns["equity"][start:stop] = equities
+        for column_name in self.extra_columns:
+            self.columns[column_name][start:stop] = extras.get(column_name, nan)
+
+        self.size = stop
+        self._dataframe_cache = None
+
+    def drop_before(self, cutoff_time: float) -> int:
+        """Compacts away rows older than cutoff_time into fresh buffers, so views held by readers stay valid.
+
+        Args:
+            cutoff_time (float): Earliest tick time to keep.
+
+        Returns:
+            int: Number of rows dropped."""
+        first_kept = int(searchsorted(self.column("datetime"), cutoff_time, side="left"))
+        if first_kept == 0:
+            return 0
+
+        self.size -= first_kept
+        for column_name, column in self.columns.items():
+            compacted_column = empty(self.capacity, dtype=column.dtype)
+            compacted_column[:self.size] = column[first_kept:first_kept + self.size]
+            self.columns[column_name] = compacted_column
+        self._dataframe_cache = None
+
+        return first_kept
+
+    def column(self, column_name: str) -> ndarray:
+        """Returns a read-only view of the filled part of a column.
+
+        Args:
+            column_name (str): Name of a core or extra column.
+
+        Returns:
+            ndarray: Read-only view."""
+        column_view = self.columns[column_name][:self.size].view()
+        column_view.flags.writeable = False
+        return column_view
+
+    def label_column_values(self) -> ndarray:
+        """Returns the holding label of every stored row.
+
+        Returns:
+            ndarray: Object array of labels."""
+        return asarray(self.labels, dtype=object)[self.column("holding_id")]
+
+    def to_dataframe(self) -> DataFrame:
+        """Returns a DataFrame view of the stored rows, cached until the next append.
+
+        Returns:
+            DataFrame: Rows with the configured column order."""
+        if self._dataframe_cache is None:
+            data = {}
+            for column_name in self.column_order:
+                if column_name == self.label_column:
+                    data[column_name] = self.label_column_values()
+                else:
+                    data[column_name] = self.column(column_name)
+            self._dataframe_cache = DataFrame(data, columns=self.column_order, copy=False)
+        return self._dataframe_cache
+
+    def unique_times(self) -> ndarray:
+        """Returns the sorted distinct tick times present in the store.
+
+        Returns:
+            ndarray: Sorted tick times."""
+        return unique(self.column("datetime"))
+
+    def equity_by_time(self, times: ndarray) -> ndarray:
+        """Sums row equities per tick time in a single grouped pass.
+
+        Args:
+            times (ndarray): Sorted tick times to aggregate onto.
+
+        Returns:
+            ndarray: Total equity at each of the given times, 0 where the store has no rows."""
+        times = asarray(times, dtype=float64)
+        if self.size == 0 or len(times) == 0:
+            return zeros(len(times), dtype=float64)
+
+        row_times = self.column("datetime")
+        codes = searchsorted(times, row_times)
+        in_range = codes < len(times)
+        in_range[in_range] = times[codes[in_range]] == row_times[in_range]
+
+        return bincount(codes[in_range], weights=nan_to_num(self.column("equity")[in_range]),
+                        minlength=len(times))
+
+
+class EquitySeries(object):
+    """Growable (time, equity) buffer holding one running total per tick."""
+    INITIAL_CAPACITY: int = 1024
+    GROWTH_FACTOR: int = 2
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        """Constructor.
+
+        Args:
+            capacity (int, optional): Initial number of preallocated points. Defaults to INITIAL_CAPACITY."""
+        self.size: int = 0
+        self.capacity: int = max(int(capacity), 1)
+        self._times: ndarray = empty(self.capacity, dtype=float64)
+        self._equities: ndarray = empty(self.capacity, dtype=float64)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def reserve(self, point_count: int) -> None:
+        """Ensures there is room for point_count more points, growing geometrically.
+
+        Args:
+            point_count (int): Number of points about to be appended."""
+        required_capacity = self.size + point_count
+        if required_capacity <= self.capacity:
+            return
+
+        while self.capacity < required_capacity:
+            self.capacity *= self.GROWTH_FACTOR
+        for buffer_name in ("_times", "_equities"):
+            grown_buffer = empty(self.capacity, dtype=float64)
+            grown_buffer[:self.size] = getattr(self, buffer_name)[:self.size]
+            setattr(self, buffer_name, grown_buffer)
+
+    def append(self, update_time: float, equity: float) -> None:
+        """Appends the total equity of one tick.
+
+        Args:
+            update_time (float): Epoch time of the tick.
+            equity (float): Total equity at that tick."""
+        self.reserve(point_count=1)
+        self._times[self.size] = update_time
+        self._equities[self.size] = equity
+        self.size += 1
+
+    def extend(self, times: ndarray, equities: ndarray) -> None:
+        """Bulk appends per-tick totals, such as totals rebuilt from a history file.
+
+        Args:
+            times (ndarray): Tick times.
+            equities (ndarray): Total equity per tick."""
+        point_count = len(times)
+        self.reserve(point_count=point_count)
+        self._times[self.size:self.size + point_count] = times
+        self._equities[self.size:self.size + point_count] = equities
+        self.size += point_count
+
+    def drop_before(self, cutoff_time: float) -> int:
+        """Compacts away points older than cutoff_time into fresh buffers, so views held by readers stay valid.
+
+        Args:
+            cutoff_time (float): Earliest tick time to keep.
+
+        Returns:
+            int: Number of points dropped."""
+        first_kept = int(searchsorted(self.times(), cutoff_time, side="left"))
+        if first_kept == 0:
+            return 0
+
+        self.size -= first_kept
+        for buffer_name in ("_times", "_equities"):
+            compacted_buffer = empty(self.capacity, dtype=float64)
+            compacted_buffer[:self.size] = getattr(self, buffer_name)[first_kept:first_kept + self.size]
+            setattr(self, buffer_name, compacted_buffer)
+
+        return first_kept
+
+    @staticmethod
+    def _read_only(buffer: ndarray, size: int) -> ndarray:
+        buffer_view = buffer[:size].view()
+        buffer_view.flags.writeable = False
+        return buffer_view
+
+    def times(self) -> ndarray:
+        """Returns a read-only O(1) view of the tick times.
+
+        Returns:
+            ndarray: Tick times."""
+        return EquitySeries._read_only(self._times, self.size)
+
+    def equities(self) -> ndarray:
+        """Returns a read-only O(1) view of the per-tick equities.
+
+        Returns:
+            ndarray: Total equity per tick."""
+        return EquitySeries._read_only(self._equities, self.size)
+
+    def owns_times(self, times: ndarray) -> bool:
+        """Whether times is a full view previously returned by EquitySeries.times.
+
+        Args:
+            times (ndarray): Times to check.
+
+        Returns:
+            bool: True if the equities of this series line up with times."""
+        return isinstance(times, ndarray) and len(times) == self.size and \
+            (self.size == 0 or (may_share_memory(times, self._times) and times[-1] == self._times[self.size - 1]))
@@ -6,17 +6,28 @@ __email__ = "jacobtaylorcassady@outlook.com"
 
 from threading import Event
 from time import time, sleep
-from datetime import datetime
+from typing import Optional
 
-def pseudo_realtime_timestep(epoch_start_time: float, timestep: float, precision_scalar: float = 1000):
-    """[summary]
+def pseudo_realtime_timestep(epoch_start_time: float, timestep: float, precision_scalar: float = 1000,
+                             stop_event: Optional[Event] = None) -> bool:
+    """Blocks until timestep seconds after epoch_start_time, or until stop_event is set.
 
     Args:
-        epoch_start_time (float): [description]
-        timestep (float): [description]
-        precision_scalar (float, optional): [description]. Defaults to 1000."""
-    while epoch_start_time + timestep >= time():
-        sleep(timestep/precision_scalar)
+        epoch_start_time (float): Epoch time the step started.
+        timestep (float): Length of the step in seconds.
+        precision_scalar (float, optional): Unused. Kept for callers of the former polling implementation. Defaults to 1000.
+        stop_event (Optional[Event], optional): Event that cuts the wait short when set. Defaults to None.
+
+    Returns:
+        bool: True if stop_event was set before the step ended."""
+    remaining_time = epoch_start_time + timestep - time()
+
+    if stop_event is None:
+        if remaining_time > 0:
+            sleep(remaining_time)
+        return False
+
+    return stop_event.wait(timeout=max(remaining_time, 0.))
 
 class Stocker_Event(Event):
     """[summary"""
@@ -25,21 +36,12 @@ class Stocker_Event(Event):
         Event.__init__(self)
 
     def wait(self, timeout_ms: float, dt: float = 0.0001) -> bool:
-        """[summary]
+        """Blocks until the event is set or timeout_ms elapses.
 
         Args:
-            timeout_ms (float): [description]
-            dt (float, optional): [description]. Defaults to 0.0001.
+            timeout_ms (float): Longest wait in milliseconds.
+            dt (float, optional): Unused. Kept for callers of the former polling implementation. Defaults to 0.0001.
 
         Returns:
-            bool: [description]"""
-        start_time = datetime.now()
-
-        while not self.is_set():
-            wait_time_ms = (datetime.now() - start_time).total_seconds() * 1000.
-
-            if wait_time_ms > timeout_ms:
-                return False
-            else:
-                sleep(dt)
-        return True
+            bool: True if the event was set."""
+        return Event.wait(self, timeout=timeout_ms / 1000.)
@@ -6,7 +6,8 @@ __author__ = "Jacob T. Cassady"
 __email__ = "jacobtaylorcassady@outlook.com"
 
 # Built-in Modules
-from typing import Dict
+from typing import Dict, List, Callable
+from math import isnan
 
 # 3rd party Modules
 from PyQt5.QtWidgets import QFrame, QVBoxLayout, QVBoxLayout, QWidget
@@ -16,6 +17,7 @@ from PyQt5.QtGui import QPainter
 
 # Stocker modules
 from holdings import Holdings
+from widgets.holdings_refresh import HoldingsRefresh
 
 class EquityPieFrame(QFrame):
     def __init__(self, stocker: object, show_equity_split: bool = True, show_stock_split: bool = True,
@@ -30,9 +32,13 @@ class EquityPieFrame(QFrame):
         QFrame.__init__(self)
 
         self.stocker = stocker
+        self.chart_views: List[EquityPieFrame.PieChartView] = []
+        self.drawn_version: int = -1
+        self.holdings_refresh: HoldingsRefresh = HoldingsRefresh(parent=self)
 
         self.initUI(show_equity_split=show_equity_split, show_stock_split=show_stock_split,
                     show_crypto_split=show_crypto_split)
+        self.holdings_refresh.refresh.connect(self.update_pies)
  
     def initUI(self, show_equity_split: bool, show_stock_split: bool,
                show_crypto_split: bool) -> None:
@@ -41,86 +47,145 @@ class EquityPieFrame(QFrame):
 
         if show_equity_split:
             equity_split_chart_view: EquityPieFrame.EquitySplitChartView = EquityPieFrame.EquitySplitChartView(holdings=self.stocker.holdings)
-            main_layout.addWidget(equity_split_chart_view)
+            self.chart_views.append(equity_split_chart_view)
 
         if show_stock_split:
             stock_equity_chart_view: EquityPieFrame.PieChartView = EquityPieFrame.StockSplitChartView(holdings=self.stocker.holdings)
-            main_layout.addWidget(stock_equity_chart_view)
+            self.chart_views.append(stock_equity_chart_view)
 
         if show_crypto_split:
             crypto_equity_chart_view: EquityPieFrame.PieChartView = EquityPieFrame.CryptoSplitChartView(holdings=self.stocker.holdings)
-            main_layout.addWidget(crypto_equity_chart_view)
+            self.chart_views.append(crypto_equity_chart_view)
+
+        for chart_view in self.chart_views:
+            main_layout.addWidget(chart_view)
 
         self.setLayout(main_layout)
+        self.update_pies(snapshot=self.stocker.holdings.snapshot)
+
+    def update_pies(self, snapshot: Holdings.Snapshot) -> None:
+        """Updates the slices of every pie chart in place when a tick was committed since they were last drawn.
+
+        Args:
+            snapshot (Holdings.Snapshot): Latest committed holdings snapshot."""
+        if snapshot.version == self.drawn_version:
+            return
+
+        for chart_view in self.chart_views:
+            chart_view.update_data(data=chart_view.get_data(snapshot=snapshot))
+        self.drawn_version = snapshot.version
 
     class PieChartView(QChartView):
         """[summary]"""
 
-        def __init__(self, data: Dict[str, float], title: str):
+        def __init__(self, title: str, get_data: Callable[[Holdings.Snapshot], Dict[str, float]]):
             """Constructor.
 
             Args:
-                data (Dict[str, float]): [description]
-                title (str): [description]"""
-            pie_chart: QChart = EquityPieFrame.PieChartView.PieChart(data=data,
-                                                                     title=title)
+                title (str): [description]
+                get_data (Callable[[Holdings.Snapshot], Dict[str, float]]): Returns the values by slice name to show
+                    for a snapshot."""
+            pie_chart: EquityPieFrame.PieChartView.PieChart = EquityPieFrame.PieChartView.PieChart(title=title)
             QChartView.__init__(self, pie_chart)
+            self.pie_chart: EquityPieFrame.PieChartView.PieChart = pie_chart
+            self.get_data: Callable[[Holdings.Snapshot], Dict[str, float]] = get_data
             self.setRenderHint(QPainter.Antialiasing)
 
+        def update_data(self, data: Dict[str, float]) -> None:
+            """Applies new slice values. Holdings without a known equity are left out.
+
+            Args:
+                data (Dict[str, float]): Values by slice name."""
+            self.pie_chart.pie_series.update_data(data={name: value for name, value in data.items() if not isnan(value)})
+
         class PieChart(QChart):
             """[summary]"""
 
-            def __init__(self, data: Dict[str, float], title: str):
+            def __init__(self, title: str):
                 """Constructor.
 
                 Args:
-                    data (Dict[str, float]): [description]
                     title (str): [description]"""
                 QChart.__init__(self)
                 self.legend().hide()
-                pie_series = EquityPieFrame.PieChartView.PieChart.PieSeries(data=data)
-                self.addSeries(pie_series)
+                self.pie_series = EquityPieFrame.PieChartView.PieChart.PieSeries()
+                self.addSeries(self.pie_series)
                 self.createDefaultAxes()
                 self.setAnimationOptions(QChart.SeriesAnimations)
                 self.setTitle(title)
                 self.legend().setVisible(True)
                 self.legend().setAlignment(Qt.AlignRight)
+                # Slices are labelled with their percentage, so legend markers are relabelled with the slice name.
+                self.pie_series.added.connect(self.label_legend_markers)
 
-                for data_key_index, data_key in enumerate(data.keys()):
-                    self.legend().markers(pie_series)[data_key_index].setLabel(data_key)
+            def label_legend_markers(self) -> None:
+                for marker in self.legend().markers(self.pie_series):
+                    marker.setLabel(marker.slice().objectName())
 
             class PieSeries(QPieSeries):
                 """[summary]"""
 
-                def __init__(self, data: Dict[str, float]):
-                    """Constructor.
-
-                    Args:
-                        data (Dict[str, float]): [description]"""
+                def __init__(self):
+                    """Constructor."""
                     QPieSeries.__init__(self)
                     self.setLabelsVisible()
                     self.setLabelsPosition(QPieSlice.LabelInsideHorizontal)
-                    for data_key, data_point in data.items():
-                        self.append(data_key, data_point)
+                    self.slices_by_name: Dict[str, QPieSlice] = {}
+                    self.values: Dict[str, float] = {}
+                    self.labels: Dict[str, str] = {}
+
+                def update_data(self, data: Dict[str, float]) -> None:
+                    """Adds, removes and revalues only the slices whose data changed.
 
-                    for slice in self.slices():
-                        slice.setLabel("{:.2f}%".format(100*slice.percentage()))
+                    Percentage labels are recomputed in Python and only written to slices whose text changed.
+
+                    Args:
+                        data (Dict[str, float]): Values by slice name."""
+                    for name in [name for name in self.slices_by_name if name not in data]:
+                        self.remove(self.slices_by_name.pop(name))
+                        del self.values[name]
+                        del self.labels[name]
+
+                    new_slices: List[QPieSlice] = []
+                    for name, value in data.items():
+                        if name not in self.slices_by_name:
+                            pie_slice = QPieSlice(name, value)
+                            pie_slice.setObjectName(name)
+                            self.slices_by_name[name] = pie_slice
+                            new_slices.append(pie_slice)
+                        elif self.values[name] != value:
+                            self.slices_by_name[name].setValue(value)
+                        self.values[name] = value
+                    if len(new_slices) > 0:
+                        self.append(new_slices)
+
+                    total: float = sum(self.values.values())
+                    for name, value in self.values.items():
+                        label: str = "{:.2f}%".format(100*value/total) if total != 0 else ""
+                        if self.labels.get(name) != label:
+                            self.slices_by_name[name].setLabel(label)
+                            self.labels[name] = label
 
     class EquitySplitChartView(PieChartView):
         TITLE: str = "Equity Split"
+        HOLDING_TYPES: Dict[str, Holdings.HOLDING_TYPE] = {
+            'stock': Holdings.HOLDING_TYPE.STOCK,
+            'cryptocurrency': Holdings.HOLDING_TYPE.CRYPTOCURRENCY,
+            'checking account': Holdings.HOLDING_TYPE.CHECKING,
+            'USD in float': Holdings.HOLDING_TYPE.FLOATING_USD
+        }
 
         def __init__(self, holdings: Holdings):
             """Constructor.
 
             Args:
                 holdings (Holdings): [description]"""
-            equities: Dict[str, float] = {}
-            equities['stock'] = holdings.calculate_equity(holding_type=Holdings.HOLDING_TYPE.STOCK)
-            equities['cryptocurrency'] = holdings.calculate_equity(holding_type=Holdings.HOLDING_TYPE.CRYPTOCURRENCY)
-            equities['checking account'] = holdings.calculate_equity(holding_type=Holdings.HOLDING_TYPE.CHECKING)
-            equities['USD in float'] = holdings.calculate_equity(holding_type=Holdings.HOLDING_TYPE.FLOATING_USD)
+            EquityPieFrame.PieChartView.__init__(self, title=EquityPieFrame.EquitySplitChartView.TITLE,
+                                                 get_data=self.get_equity_split)
 
-            EquityPieFrame.PieChartView.__init__(self, data=equities, title=EquityPieFrame.EquitySplitChartView.TITLE)
+        def get_equity_split(self, snapshot: Holdings.Snapshot) -> Dict[str, float]:
+            return {name: snapshot.calculate_equity(holding_type=holding_type)
+                    for name, holding_type in EquityPieFrame.EquitySplitChartView.HOLDING_TYPES.items()}
 
     class StockSplitChartView(PieChartView):
         TITLE: str = "Stock Split"
@@ -130,12 +195,11 @@ class EquityPieFrame(QFrame):
 
             Args:
                 holdings (Holdings): [description]"""
-            equities = {}
+            EquityPieFrame.PieChartView.__init__(self, title=EquityPieFrame.StockSplitChartView.TITLE,
+                                                 get_data=self.get_stock_split)
 
-            for symbol, stock in holdings.stocks.items():
-                equities[symbol] = stock.calculate_equity()
-
-            EquityPieFrame.PieChartView.__init__(self, data=equities, title=EquityPieFrame.StockSplitChartView.TITLE)
+        def get_stock_split(self, snapshot: Holdings.Snapshot) -> Dict[str, float]:
+            return snapshot.holding_equities.get(Holdings.HOLDING_TYPE.STOCK, {})
 
     class CryptoSplitChartView(PieChartView):
         TITLE: str = "Crypto Split"
@@ -145,10 +209,11 @@ class EquityPieFrame(QFrame):
 
             Args:
                 holdings (Holdings): [description]"""
-            equities = {}
-
-            for symbol, cryptocurrency in holdings.cryptocoins.items():
-                equities[symbol] = cryptocurrency.calculate_equity()
-
-            EquityPieFrame.PieChartView.__init__(self, data=equities, title=EquityPieFrame.CryptoSplitChartView.TITLE)
-
+            EquityPieFrame.PieChartView.__init__(self, title=EquityPieFrame.CryptoSplitChartView.TITLE,
+                                                 get_data=self.get_crypto_split)
+            # Snapshots key coins by name, the chart has always shown their symbols.
+            self.symbols_by_name: Dict[str, str] = {cryptocurrency.name: symbol for symbol, cryptocurrency in holdings.cryptocoins.items()}
+
+        def get_crypto_split(self, snapshot: Holdings.Snapshot) -> Dict[str, float]:
+            return {self.symbols_by_name.get(name, name): equity
+                    for name, equity in snapshot.holding_equities.get(Holdings.HOLDING_TYPE.CRYPTOCURRENCY, {}).items()}
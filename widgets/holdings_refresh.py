@@ -0,0 +1,62 @@
+#/usr/bin/env python
+"""holdings_refresh.py: bridges committed holdings snapshots from the event bus onto the Qt GUI thread."""
+from __future__ import annotations
+
+__author__ = "Jacob T. Cassady"
+__email__ = "jacobtaylorcassady@outlook.com"
+
+# Built-in Modules
+from threading import Lock
+from typing import Optional
+
+# 3rd party Modules
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+# Stocker modules
+from holdings import Holdings
+from utilities.event_bus import EventBus, EquitySnapshot, Subscription, EVENT_BUS
+
+
+class HoldingsRefresh(QObject):
+    """Re-emits EquitySnapshot events as a signal on the GUI thread, coalescing events that arrive between frames.
+
+    Only one delivery is ever queued: snapshots that arrive while one is pending just replace the snapshot it
+    will carry, so a busy GUI thread redraws once with the latest data instead of once per tick."""
+    refresh = pyqtSignal(object)
+    _deliver = pyqtSignal()
+
+    def __init__(self, event_bus: EventBus = EVENT_BUS, parent: Optional[QObject] = None):
+        """Constructor. Must be called on the GUI thread.
+
+        Args:
+            event_bus (EventBus, optional): Bus holdings publish EquitySnapshot events to. Defaults to EVENT_BUS.
+            parent (Optional[QObject], optional): Owner whose destruction ends the subscription. Defaults to None."""
+        QObject.__init__(self, parent)
+        self.pending_snapshot: Optional[Holdings.Snapshot] = None
+        self.pending_lock: Lock = Lock()
+
+        # Emitted from the bus dispatcher thread, delivered on the thread this object lives in.
+        self._deliver.connect(self._on_deliver)
+        subscription: Subscription = event_bus.subscribe(event_type=EquitySnapshot, name="GUI refresh",
+                                                         callback=self._on_published, max_queue=1,
+                                                         policy=Subscription.POLICY.DROP_OLDEST)
+        self.subscription: Subscription = subscription
+        self.destroyed.connect(lambda: subscription.close())
+
+    def _on_published(self, event: EquitySnapshot) -> None:
+        with self.pending_lock:
+            already_queued = self.pending_snapshot is not None
+            self.pending_snapshot = event.snapshot
+        if not already_queued:
+            self._deliver.emit()
+
+    @pyqtSlot()
+    def _on_deliver(self) -> None:
+        with self.pending_lock:
+            snapshot, self.pending_snapshot = self.pending_snapshot, None
+        if snapshot is not None:
+            self.refresh.emit(snapshot)
+
+    def close(self) -> None:
+        """Stops receiving updates."""
+        self.subscription.close()
@@ -1,17 +1,21 @@
 #/usr/bin/env python
 """plot.py:"""
+from __future__ import annotations
 
 __author__ = "Jacob T. Cassady"
 __email__ = "jacobtaylorcassady@outlook.com"
 
-from typing import Union, Optional, Dict, Any
+from typing import Union, Optional, Dict, Any, List, Tuple
 
-from PyQt5.QtCore import Qt, QTimer, QMutex
+from numpy import ndarray, empty, searchsorted, float64, inf
+
+from PyQt5.QtCore import Qt, QMutex, QObject, QRunnable, QThreadPool, pyqtSignal
 from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import QCheckBox, QFrame, QVBoxLayout, QWidget, QSplitter, QSpacerItem, QSizePolicy
 from pyqtgraph import LegendItem, PlotWidget, DateAxisItem, mkPen, mkBrush
 
 from holdings import Holdings
+from widgets.holdings_refresh import HoldingsRefresh
 
 class PlotDisplay(QSplitter):
     """[summary]"""
@@ -26,6 +30,10 @@ class PlotDisplay(QSplitter):
 
         self.stocker = stocker
         self.data_lines: Dict[Any] = {}
+        self.line_buffers: Dict[str, PlotDisplay.LineBuffer] = {}
+        self.plotted_version: int = -1
+        self.plotted_viewport: Union[Tuple[bool, float, float, int], None] = None
+        self.series_pending: bool = False
         self.plot: PlotWidget = PlotDisplay.Plot(parent=self)
         self.plot_settings_frame: QFrame = PlotDisplay.PlotSettingsFrame(parent=self, stocker=self.stocker)
         self.colors = {
@@ -45,14 +53,11 @@ class PlotDisplay(QSplitter):
         }
         self.color_iterator = 0
         self.mutex = QMutex()
-        self.update_timer = QTimer()
+        self.holdings_refresh: HoldingsRefresh = HoldingsRefresh(parent=self)
 
         self.initUI()
         self.setCallbacks()
 
-        self.update_timer.setInterval(300)
-        self.update_timer.start()
-
     def initUI(self) -> None:
         """Initializes user interface."""
         self.addWidget(self.plot)
@@ -62,32 +67,90 @@ class PlotDisplay(QSplitter):
         for check_box_name, check_box in self.plot_settings_frame.check_boxes.items():
             check_box.stateChanged.connect(self.plot_equities)
 
-        self.update_timer.timeout.connect(self.update_plots)
+        self.holdings_refresh.refresh.connect(self.update_plots)
+        self.plot.getViewBox().sigXRangeChanged.connect(self.redraw_plots)
+        self.plot.getViewBox().sigResized.connect(self.redraw_plots)
+
+    def update_plots(self, snapshot: Holdings.Snapshot) -> None:
+        """Requests the points committed since the last refresh for every visible line.
+
+        Does nothing when no tick was committed since the last refresh.
+
+        Args:
+            snapshot (Holdings.Snapshot): Latest committed holdings snapshot."""
+        if snapshot.version != self.plotted_version:
+            self.request_series(snapshot=snapshot)
+
+    def redraw_plots(self) -> None:
+        """Requests the envelope of every visible line after a pan, zoom or resize.
+
+        Range changes made by auto-ranging leave the viewport unchanged and are ignored."""
+        if self.viewport() != self.plotted_viewport:
+            self.request_series()
+
+    def viewport(self) -> Tuple[bool, float, float, int]:
+        """Current x-range of the plot, read on the GUI thread for series workers.
+
+        Returns:
+            Tuple[bool, float, float, int]: Whether x is auto-ranged, the x-range and the plot width in pixels."""
+        view_box = self.plot.getViewBox()
+        if view_box.autoRangeEnabled()[0]:
+            # Auto-ranged lines are decimated over their whole extent, so the current range does not matter.
+            return True, 0., 0., int(view_box.width())
+        x_min, x_max = view_box.viewRange()[0]
+        return False, x_min, x_max, int(view_box.width())
+
+    def request_series(self, snapshot: Optional[Holdings.Snapshot] = None) -> None:
+        """Updates the line buffers of every visible line on the global QThreadPool.
+
+        Requests made while a computation is pending are dropped. When the pending computation finishes,
+        apply_series starts one more if what it drew is already out of date.
+
+        Args:
+            snapshot (Optional[Holdings.Snapshot], optional): Snapshot to plot. Defaults to the latest one."""
+        if self.series_pending:
+            return
+
+        self.series_pending = True
+        series_worker = PlotDisplay.SeriesWorker(snapshot=self.stocker.holdings.snapshot if snapshot is None else snapshot,
+                                                 line_buffers={data_line_name: self.line_buffers.get(data_line_name)
+                                                               for data_line_name in self.data_lines.keys()},
+                                                 viewport=self.viewport())
+        series_worker.signals.finished.connect(self.apply_series)
+        QThreadPool.globalInstance().start(series_worker)
 
-    def update_plots(self) -> None:
-        if self.mutex.tryLock(0):
-            for data_line_name, data_line in self.data_lines.items():
-                self.stocker.holdings.lock.acquire()
-                x = self.stocker.holdings.get_times(holding_type=Holdings.HOLDING_TYPE(data_line_name))
-                y = self.stocker.holdings.calculate_holding_equities(holding_type=Holdings.HOLDING_TYPE(data_line_name), times=x)
-                self.stocker.holdings.lock.release()
-                data_line.setData(x, y)
-            self.mutex.unlock()
+    def apply_series(self, version: int, viewport: Tuple[bool, float, float, int],
+                     line_buffers: Dict[str, PlotDisplay.LineBuffer], changed_line_names: List[str]) -> None:
+        """Hands the buffers prepared by a series worker to their plot lines on the GUI thread.
+
+        setData is called only for lines that were re-queried or gained points.
+
+        Args:
+            version (int): Version of the snapshot the buffers were prepared from.
+            viewport (Tuple[bool, float, float, int]): Viewport the buffers were prepared for.
+            line_buffers (Dict[str, PlotDisplay.LineBuffer]): Buffer of every line the worker was given.
+            changed_line_names (List[str]): Lines whose buffer changed."""
+        self.mutex.lock()
+        for data_line_name, line_buffer in line_buffers.items():
+            if data_line_name in self.data_lines:
+                self.line_buffers[data_line_name] = line_buffer
+                if data_line_name in changed_line_names:
+                    self.data_lines[data_line_name].setData(line_buffer.x(), line_buffer.y())
+        self.mutex.unlock()
+        self.plotted_version = version
+        self.plotted_viewport = viewport
+        self.series_pending = False
+
+        if version != self.stocker.holdings.snapshot.version or viewport != self.viewport() or \
+           set(line_buffers.keys()) != set(self.data_lines.keys()):
+            self.request_series()
 
     def plot_equities(self) -> None:
         for check_box_name, check_box in self.plot_settings_frame.check_boxes.items():
             if check_box.isChecked():
                 if check_box_name not in self.data_lines.keys():
-                    holding_type = Holdings.HOLDING_TYPE(check_box_name)
-                    holdings: Holdings = self.stocker.holdings
-
-                    holdings.lock.acquire()
-                    x = holdings.get_times(holding_type=holding_type)
-                    y = holdings.calculate_holding_equities(holding_type=holding_type, times=x)
-                    holdings.lock.release()
-
                     self.mutex.lock()
-                    self.data_lines[check_box_name] = self.plot.plot(x=x, y=y, name=check_box_name,
+                    self.data_lines[check_box_name] = self.plot.plot(x=[], y=[], name=check_box_name,
                                                                      pen=mkPen(color=self.colors[list(self.colors.keys())[self.color_iterator]],
                                                                                width=4))
                     self.mutex.unlock()
@@ -98,8 +161,136 @@ class PlotDisplay(QSplitter):
                     self.mutex.lock()
                     self.plot.removeItem(self.data_lines[check_box_name])
                     del self.data_lines[check_box_name]
+                    self.line_buffers.pop(check_box_name, None)
                     self.mutex.unlock()
 
+        self.request_series()
+
+    class LineBuffer(object):
+        """Preallocated, growable x and y buffers of a plotted line with a high-water mark of the ticks plotted.
+
+        A buffer starts from a query for one viewport. Later ticks are appended to it, without touching the points
+        already handed to setData, until the viewport changes or the appended ticks outgrow the point budget."""
+        INITIAL_CAPACITY: int = 1024
+        GROWTH_FACTOR: int = 2
+
+        def __init__(self, x: ndarray, y: ndarray, high_water: float, viewport: Tuple[bool, float, float, int]):
+            """Constructor.
+
+            Args:
+                x (ndarray): Times of the queried points.
+                y (ndarray): Values of the queried points.
+                high_water (float): Time of the latest tick the query covered.
+                viewport (Tuple[bool, float, float, int]): Viewport the points were queried for."""
+            self.size: int = len(x)
+            self.capacity: int = max(PlotDisplay.LineBuffer.INITIAL_CAPACITY, PlotDisplay.LineBuffer.GROWTH_FACTOR * self.size)
+            self.x_buffer: ndarray = empty(self.capacity, dtype=float64)
+            self.y_buffer: ndarray = empty(self.capacity, dtype=float64)
+            self.x_buffer[:self.size] = x
+            self.y_buffer[:self.size] = y
+            self.high_water: float = high_water
+            self.viewport: Tuple[bool, float, float, int] = viewport
+
+        def __len__(self) -> int:
+            return self.size
+
+        def append_new(self, times: ndarray, values: ndarray) -> int:
+            """Appends the ticks of a series that are newer than the high-water mark.
+
+            Args:
+                times (ndarray): Sorted times of the whole series.
+                values (ndarray): Values matching times.
+
+            Returns:
+                int: Number of points appended."""
+            first_new: int = int(searchsorted(times, self.high_water, side="right"))
+            new_count: int = len(times) - first_new
+            if new_count <= 0:
+                return 0
+
+            if self.size + new_count > self.capacity:
+                while self.capacity < self.size + new_count:
+                    self.capacity *= PlotDisplay.LineBuffer.GROWTH_FACTOR
+                # Growing copies into new buffers, so arrays already handed to setData stay valid.
+                for buffer_name in ("x_buffer", "y_buffer"):
+                    grown_buffer = empty(self.capacity, dtype=float64)
+                    grown_buffer[:self.size] = getattr(self, buffer_name)[:self.size]
+                    setattr(self, buffer_name, grown_buffer)
+
+            self.x_buffer[self.size:self.size + new_count] = times[first_new:]
+            self.y_buffer[self.size:self.size + new_count] = values[first_new:]
+            self.size += new_count
+            self.high_water = float(times[-1])
+            return new_count
+
+        def x(self) -> ndarray:
+            """Times of the plotted points."""
+            return self.x_buffer[:self.size]
+
+        def y(self) -> ndarray:
+            """Values of the plotted points."""
+            return self.y_buffer[:self.size]
+
+    class SeriesWorker(QRunnable):
+        """Updates the buffers of every visible line from a snapshot, off the GUI thread and without the holdings lock."""
+
+        class Signals(QObject):
+            finished = pyqtSignal(int, object, object, object)
+
+        def __init__(self, snapshot: Holdings.Snapshot, line_buffers: Dict[str, Optional[PlotDisplay.LineBuffer]],
+                     viewport: Tuple[bool, float, float, int]):
+            """Constructor.
+
+            Args:
+                snapshot (Holdings.Snapshot): Snapshot to read from.
+                line_buffers (Dict[str, Optional[PlotDisplay.LineBuffer]]): Buffer of every visible line, None for new
+                    lines. Only one worker may use them at a time.
+                viewport (Tuple[bool, float, float, int]): Viewport from PlotDisplay.viewport."""
+            QRunnable.__init__(self)
+            self.snapshot: Holdings.Snapshot = snapshot
+            self.line_buffers: Dict[str, Optional[PlotDisplay.LineBuffer]] = line_buffers
+            self.viewport: Tuple[bool, float, float, int] = viewport
+            self.signals: PlotDisplay.SeriesWorker.Signals = PlotDisplay.SeriesWorker.Signals()
+
+        def run(self) -> None:
+            # Two points per pixel column: raw ticks when that many cover the range, a min/max envelope otherwise.
+            max_points: int = max(2 * self.viewport[3], 2)
+            line_buffers: Dict[str, PlotDisplay.LineBuffer] = {}
+            changed_line_names: List[str] = []
+
+            for data_line_name, line_buffer in self.line_buffers.items():
+                holding_type: Holdings.HOLDING_TYPE = Holdings.HOLDING_TYPE(data_line_name)
+                appended_count: int = 0
+                if line_buffer is not None and line_buffer.viewport == self.viewport:
+                    appended_count = line_buffer.append_new(*self.snapshot.get_series(holding_type=holding_type))
+                # Lines are re-queried for a new viewport, and once appended ticks double the point budget.
+                if line_buffer is None or line_buffer.viewport != self.viewport or len(line_buffer) > 2 * max_points:
+                    line_buffer = self.query(holding_type=holding_type, max_points=max_points)
+                    appended_count = len(line_buffer)
+                if appended_count > 0:
+                    changed_line_names.append(data_line_name)
+                line_buffers[data_line_name] = line_buffer
+
+            self.signals.finished.emit(self.snapshot.version, self.viewport, line_buffers, changed_line_names)
+
+        def query(self, holding_type: Holdings.HOLDING_TYPE, max_points: int) -> PlotDisplay.LineBuffer:
+            """Fresh buffer holding the points of a line for the viewport.
+
+            Args:
+                holding_type (Holdings.HOLDING_TYPE): Holding type of the line.
+                max_points (int): Point budget.
+
+            Returns:
+                PlotDisplay.LineBuffer: Buffer whose high-water mark is the snapshot time."""
+            empty_series: ndarray = empty(0, dtype=float64)
+            if self.snapshot.update_time is None:
+                return PlotDisplay.LineBuffer(x=empty_series, y=empty_series, high_water=-inf, viewport=self.viewport)
+
+            auto_range, x_min, x_max, _ = self.viewport
+            x, y = self.snapshot.query_equity(holding_type=holding_type, start=None if auto_range else x_min,
+                                              end=self.snapshot.update_time if auto_range else x_max, max_points=max_points)
+            return PlotDisplay.LineBuffer(x=x, y=y, high_water=self.snapshot.update_time, viewport=self.viewport)
+
     class Plot(PlotWidget):
         """[summary]"""
 